@@ -0,0 +1,193 @@
+from app.api_data.data_models import APIData, Location, URLParams
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+from urllib3.util.retry import Retry
+from typing import Dict, List
+import collections
+import threading
+import requests
+import time
+
+
+class HostRateLimiter:
+    """thread-safe rate limiter that spaces out requests sent to the same host,
+    so concurrent workers don't exceed the API request budget.
+
+    Parameters
+    ----------
+    requests_per_second : float
+        maximum number of requests sent per second to a single host
+    """
+
+    def __init__(self, requests_per_second: float) -> None:
+        if requests_per_second <= 0:
+            raise ValueError("requests_per_second must be a positive number")
+        self.interval = 1.0 / requests_per_second
+        self._lock = threading.Lock()
+        self._next_slot = collections.defaultdict(float)
+
+    def wait(self, url: str) -> None:
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot[host])
+            self._next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def build_session(pool_size: int, retries: int = 3) -> requests.Session:
+    """create a keep-alive http session with a connection pool
+    that is shared between all fetching workers.
+
+    Parameters
+    ----------
+    pool_size : int
+        maximum number of pooled connections per host
+    retries : int
+        number of retries on connection errors, throttling and server errors
+
+    Returns
+    -------
+    requests.Session
+        session with a mounted pooled adapter
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"],
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def validate_api_response(response: requests.Response) -> APIData:
+    """validate API response status, and hourly temperature completeness
+
+    Parameters
+    ----------
+    response : requests.Response
+        response of weather API
+
+    Returns
+    -------
+    APIData
+        JSON data of weather API
+
+    Raises
+    ------
+    ValueError
+        if retrieved data is in-complete or missing
+    ConnectionError
+        if API responded with status code other than 200
+    """
+    if response.status_code == 200:
+        data = response.json()
+        checking_lst = data["hourly"]["temperature_2m"]
+        if len(checking_lst) >= 24 and None not in checking_lst:
+            return data
+        else:
+            raise ValueError("Retrieved Data is in-complete or Missing")
+    else:
+        raise ConnectionError(
+            f"error when retrieving the data, status-code: {response.status_code}"
+        )
+
+
+def location_params(params: URLParams, location: Location) -> Dict:
+    """override coordinates & timezone of API parameters by location ones"""
+    return {
+        **dict(params),
+        "latitude": location.latitude,
+        "longitude": location.longitude,
+        "timezone": location.timezone,
+    }
+
+
+def fetch_many(
+    data_url: str,
+    params_list: List[Dict],
+    max_concurrency: int,
+    requests_per_second: float,
+    timeout: float = 30,
+) -> List[APIData]:
+    """send many API requests concurrently,
+    using bounded number of workers, one shared keep-alive session,
+    and per-host rate limiting.
+
+    Parameters
+    ----------
+    data_url : str
+        url of weather data provider
+    params_list : List[Dict]
+        parameters of every API request
+    max_concurrency : int
+        maximum number of in-flight requests
+    requests_per_second : float
+        maximum number of requests per second sent to API host
+    timeout : float
+        timeout of a single request in seconds
+
+    Returns
+    -------
+    List[APIData]
+        API data of every request in the same order of params_list
+    """
+    limiter = HostRateLimiter(requests_per_second=requests_per_second)
+
+    def fetch(params: Dict) -> APIData:
+        limiter.wait(data_url)
+        response = session.get(url=data_url, params=params, timeout=timeout)
+        return validate_api_response(response)
+
+    with build_session(pool_size=max_concurrency) as session:
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            return list(executor.map(fetch, params_list))
+
+
+def fetch_locations(
+    data_url: str,
+    params: URLParams,
+    locations: List[Location],
+    max_concurrency: int,
+    requests_per_second: float,
+    timeout: float = 30,
+) -> Dict[int, APIData]:
+    """fetch weather data of many locations concurrently.
+
+    Parameters
+    ----------
+    data_url : str
+        url of weather data provider
+    params : URLParams
+        parameters of weather API shared by all locations
+    locations : List[Location]
+        locations to get the weather data of
+    max_concurrency : int
+        maximum number of in-flight requests
+    requests_per_second : float
+        maximum number of requests per second sent to API host
+    timeout : float
+        timeout of a single request in seconds
+
+    Returns
+    -------
+    Dict[int, APIData]
+        API data of every location keyed by location id
+    """
+    results = fetch_many(
+        data_url=data_url,
+        params_list=[location_params(params, location) for location in locations],
+        max_concurrency=max_concurrency,
+        requests_per_second=requests_per_second,
+        timeout=timeout,
+    )
+    return {location.location_id: data for location, data in zip(locations, results)}
@@ -0,0 +1,105 @@
+from prefect import task
+from app.api_data.data_models import URLParams, APIData, Location
+from app.api_data.api_client import fetch_many, location_params
+from typing import Dict, List, Tuple
+import datetime
+
+
+def split_date_range(
+    start_date: str, end_date: str, window_days: int
+) -> List[Tuple[str, str]]:
+    """split a date range (inclusive) into consecutive windows
+    of at most window_days days.
+
+    Parameters
+    ----------
+    start_date : str
+        first date of the range
+    end_date : str
+        last date of the range
+    window_days : int
+        maximum number of days of a single window
+
+    Returns
+    -------
+    List[Tuple[str, str]]
+        (first date, last date) of every window
+    """
+    start = datetime.datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.datetime.strptime(end_date, "%Y-%m-%d").date()
+    if end < start:
+        raise ValueError(f"end date {end_date} is before start date {start_date}")
+    windows = []
+    while start <= end:
+        window_end = min(start + datetime.timedelta(days=window_days - 1), end)
+        windows.append((start.isoformat(), window_end.isoformat()))
+        start = window_end + datetime.timedelta(days=1)
+    return windows
+
+
+@task(
+    name="GetWindowsAPIData",
+    description=(
+        "access meteo-weather API concurrently to get the historical hourly weather"
+        " data of many date windows and locations"
+    ),
+    tags=["raw-data", "weather-data", "get", "backfill"],
+    retry_delay_seconds=120,
+    retries=3,
+    log_prints=True,
+    timeout_seconds=3600,
+)
+def get_windows_api_data(
+    data_url: str,
+    params: URLParams,
+    windows: List[Tuple[str, str]],
+    locations: List[Location],
+    max_concurrency: int,
+    requests_per_second: float,
+) -> Dict[Tuple[str, str], Dict[int, APIData]]:
+    """get weather data of every (window, location) pair in parallel.
+
+    Parameters
+    ----------
+    data_url : str
+        url of weather data provider
+    params : URLParams
+        parameters of weather API, dates, coordinates and timezone
+        are overridden by the ones of every window and location
+    windows : List[Tuple[str, str]]
+        (first date, last date) of every window
+    locations : List[Location]
+        locations to get the weather data of
+    max_concurrency : int
+        maximum number of in-flight requests
+    requests_per_second : float
+        maximum number of requests per second sent to API host
+
+    Returns
+    -------
+    Dict[Tuple[str, str], Dict[int, APIData]]
+        JSON data of weather API keyed by window, then by location id
+    """
+    requests_keys = [(window, location) for window in windows for location in locations]
+    print(
+        f"Retrieve Weather Data of {len(windows)} windows & {len(locations)} locations"
+        f" with {max_concurrency} concurrent requests"
+    )
+    results = fetch_many(
+        data_url=data_url,
+        params_list=[
+            {
+                **location_params(params, location),
+                "start_date": window[0],
+                "end_date": window[1],
+            }
+            for window, location in requests_keys
+        ],
+        max_concurrency=max_concurrency,
+        requests_per_second=requests_per_second,
+    )
+    data = {window: {} for window in windows}
+    for (window, location), result in zip(requests_keys, results):
+        data[window][location.location_id] = result
+    print(f"Data of {len(results)} requests Retrieved Successfully")
+    return data
@@ -1,5 +1,9 @@
 from pydantic import BaseModel
-from typing import Union, List, Dict
+from typing import Any, Optional, Union, List, Dict
+import yaml
+
+# configured locations, the first one is ingested in single-location mode
+LOCATIONS_FILE = "conf/locations.yaml"
 
 
 class URLParams(BaseModel):
@@ -21,3 +25,17 @@ class APIData(BaseModel):
     elevation: float
     hourly_units: Dict[str, str]
     hourly: Dict[str, List[Union[str, float]]]
+
+
+class Location(BaseModel):
+    location_id: int
+    latitude: float
+    longitude: float
+    timezone: str
+
+
+def read_locations(path: Optional[str] = None) -> Dict[str, Any]:
+    """locations file (locations & API rate limits), the configured one
+    if no path is passed"""
+    with open(path or LOCATIONS_FILE, "r") as file:
+        return yaml.safe_load(file)
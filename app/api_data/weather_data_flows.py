@@ -1,8 +1,14 @@
 from prefect import task, flow
 from prefect.tasks import task_input_hash
-from app.api_data.data_models import URLParams, APIData
+from app.api_data.data_models import URLParams, APIData, Location
+from app.api_data.api_client import fetch_locations, validate_api_response
+from app.storage.connection import get_connection
+from app.storage.schema import DATABASE, HOURLY_WEATHER_DATA, table_name
+from app.storage.upsert import upsert
+from typing import Dict, List, Optional, Union
+import pyarrow.compute as pc
+import pyarrow as pa
 import requests
-import duckdb
 import pandas as pd
 import datetime
 
@@ -38,92 +44,142 @@ def get_api_data(data_url: str, params: URLParams) -> APIData:
     """
     print("Retrieve Weather Data From API")
     response = requests.get(url=data_url, params=params)
-    if response.status_code == 200:
-        print(f"Data Retrieved Successfully with status code: {response.status_code}")
-        data = response.json()
-        checking_lst = data["hourly"]["temperature_2m"]
-        if len(checking_lst) >= 24 and None not in checking_lst:
-            print("No Missing or in-complete records")
-            return data
-        else:
-            raise ValueError("Retrieved Data is in-complete or Missing")
-    else:
-        raise ConnectionError(
-            f"error when retrieving the data, status-code: {response.status_code}"
-        )
+    data = validate_api_response(response)
+    print(f"Data Retrieved Successfully with status code: {response.status_code}")
+    print("No Missing or in-complete records")
+    return data
 
 
 @task(
-    name="TransformToDataFrame",
-    description="Convert API Data to DataFrame, and Prepare to load into MotherDuck",
-    tags=["transform", "prepare-api-data"],
-    retry_delay_seconds=30,
-    retries=2,
+    name="GetLocationsAPIData",
+    description=(
+        "access meteo-weather API concurrently to get the historical hourly weather"
+        " data of many locations"
+    ),
+    tags=["raw-data", "weather-data", "get", "multi-location"],
+    retry_delay_seconds=120,
+    retries=3,
     log_prints=True,
-    timeout_seconds=60,
+    timeout_seconds=600,
 )
-def transform_api_data(data: APIData) -> pd.DataFrame:
-    """Transform Data to be like Database-Schema Shape
+def get_locations_api_data(
+    data_url: str,
+    params: URLParams,
+    locations: List[Location],
+    max_concurrency: int,
+    requests_per_second: float,
+) -> Dict[int, APIData]:
+    """get weather data of many locations from URL,
+    with bounded concurrency over one shared keep-alive session.
+
+    Parameters
+    ----------
+    data_url : str
+        url of weather data provider
+    params : Pydantic-BaseModel
+        parameters of weather API, coordinates and timezone are
+        overridden by the ones of every location
+    locations : List[Location]
+        locations to get the weather data of
+    max_concurrency : int
+        maximum number of in-flight requests
+    requests_per_second : float
+        maximum number of requests per second sent to API host
+
+    Returns
+    -------
+    Dict[int, APIData]
+        JSON data of weather API keyed by location id
+    """
+    print(
+        f"Retrieve Weather Data of {len(locations)} Locations From API with"
+        f" {max_concurrency} concurrent requests"
+    )
+    data = fetch_locations(
+        data_url=data_url,
+        params=params,
+        locations=locations,
+        max_concurrency=max_concurrency,
+        requests_per_second=requests_per_second,
+    )
+    print(f"Data of {len(data)} Locations Retrieved Successfully")
+    return data
+
+
+HOURLY_ARROW_SCHEMA = pa.schema([
+    ("location_id", pa.int32()),
+    ("reading_timestamp", pa.timestamp("ns")),
+    ("temperature", pa.float32()),
+    ("tz", pa.string()),
+])
+
+
+def api_data_to_arrow(data: APIData, location_id: int) -> pa.Table:
+    """decode API data straight into typed arrow arrays,
+    constant columns are broadcast from a scalar, and timestamps are
+    parsed in one vectorized call.
 
     Parameters
     ----------
     data : APIData
         JSON API Data
+    location_id : int
+        id of the location the data belongs to
 
     Returns
     -------
-    pd.DataFrame
-        Pandas DataFrame of API Data
+    pa.Table
+        arrow table with the same schema of hourly_weather_data
     """
-    print("Transform Data to Database Schema like")
-    print("Get Location Data of API Data")
-    df = pd.DataFrame({
-        "location_id": [75354428 for _ in range(len(data["hourly"]["time"]))],
-        "reading_timestamp": data["hourly"]["time"],
-        "temprature": data["hourly"]["temperature_2m"],
-        "tz": [data["timezone"] for _ in range(len(data["hourly"]["time"]))],
-    })
-    df["reading_timestamp"] = pd.to_datetime(df["reading_timestamp"])
-    print("Data Transformed Successfully, and Ready for Loading into DB")
-    return df
+    n_rows = len(data["hourly"]["time"])
+    return pa.Table.from_arrays(
+        [
+            pa.repeat(pa.scalar(location_id, pa.int32()), n_rows),
+            pc.strptime(
+                pa.array(data["hourly"]["time"], pa.string()),
+                format="%Y-%m-%dT%H:%M",
+                unit="ns",
+            ),
+            pa.array(data["hourly"]["temperature_2m"], pa.float32()),
+            pa.repeat(pa.scalar(data["timezone"], pa.string()), n_rows),
+        ],
+        schema=HOURLY_ARROW_SCHEMA,
+    )
 
 
 @task(
-    name="CheckIfDataExist",
+    name="TransformToArrow",
     description=(
-        "Check the MotherDuck if the Data of the passed date exists, and if it"
-        " removes it"
+        "Convert API Data of one or many locations to one Arrow Table, and Prepare to"
+        " load into MotherDuck"
     ),
-    tags=["Quality", "Check", "motherduck"],
-    retry_delay_seconds=60,
-    retries=3,
+    tags=["transform", "prepare-api-data", "arrow"],
+    retry_delay_seconds=30,
+    retries=2,
     log_prints=True,
     timeout_seconds=120,
 )
-def check_if_data_exists(db_conn, running_dt: str) -> None:
-    """Check the MotherDuck if the Data of the passed date exists,
-      and if it removes it
+def transform_api_data_to_arrow(data: Dict[int, APIData]) -> pa.Table:
+    """Transform Data of locations to be like Database-Schema Shape
+    using the columnar arrow path.
 
     Parameters
     ----------
-    db_conn : MotherDuck Database Connection
-    running_dt: str
-         string format of pipeline running date
+    data : Dict[int, APIData]
+        JSON API Data keyed by location id
+
+    Returns
+    -------
+    pa.Table
+        Arrow Table of API Data of all locations
     """
-    print(f"Check if Data Exist for the current-date: {running_dt}")
-    db_conn.sql("USE ml_apps")
-    data_df = db_conn.sql(f"""
-                          SELECT * FROM ml_apps.weather_forecasting.hourly_weather_data 
-                          WHERE strftime(reading_timestamp, '%Y-%m-%d') = '{running_dt}'
-                        """).df()
-    print(f"found {len(data_df)} records")
-    if len(data_df) > 0:
-        print("data found, and will be removed safely")
-        db_conn.sql(f"""
-                    DELETE FROM ml_apps.weather_forecasting.hourly_weather_data 
-                    WHERE strftime(reading_timestamp, '%Y-%m-%d') = '{running_dt}'
-                """)
-        print("data removed successfully")
+    print(f"Transform Data of {len(data)} Locations to Arrow Table")
+    table = pa.concat_tables([
+        api_data_to_arrow(data=location_data, location_id=location_id)
+        for location_id, location_data in data.items()
+    ])
+    print(f"{table.num_rows} records Transformed Successfully")
+    return table
 
 
 @task(
@@ -135,20 +191,19 @@ def check_if_data_exists(db_conn, running_dt: str) -> None:
     log_prints=True,
     timeout_seconds=120,
 )
-def load_to_motherduck(df: pd.DataFrame, db_conn) -> None:
-    """Load Data into Database
+def load_to_motherduck(df: Union[pd.DataFrame, pa.Table], db_conn) -> None:
+    """Load Data into Database,
+    rows of existing (location_id, reading_timestamp) are replaced
+    in the same statement, and arrow tables are scanned by duckdb zero-copy.
 
     Parameters
     ----------
-    df : pd.DataFrame
-        API DataFrame
+    df : Union[pd.DataFrame, pa.Table]
+        API DataFrame or Arrow Table
     db_conn : motherduck database connection
     """
-    db_conn.sql("USE ml_apps")
-    db_conn.sql(
-        "INSERT INTO ml_apps.weather_forecasting.hourly_weather_data SELECT * FROM df"
-    )
-    print("Data Insert Successfully into hourly_weather_data Table")
+    n_rows = upsert(conn=db_conn, table=HOURLY_WEATHER_DATA, data=df)
+    print(f"{n_rows} records Upserted Successfully into hourly_weather_data Table")
 
 
 @task(
@@ -162,9 +217,9 @@ def load_to_motherduck(df: pd.DataFrame, db_conn) -> None:
 )
 def delete_out_of_range_data(db_conn, thresh_dt: str) -> None:
     print("Deleting Out of Range Data")
-    db_conn.sql("USE ml_apps")
+    db_conn.sql(f"USE {DATABASE}")
     db_conn.sql(f"""
-                DELETE FROM ml_apps.weather_forecasting.hourly_weather_data 
+                DELETE FROM {table_name(HOURLY_WEATHER_DATA)} 
                 WHERE reading_timestamp <= CAST('{thresh_dt}' AS DATE)-800
         """)
     print("Data Deleted Successfully")
@@ -173,17 +228,26 @@ def delete_out_of_range_data(db_conn, thresh_dt: str) -> None:
 @flow(
     name="DataFlow",
     description=(
-        "Manages the execution flow of getting the data from API and saving it to"
+        "Manages the execution flow of getting the data from API and upserting it to"
         " MotherDuck."
     ),
     validate_parameters=True,
     log_prints=True,
 )
 def data_flow(
-    api_data_url: str, url_params: URLParams, db_token: str, deleting_thresh_dt: str
+    api_data_url: str,
+    url_params: URLParams,
+    db_token: str,
+    deleting_thresh_dt: str,
+    locations: Optional[List[Location]] = None,
+    location_id: Optional[int] = None,
+    max_concurrency: int = 8,
+    requests_per_second: float = 10.0,
 ) -> None:
     """sub-flow of raw-data that get data from api,
     and load it into motherduck database..
+    if locations are passed, data of all of them are fetched concurrently,
+    and loaded with one bulk insert.
 
     Parameters
     ----------
@@ -195,13 +259,30 @@ def data_flow(
     deleting_thresh_dt: str
         date used to delete data that exceeds 800 days from
         this date.
+    locations: Optional[List[Location]]
+        locations to get the weather data of, if not passed
+        coordinates of url_params are used.
+    location_id: Optional[int]
+        id of the location of url_params, needed if locations aren't passed
+    max_concurrency: int
+        maximum number of in-flight API requests in multi-location mode
+    requests_per_second: float
+        maximum number of API requests per second in multi-location mode
     """
-    api_data = get_api_data(data_url=api_data_url, params=url_params)
-    api_df = transform_api_data(data=api_data)
+    if locations:
+        api_data = get_locations_api_data(
+            data_url=api_data_url,
+            params=url_params,
+            locations=locations,
+            max_concurrency=max_concurrency,
+            requests_per_second=requests_per_second,
+        )
+    elif location_id is not None:
+        api_data = {location_id: get_api_data(data_url=api_data_url, params=url_params)}
+    else:
+        raise ValueError("location_id of url_params is needed without locations")
+    api_df = transform_api_data_to_arrow(data=api_data)
     print("Connecting To MotherDuck to Load Data")
-    with duckdb.connect(f"md:?motherduck_token={db_token}") as conn:
-        print("Connection Successfully intiated")
-        check_if_data_exists(db_conn=conn, running_dt=deleting_thresh_dt)
-        load_to_motherduck(df=api_df, db_conn=conn)
-        delete_out_of_range_data(db_conn=conn, thresh_dt=deleting_thresh_dt)
-    print("Connection with MotherDuck Closed")
+    conn = get_connection(db_token)
+    load_to_motherduck(df=api_df, db_conn=conn)
+    delete_out_of_range_data(db_conn=conn, thresh_dt=deleting_thresh_dt)
@@ -0,0 +1,103 @@
+from app.inference.model_registry import model_version
+from app.storage.schema import FORECAST_FINGERPRINTS, table_name
+from app.storage.upsert import upsert
+from typing import Dict, Optional
+import pandas as pd
+import datetime
+import hashlib
+
+FINGERPRINT_COLUMNS = ["location_id", "inference_date", "model_version", "fingerprint"]
+
+
+def window_hash(history: pd.DataFrame) -> str:
+    """content hash of the scoring window of a location"""
+    rows = history[["reading_date", "temperature"]]
+    return hashlib.sha256(
+        pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes()
+    ).hexdigest()
+
+
+def fingerprint(
+    model_version: str, location_id, history: pd.DataFrame, horizon: int
+) -> str:
+    """hash of (model version, location, scoring window content, horizon),
+    an unchanged fingerprint means an unchanged forecast."""
+    return hashlib.sha256(
+        "|".join(
+            [model_version, str(location_id), window_hash(history), str(horizon)]
+        ).encode()
+    ).hexdigest()
+
+
+def forecast_fingerprints(
+    hist_df: pd.DataFrame,
+    model_path: str,
+    horizon: int,
+    inference_date: str,
+    location_models: Optional[Dict[int, str]] = None,
+) -> pd.DataFrame:
+    """fingerprint of the forecast of every location from an inference date
+
+    Parameters
+    ----------
+    hist_df : pd.DataFrame
+        historical temperature dataframe of all the locations
+    model_path : str
+        exported model directory, or pickle file
+    horizon : int
+        number of forecasted days
+    inference_date : str
+        running date of the forecasts
+    location_models : Optional[Dict[int, str]]
+        models of specific locations, other locations use `model_path`
+
+    Returns
+    -------
+    pd.DataFrame
+        location_id, inference_date, model_version & fingerprint
+        of every location
+    """
+    versions = {}
+    rows = []
+    for location_id, history in hist_df.groupby("location_id", sort=True):
+        path = (location_models or {}).get(location_id, model_path)
+        if path not in versions:
+            versions[path] = model_version(path)
+        rows.append({
+            "location_id": location_id,
+            "inference_date": inference_date,
+            "model_version": versions[path],
+            "fingerprint": fingerprint(versions[path], location_id, history, horizon),
+        })
+    return pd.DataFrame(rows, columns=FINGERPRINT_COLUMNS)
+
+
+def stored_fingerprints(conn, inference_date: str) -> pd.DataFrame:
+    """fingerprints of the forecasts already stored for an inference date"""
+    return conn.sql(f"""
+        SELECT location_id, fingerprint
+        FROM {table_name(FORECAST_FINGERPRINTS)}
+        WHERE inference_date = CAST('{inference_date}' AS DATE)
+    """).df()
+
+
+def changed_locations(fingerprints: pd.DataFrame, stored: pd.DataFrame) -> pd.Series:
+    """locations whose fingerprint differs from the stored one, or is new"""
+    merged = fingerprints.merge(
+        stored, on="location_id", how="left", suffixes=("", "_stored")
+    )
+    changed = merged["fingerprint"] != merged["fingerprint_stored"]
+    return merged.loc[changed, "location_id"]
+
+
+def save_fingerprints(conn, fingerprints: pd.DataFrame, horizon: int) -> None:
+    """store the fingerprints of written forecasts"""
+    data = pd.DataFrame({
+        "location_id": fingerprints["location_id"],
+        "inference_date": pd.to_datetime(fingerprints["inference_date"]),
+        "horizon": horizon,
+        "model_version": fingerprints["model_version"],
+        "fingerprint": fingerprints["fingerprint"],
+        "updated_at": datetime.datetime.now(),
+    })
+    upsert(conn=conn, table=FORECAST_FINGERPRINTS, data=data)
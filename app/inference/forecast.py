@@ -1,18 +1,90 @@
 from prefect import task, flow
-from prefect.tasks import task_input_hash
-from sktime.exceptions import NotFittedError
+from app.storage.caching import (
+    ParquetSerializer,
+    query_cache_key,
+    query_results_storage,
+)
+from app.inference.fingerprints import (
+    FINGERPRINT_COLUMNS,
+    changed_locations,
+    fingerprint,
+    forecast_fingerprints,
+    save_fingerprints,
+    stored_fingerprints,
+)
+from app.inference.model_registry import get_registry, model_version
+from app.inference.numpy_prophet import PREDICTOR_FILE, NumpyProphet
+from app.storage.connection import get_connection
+from app.storage.schema import (
+    DAILY_FORECASTED_WEATHER,
+    DAILY_WEATHER_DATA,
+    FORECAST_FINGERPRINTS,
+    table_name,
+)
+from app.storage.upsert import date_range_predicate, upsert
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+import multiprocessing
 import pandas as pd
+import numpy as np
 import datetime
-import duckdb
-import pickle
+import copy
+import math
+import os
+
+HORIZON = 30
+# days of history a forecast is made from
+HISTORY_DAYS = 400
+
+
+def inference_data_predicate(running_date: str) -> str:
+    """predicate of the daily history needed to forecast from the running date"""
+    return (
+        f"reading_date >= CAST('{running_date}' AS DATE)"
+        f" - INTERVAL '{HISTORY_DAYS} days'"
+    )
+
+
+def inference_data_query(running_date: str) -> str:
+    """query of the daily history needed to forecast from the running date"""
+    return (
+        f"SELECT * FROM {table_name(DAILY_WEATHER_DATA)} WHERE"
+        f" {inference_data_predicate(running_date)}"
+        " ORDER BY location_id, reading_date"
+    )
+
+
+def replay_data_predicate(first_date: str, last_date: str) -> str:
+    """predicate of the union of the daily histories needed to forecast
+    from every running date between the first & last dates"""
+    start_date = datetime.date.fromisoformat(first_date) - datetime.timedelta(
+        days=HISTORY_DAYS
+    )
+    return date_range_predicate("reading_date", start_date.isoformat(), last_date)
+
+
+def replay_data_query(first_date: str, last_date: str) -> str:
+    """query of the union of the daily histories needed to forecast
+    from every running date between the first & last dates"""
+    return (
+        f"SELECT * FROM {table_name(DAILY_WEATHER_DATA)} WHERE"
+        f" {replay_data_predicate(first_date, last_date)}"
+        " ORDER BY location_id, reading_date"
+    )
 
 
 @task(
     name="GetInferenceData",
     description="get daily weather data that are needed to forecast weather",
     tags=["Get", "InferenceData"],
-    cache_key_fn=task_input_hash,
-    cache_expiration=datetime.timedelta(minutes=10),
+    cache_key_fn=query_cache_key(
+        inference_data_query,
+        watermarks=[(DAILY_WEATHER_DATA, "reading_date", inference_data_predicate)],
+    ),
+    cache_expiration=datetime.timedelta(days=1),
+    persist_result=True,
+    result_storage=query_results_storage(),
+    result_serializer=ParquetSerializer(),
     retry_delay_seconds=30,
     retries=3,
     log_prints=True,
@@ -20,7 +92,7 @@ import pickle
 )
 def get_inference_data(conn, running_date: str) -> pd.DataFrame:
     """connect to motherduck,
-    and get data needed to forecast next 30 days
+    and get data needed to forecast next 30 days of all the locations
 
     Parameters
     ----------
@@ -33,63 +105,209 @@ def get_inference_data(conn, running_date: str) -> pd.DataFrame:
     pd.DataFrame
         dataframe of daily historical weather data.
     """
-    df = conn.sql(
-        "SELECT * FROM ml_apps.weather_forecasting.daily_weather_data WHERE"
-        f" reading_date >= CAST('{running_date}' AS DATE) - INTERVAL '400 days'"
-    ).df()
+    df = conn.sql(inference_data_query(running_date)).df()
     return df
 
 
+def forecast_location(
+    model,
+    location_id: int,
+    history: pd.DataFrame,
+    running_date: str,
+    horizon: int = HORIZON,
+) -> pd.DataFrame:
+    """forecast the temperature of the next 30 days of one location
+
+    Parameters
+    ----------
+    model : NumpyProphet or sktime forecaster
+        loaded model of the model registry
+    location_id : int
+        id of the location
+    history : pd.DataFrame
+        daily temperature history of the location
+    running_date: str
+        string format of pipeline running date
+    horizon : int
+        number of forecasted days
+
+    Returns
+    -------
+    pd.DataFrame
+       forecasted temperature with the columns of daily_forecasted_weather
+
+    Raises
+    ------
+    NotFittedError
+        Exception class to raise if estimator is used before fitting
+    """
+    scoring_df = history.set_index("reading_date")[["temperature"]]
+    if isinstance(model, NumpyProphet):
+        preds = model.forecast(cutoff=scoring_df.index.max(), horizon=horizon)
+    else:
+        # sktime is only imported when the forecaster itself is needed
+        from sktime.exceptions import NotFittedError
+
+        try:
+            model.check_is_fitted()
+        except NotFittedError:
+            raise NotFittedError("Loaded Model isn't fitted on Training Data")
+        # updating the data of the model must not leak into other locations
+        preds = copy.deepcopy(model).update_predict_single(
+            fh=range(1, horizon + 1), y=scoring_df, update_params=False
+        )
+    return pd.DataFrame({
+        "location_id": location_id,
+        "reading_date": preds.index,
+        "forecasted_temperature": np.asarray(preds, dtype=float).ravel(),
+        "inference_date": running_date,
+    })
+
+
+def init_worker(memory_budget_mb: float, model_paths: List[str]) -> None:
+    """load the models of a forecasting worker once, in its own registry"""
+    registry = get_registry(memory_budget_mb)
+    for model_path in model_paths:
+        registry.get(model_path)
+
+
+def forecast_in_worker(
+    model_path: str, location_id: int, history: pd.DataFrame, running_date: str
+) -> pd.DataFrame:
+    model = get_registry().get(model_path)
+    return forecast_location(model, location_id, history, running_date)
+
+
+class ForecastJob(NamedTuple):
+    """forecast of one location from one running date"""
+
+    model_path: str
+    location_id: int
+    history: pd.DataFrame
+    running_date: str
+
+
+def register_location(
+    location_id, model_path: str, location_models: Optional[Dict[int, str]]
+) -> str:
+    """register the model of a location, and return its path"""
+    registry = get_registry()
+    registry.register(location_id, (location_models or {}).get(location_id, model_path))
+    return registry.model_path(location_id)
+
+
+def run_forecasts(jobs: List[ForecastJob], n_workers: Optional[int]) -> pd.DataFrame:
+    """run forecasting jobs across a process pool, every worker loads the
+    models once, numpy predictors of exported models, if compiled for all the
+    jobs, forecast in the calling process.
+
+    Parameters
+    ----------
+    jobs : List[ForecastJob]
+        forecasts to run
+    n_workers : Optional[int]
+        forecasting processes, defaults to one per core (up to the number of
+        jobs), 1 forecasts in the calling process
+
+    Returns
+    -------
+    pd.DataFrame
+       forecasted temperature of all the jobs
+    """
+    registry = get_registry()
+    model_paths = [job.model_path for job in jobs]
+    n_workers = min(n_workers or os.cpu_count() or 1, len(jobs))
+    if all(os.path.isfile(os.path.join(path, PREDICTOR_FILE)) for path in model_paths):
+        # numpy forecasts take a millisecond, less than starting a worker
+        n_workers = 1
+    print(f"Running {len(jobs)} forecasts with {n_workers} workers")
+    if n_workers <= 1:
+        preds = [forecast_in_worker(*job) for job in jobs]
+    else:
+        # spawned workers don't inherit the threads of the running flow
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(registry.memory_budget / 2**20, sorted(set(model_paths))),
+        ) as executor:
+            preds = list(
+                executor.map(
+                    forecast_in_worker,
+                    *zip(*jobs),
+                    chunksize=math.ceil(len(jobs) / (4 * n_workers)),
+                )
+            )
+    print(f"Model registry: {registry.stats}")
+    return pd.concat(preds, ignore_index=True)
+
+
 @task(
     name="ForecastWeather",
-    description="Forecast the next 30",
+    description="Forecast the next 30 days of every location",
     tags=["Forecast", "Inference"],
     retry_delay_seconds=30,
     retries=3,
     log_prints=True,
-    timeout_seconds=30,
+    timeout_seconds=600,
 )
 def forecast_weather(
-    hist_df: pd.DataFrame, model_path: str, running_date: str
+    hist_df: pd.DataFrame,
+    model_path: str,
+    running_date: str,
+    n_workers: Optional[int] = None,
+    location_models: Optional[Dict[int, str]] = None,
 ) -> pd.DataFrame:
-    """forecast the temperature next 30 days
+    """forecast the temperature next 30 days of every location of the history,
+    locations are split in memory and forecasted by `run_forecasts`.
+    models come from the model registry, so retries & later runs of the
+    process don't reload an unchanged model.
 
     Parameters
     ----------
     hist_df : pd.DataFrame
-        historical temperature dataframe
+        historical temperature dataframe of all the locations
     model_path : str
-        path of pickle file
+        exported model directory, or pickle file
     running_date: str
         string format of pipeline running date
+    n_workers : Optional[int]
+        forecasting processes, defaults to one per core (up to the number of
+        locations), 1 forecasts in the flow process
+    location_models : Optional[Dict[int, str]]
+        models of specific locations, other locations use `model_path`
 
     Returns
     -------
     pd.DataFrame
-       dataframe of forecasted temperature
-
-    Raises
-    ------
-    NotFittedError
-        Exception class to raise if estimator is used before fitting
+       dataframe of forecasted temperature of all the locations
     """
-    id = pd.Series([75354428 for _ in range(30)], name="location_id")
-    inference_date = pd.Series([running_date for _ in range(30)], name="inference_date")
-    scoring_df = hist_df[["reading_date", "temperature"]]
-    scoring_df.set_index("reading_date", inplace=True)
-    with open(model_path, "rb") as pkl:
-        model = pickle.load(pkl)
-    try:
-        model.check_is_fitted()
-        preds = model.update_predict_single(
-            fh=range(1, 31), y=scoring_df, update_params=False
+    groups = hist_df[["location_id", "reading_date", "temperature"]].groupby(
+        "location_id", sort=True
+    )
+    jobs = [
+        ForecastJob(
+            model_path=register_location(location_id, model_path, location_models),
+            location_id=location_id,
+            history=history,
+            running_date=running_date,
         )
-        preds.reset_index(inplace=True)
-        preds.columns = ["reading_date", "forecasted_temperature"]
-        preds = pd.concat([id, preds, inference_date], axis=1)
-        return preds
-    except NotFittedError:
-        raise NotFittedError("Loaded Model isn't fitted on Training Data")
+        for location_id, history in groups
+    ]
+    return run_forecasts(jobs, n_workers)
+
+
+@task(
+    name="GetForecastFingerprints",
+    description="get fingerprints of the forecasts stored for the running date",
+    tags=["Get", "Fingerprints", "Inference"],
+    retry_delay_seconds=30,
+    retries=3,
+    log_prints=True,
+    timeout_seconds=60,
+)
+def get_fingerprints(conn, running_date: str) -> pd.DataFrame:
+    return stored_fingerprints(conn=conn, inference_date=running_date)
 
 
 @task(
@@ -101,25 +319,41 @@ def forecast_weather(
     log_prints=True,
     timeout_seconds=60,
 )
-def load_forecasts_into_db(conn, preds_df: pd.DataFrame) -> None:
-    """load forecasted temperature to motherduck
+def load_forecasts_into_db(
+    conn, preds_df: pd.DataFrame, fingerprints: Optional[pd.DataFrame] = None
+) -> None:
+    """load forecasted temperature of all the locations to motherduck
+    in one bulk statement, re-running the same inference date replaces
+    its forecasts. the fingerprints of the forecasts are stored in the same
+    transaction, so they are never recorded without their forecasts.
 
     Parameters
     ----------
     conn : MotherDuck Database Connection
     preds_df : pd.DataFrame
         dataframe of forecasted temperature
+    fingerprints : Optional[pd.DataFrame]
+        fingerprints of the forecasts
     """
-    conn.sql(
-        "INSERT INTO ml_apps.weather_forecasting.daily_forecasted_weather SELECT * FROM"
-        " preds_df"
-    )
+    conn.begin()
+    try:
+        upsert(conn=conn, table=DAILY_FORECASTED_WEATHER, data=preds_df)
+        if fingerprints is not None:
+            save_fingerprints(conn=conn, fingerprints=fingerprints, horizon=HORIZON)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
 
 def delete_out_of_range_data(conn, thresh_date: str) -> None:
     print("Deleting Out of Range Data")
     conn.sql(f"""
-            DELETE FROM ml_apps.weather_forecasting.daily_forecasted_weather
+            DELETE FROM {table_name(DAILY_FORECASTED_WEATHER)}
+            WHERE inference_date <= CAST('{thresh_date}' AS DATE)-1000
+        """)
+    conn.sql(f"""
+            DELETE FROM {table_name(FORECAST_FINGERPRINTS)}
             WHERE inference_date <= CAST('{thresh_date}' AS DATE)-1000
         """)
     print("Data Deleted Successfully")
@@ -131,8 +365,18 @@ def delete_out_of_range_data(conn, thresh_date: str) -> None:
     validate_parameters=True,
     log_prints=True,
 )
-def forecast_flow(db_token: str, date: str, model_path: str) -> None:
-    """flow of inference
+def forecast_flow(
+    db_token: str,
+    date: str,
+    model_path: str,
+    hist_df: Optional[pd.DataFrame] = None,
+    n_workers: Optional[int] = None,
+    location_models: Optional[Dict[int, str]] = None,
+    skip_unchanged: bool = True,
+) -> Dict[str, int]:
+    """flow of inference of every location,
+    locations whose model & scoring window didn't change since their stored
+    forecasts of the same running date are skipped.
 
     Parameters
     ----------
@@ -141,20 +385,194 @@ def forecast_flow(db_token: str, date: str, model_path: str) -> None:
     date : str
         running date of the process
     model_path : str
-        path of pickle file
+        exported model directory, or pickle file
+    hist_df : Optional[pd.DataFrame]
+        daily history already read by a parent flow,
+        if not passed it is read from the database
+    n_workers : Optional[int]
+        forecasting processes, defaults to one per core
+    location_models : Optional[Dict[int, str]]
+        models of specific locations, other locations use `model_path`
+    skip_unchanged : bool
+        skip the locations with unchanged forecast fingerprints
+
+    Returns
+    -------
+    Dict[str, int]
+        number of forecasted & skipped locations
     """
     print("Connecting To MotherDuck to Get/Load Data")
-    with duckdb.connect(f"md:?motherduck_token={db_token}") as conn:
+    conn = get_connection(db_token)
+    if hist_df is None:
         print("Getting Scoring Data From MotherDuck")
         df = get_inference_data(conn=conn, running_date=date)
-        if len(df) > 0:
-            preds = forecast_weather(
-                hist_df=df, model_path=model_path, running_date=date
-            )
-            print(f"Model Forecasted Next {len(preds)} days")
-            load_forecasts_into_db(conn=conn, preds_df=preds)
-            print("Data Loaded into MotherDuck")
-            delete_out_of_range_data(conn=conn, thresh_date=date)
-        else:
-            print("No Records in Scoring data..")
-    print("Connection with MotherDuck Closed")
+    else:
+        df = hist_df
+    if len(df) == 0:
+        print("No Records in Scoring data..")
+        return {"forecasted": 0, "skipped": 0}
+    fingerprints = forecast_fingerprints(df, model_path, HORIZON, date, location_models)
+    n_locations = len(fingerprints)
+    if skip_unchanged:
+        changed = changed_locations(fingerprints, get_fingerprints(conn, date))
+        fingerprints = fingerprints[fingerprints["location_id"].isin(changed)]
+        df = df[df["location_id"].isin(changed)]
+    counts = {
+        "forecasted": len(fingerprints),
+        "skipped": n_locations - len(fingerprints),
+    }
+    print(
+        f"{counts['skipped']} of {n_locations} locations have unchanged"
+        " forecast fingerprints, skipped"
+    )
+    if len(df) > 0:
+        preds = forecast_weather(
+            hist_df=df,
+            model_path=model_path,
+            running_date=date,
+            n_workers=n_workers,
+            location_models=location_models,
+        )
+        print(
+            f"Model Forecasted Next {HORIZON} days of"
+            f" {preds['location_id'].nunique()} locations"
+        )
+        load_forecasts_into_db(conn=conn, preds_df=preds, fingerprints=fingerprints)
+        print("Data Loaded into MotherDuck")
+    delete_out_of_range_data(conn=conn, thresh_date=date)
+    return counts
+
+
+@task(
+    name="GetReplayData",
+    description="get daily weather data needed to forecast from many dates",
+    tags=["Get", "InferenceData", "Replay"],
+    cache_key_fn=query_cache_key(
+        replay_data_query,
+        watermarks=[(DAILY_WEATHER_DATA, "reading_date", replay_data_predicate)],
+    ),
+    cache_expiration=datetime.timedelta(days=1),
+    persist_result=True,
+    result_storage=query_results_storage(),
+    result_serializer=ParquetSerializer(),
+    retry_delay_seconds=30,
+    retries=3,
+    log_prints=True,
+    timeout_seconds=300,
+)
+def get_replay_data(conn, first_date: str, last_date: str) -> pd.DataFrame:
+    return conn.sql(replay_data_query(first_date, last_date)).df()
+
+
+def replay_jobs(
+    hist_df: pd.DataFrame,
+    dates: List[str],
+    model_path: str,
+    location_models: Optional[Dict[int, str]] = None,
+) -> List[ForecastJob]:
+    """forecasting jobs of every location & running date, the history of a
+    running date is sliced in memory, as read by `get_inference_data` on it."""
+    jobs = []
+    running_dates = pd.to_datetime(dates).to_numpy()
+    for location_id, history in hist_df.groupby("location_id", sort=True):
+        history = history[["location_id", "reading_date", "temperature"]]
+        history = history.sort_values("reading_date")
+        path = register_location(location_id, model_path, location_models)
+        days = history["reading_date"].to_numpy()
+        starts = np.searchsorted(
+            days, running_dates - np.timedelta64(HISTORY_DAYS, "D"), side="left"
+        )
+        ends = np.searchsorted(days, running_dates, side="right")
+        for date, start, end in zip(dates, starts, ends):
+            if end > start:
+                jobs.append(
+                    ForecastJob(path, location_id, history.iloc[start:end], date)
+                )
+    return jobs
+
+
+@task(
+    name="ReplayForecasts",
+    description="Forecast the next 30 days of every location from many dates",
+    tags=["Forecast", "Inference", "Replay"],
+    retry_delay_seconds=30,
+    retries=3,
+    log_prints=True,
+    timeout_seconds=3600,
+)
+def replay_forecasts(
+    jobs: List[ForecastJob], n_workers: Optional[int] = None
+) -> pd.DataFrame:
+    return run_forecasts(jobs, n_workers)
+
+
+def replay_fingerprints(jobs: List[ForecastJob]) -> pd.DataFrame:
+    """fingerprints of the forecasts of the replay jobs"""
+    versions = {path: model_version(path) for path in {job.model_path for job in jobs}}
+    return pd.DataFrame(
+        [
+            {
+                "location_id": job.location_id,
+                "inference_date": job.running_date,
+                "model_version": versions[job.model_path],
+                "fingerprint": fingerprint(
+                    versions[job.model_path], job.location_id, job.history, HORIZON
+                ),
+            }
+            for job in jobs
+        ],
+        columns=FINGERPRINT_COLUMNS,
+    )
+
+
+@flow(
+    name="WeatherForecastReplayFlow",
+    description="Re-forecast many running dates, and replace their forecasts",
+    validate_parameters=True,
+    log_prints=True,
+)
+def replay_flow(
+    db_token: str,
+    dates: List[str],
+    model_path: str,
+    n_workers: Optional[int] = None,
+    location_models: Optional[Dict[int, str]] = None,
+) -> Dict[str, int]:
+    """replay the forecasts of many running dates in one pass, e.g. to rebuild
+    daily_forecasted_weather after a model change: the union of the histories
+    is read in one query, models are loaded once, the windows of every date are
+    sliced in memory & forecasted in parallel, and all the vintages are written
+    in one transaction.
+
+    Parameters
+    ----------
+    db_token : str
+        MotherDuck Database Credentials
+    dates : List[str]
+        running dates to replay
+    model_path : str
+        exported model directory, or pickle file
+    n_workers : Optional[int]
+        forecasting processes, defaults to one per core
+    location_models : Optional[Dict[int, str]]
+        models of specific locations, other locations use `model_path`
+
+    Returns
+    -------
+    Dict[str, int]
+        number of replayed dates & forecasts
+    """
+    dates = sorted(dates)
+    print(f"Replaying forecasts of {len(dates)} dates: {dates[0]} to {dates[-1]}")
+    conn = get_connection(db_token)
+    df = get_replay_data(conn=conn, first_date=dates[0], last_date=dates[-1])
+    jobs = replay_jobs(df, dates, model_path, location_models)
+    if not jobs:
+        print("No Records in Scoring data..")
+        return {"dates": len(dates), "forecasts": 0}
+    preds = replay_forecasts(jobs=jobs, n_workers=n_workers)
+    load_forecasts_into_db(
+        conn=conn, preds_df=preds, fingerprints=replay_fingerprints(jobs)
+    )
+    print(f"{len(jobs)} forecasts of {len(dates)} dates loaded into MotherDuck")
+    return {"dates": len(dates), "forecasts": len(jobs)}
@@ -0,0 +1,120 @@
+from typing import Any, Dict, Optional, Tuple
+from importlib import metadata
+import resource
+import platform
+import hashlib
+import joblib
+import pickle
+import json
+import time
+import os
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+ARTIFACT_FILE = "forecaster.joblib"
+LIBRARIES = ["numpy", "pandas", "scikit-learn", "sktime", "prophet", "statsmodels"]
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def library_versions() -> Dict[str, str]:
+    """versions of python & the libraries needed to unpickle a forecaster"""
+    versions = {"python": platform.python_version()}
+    for library in LIBRARIES:
+        try:
+            versions[library] = metadata.version(library)
+        except metadata.PackageNotFoundError:
+            continue
+    return versions
+
+
+def read_manifest(model_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(model_dir, MANIFEST_FILE), "r") as file:
+        return json.load(file)
+
+
+def retrained_location(conf: Dict[str, Any]) -> Optional[str]:
+    """model directory of `make retrain` of the params file, if it was
+    retrained from the current model of training (the DVC `train` stage),
+    a retrained model is stale once the model is trained again."""
+    model_dir = conf["retrain"]["model_dir"]
+    base_path = conf["tuner"]["model_path"]
+    if not (os.path.isdir(model_dir) and os.path.exists(base_path)):
+        return None
+    base_sha256 = read_manifest(model_dir).get("retrain", {}).get("base-sha256")
+    return model_dir if base_sha256 == file_sha256(base_path) else None
+
+
+def model_location(conf: Dict[str, Any]) -> str:
+    """retrained model directory of the params file, the exported model
+    directory if there's no up-to-date retrained model,
+    or the pickled model of training as long as it isn't exported."""
+    retrained_dir = retrained_location(conf)
+    if retrained_dir is not None:
+        return retrained_dir
+    model_dir = conf["export"]["model_dir"]
+    return model_dir if os.path.isdir(model_dir) else conf["tuner"]["model_path"]
+
+
+def load_model(model_path: str) -> Tuple[Any, Dict[str, Any]]:
+    """load the forecaster of an exported model directory,
+    or a legacy pickle file, and report the load time & the growth of the
+    process peak resident memory (libraries imported by unpickling included).
+
+    Parameters
+    ----------
+    model_path : str
+        exported model directory (manifest + forecaster), or pickle file
+
+    Returns
+    -------
+    Tuple[Any, Dict[str, Any]]
+        fitted forecaster, and load report
+
+    Raises
+    ------
+    ValueError
+        if the artifact format isn't supported, or its checksum doesn't match
+    """
+    peak_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if os.path.isdir(model_path):
+        manifest = read_manifest(model_path)
+        if manifest["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"unsupported model format {manifest['format_version']}")
+        artifact_path = os.path.join(model_path, manifest["artifact"])
+        if file_sha256(artifact_path) != manifest["artifact_sha256"]:
+            raise ValueError(f"checksum mismatch of {artifact_path}")
+        installed = library_versions()
+        mismatches = {
+            library: version
+            for library, version in manifest["libraries"].items()
+            if installed.get(library) != version
+        }
+        if mismatches:
+            print(f"model exported with different library versions: {mismatches}")
+        model = joblib.load(artifact_path)
+    else:
+        manifest = {}
+        with open(model_path, "rb") as pkl:
+            model = pickle.load(pkl)
+    seconds = time.perf_counter() - start
+    peak_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report = {
+        "model_path": model_path,
+        "estimator": manifest.get("estimator", type(model).__name__),
+        "load_seconds": seconds,
+        # ru_maxrss is in KB on linux
+        "peak_memory_mb": (peak_after - peak_before) / 1024,
+    }
+    print(
+        f"{report['estimator']} loaded in {seconds:.3f}s,"
+        f" peak memory +{report['peak_memory_mb']:.1f}MB"
+    )
+    return model, report
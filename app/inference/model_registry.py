@@ -0,0 +1,152 @@
+from app.inference.model_loader import load_model, read_manifest
+from app.inference.numpy_prophet import load_predictor
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import threading
+import pickle
+import os
+
+DEFAULT_MEMORY_BUDGET_MB = 512
+_REGISTRY = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def model_version(model_path: str) -> str:
+    """version of a published model, the artifact content hash of an exported
+    model directory, or the modification time & size of a pickle file."""
+    if os.path.isdir(model_path):
+        return read_manifest(model_path)["artifact_sha256"]
+    stat = os.stat(model_path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def load_forecaster(model_path: str, compiled: bool = True):
+    """numpy predictor of the exported model if it was compiled (and wanted),
+    otherwise the forecaster itself."""
+    predictor = load_predictor(model_path) if compiled else None
+    if predictor is not None:
+        return predictor
+    model, _ = load_model(model_path)
+    return model
+
+
+class ModelRegistry:
+    """in-process registry of the models used per location,
+    loaded models are kept in an LRU cache keyed by path & version within a
+    memory budget, so an unchanged model is never deserialised twice.
+
+    when a new version is published at a path, the next `get` loads it and
+    swaps it in atomically: callers holding the previous model keep using it,
+    new callers only see the new one, and the previous version is dropped.
+
+    Parameters
+    ----------
+    memory_budget_mb : float
+        maximum pickled size of the cached models, the most recently used
+        model is kept even if it alone exceeds the budget
+    """
+
+    def __init__(self, memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB) -> None:
+        self.memory_budget = memory_budget_mb * 2**20
+        self.entries: "OrderedDict[Tuple, Tuple[Any, int]]" = OrderedDict()
+        self.versions: Dict[Tuple[str, bool], str] = {}
+        self.locations: Dict[Any, str] = {}
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "swaps": 0}
+        self.lock = threading.RLock()
+
+    def register(self, location_id, model_path: str) -> None:
+        """track the model serving a location"""
+        with self.lock:
+            self.locations[location_id] = model_path
+
+    def model_path(self, location_id, default: Optional[str] = None) -> str:
+        path = self.locations.get(location_id, default)
+        if path is None:
+            raise KeyError(f"no model registered for location {location_id}")
+        return path
+
+    def describe(self) -> Dict[Any, Dict[str, Optional[str]]]:
+        """path & loaded version of the model of every registered location"""
+        with self.lock:
+            loaded = {path: version for (path, _), version in self.versions.items()}
+            return {
+                location_id: {
+                    "model_path": path,
+                    "version": loaded.get(os.path.realpath(path)),
+                }
+                for location_id, path in self.locations.items()
+            }
+
+    def cached_bytes(self) -> int:
+        return sum(size for _, size in self.entries.values())
+
+    def get(self, model_path: str, compiled: bool = True):
+        """loaded model of a path, from the cache if its version didn't change
+
+        Parameters
+        ----------
+        model_path : str
+            exported model directory, or pickle file
+        compiled : bool
+            whether the numpy predictor of an exported prophet model is wanted
+
+        Returns
+        -------
+        NumpyProphet or sktime forecaster
+            loaded model
+        """
+        path = os.path.realpath(model_path)
+        for attempt in range(2):
+            version = model_version(path)
+            key = (path, compiled, version)
+            with self.lock:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return self.entries[key][0]
+            try:
+                model = load_forecaster(path, compiled=compiled)
+                break
+            except ValueError:
+                # artifact replaced while it was read, reload the new version
+                if attempt == 1:
+                    raise
+        size = len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+        with self.lock:
+            self.stats["misses"] += 1
+            previous = self.versions.get((path, compiled))
+            if previous is not None and previous != version:
+                self.entries.pop((path, compiled, previous), None)
+                self.stats["swaps"] += 1
+                print(f"model of {path} swapped from {previous[:12]} to {version[:12]}")
+            self.versions[(path, compiled)] = version
+            self.entries[key] = (model, size)
+            self.evict()
+        return model
+
+    def evict(self) -> None:
+        """drop least recently used models until the cache fits the budget"""
+        while len(self.entries) > 1 and self.cached_bytes() > self.memory_budget:
+            (path, compiled, _), _ = self.entries.popitem(last=False)
+            self.versions.pop((path, compiled), None)
+            self.stats["evictions"] += 1
+
+
+def get_registry(memory_budget_mb: Optional[float] = None) -> ModelRegistry:
+    """registry shared by the tasks of the process,
+    the memory budget of the first call is kept."""
+    global _REGISTRY
+    with _REGISTRY_LOCK:
+        if _REGISTRY is None:
+            _REGISTRY = ModelRegistry(memory_budget_mb or DEFAULT_MEMORY_BUDGET_MB)
+        return _REGISTRY
+
+
+def publish_pickle(model, model_path: str) -> None:
+    """atomically publish a pickled model, readers see the previous file
+    or the new one, never a partially written file."""
+    os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+    tmp_path = f"{model_path}.tmp"
+    with open(tmp_path, mode="wb") as pkl:
+        pickle.dump(model, pkl)
+    os.replace(tmp_path, model_path)
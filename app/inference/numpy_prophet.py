@@ -0,0 +1,176 @@
+from typing import Any, Dict, Optional
+import numpy as np
+import pandas as pd
+import json
+import os
+
+PREDICTOR_FILE = "predictor.json"
+SECONDS_PER_DAY = 3600 * 24.0
+
+
+class NumpyProphet:
+    """point forecast of a fitted prophet model with numpy only,
+    the piecewise-linear (or flat) trend plus the fourier seasonalities
+    (additive & multiplicative), `yhat = trend * (1 + multiplicative) + additive`.
+
+    Parameters
+    ----------
+    spec : Dict[str, Any]
+        coefficients, changepoints & seasonalities of `compile_prophet`
+    """
+
+    def __init__(self, spec: Dict[str, Any]) -> None:
+        self.spec = spec
+        self.start = pd.Timestamp(spec["start"])
+        self.t_scale = spec["t_scale"]
+        self.y_scale = spec["y_scale"]
+        self.floor = spec["floor"]
+        self.k = spec["k"]
+        self.m = spec["m"]
+        self.delta = np.asarray(spec["delta"], dtype=float)
+        self.changepoints_t = np.asarray(spec["changepoints_t"], dtype=float)
+        self.seasonalities = spec["seasonalities"]
+
+    def trend(self, t: np.ndarray) -> np.ndarray:
+        if self.spec["growth"] == "flat":
+            return np.full_like(t, self.m) * self.y_scale + self.floor
+        deltas_t = (self.changepoints_t[None, :] <= t[:, None]) * self.delta
+        k_t = deltas_t.sum(axis=1) + self.k
+        m_t = (deltas_t * -self.changepoints_t).sum(axis=1) + self.m
+        return (k_t * t + m_t) * self.y_scale + self.floor
+
+    def predict(self, dates) -> pd.Series:
+        """forecast `yhat` of the dates
+
+        Parameters
+        ----------
+        dates : array-like of datetimes
+            dates to forecast
+
+        Returns
+        -------
+        pd.Series
+            forecasted values indexed by the dates
+        """
+        index = pd.DatetimeIndex(dates)
+        t = (index - self.start).total_seconds().to_numpy() / self.t_scale
+        # days since epoch, the time variable of prophet's fourier series
+        days = index.asi8 // 10**9 / SECONDS_PER_DAY
+        additive = np.zeros(len(index))
+        multiplicative = np.zeros(len(index))
+        for seasonality in self.seasonalities:
+            order = np.arange(1, seasonality["fourier_order"] + 1)
+            x = 2 * np.pi * days[:, None] * order[None, :] / seasonality["period"]
+            beta = np.asarray(seasonality["beta"], dtype=float).reshape(-1, 2)
+            component = np.sin(x) @ beta[:, 0] + np.cos(x) @ beta[:, 1]
+            if seasonality["mode"] == "additive":
+                additive += component * self.y_scale
+            else:
+                multiplicative += component
+        yhat = self.trend(t) * (1 + multiplicative) + additive
+        return pd.Series(yhat, index=index, name="yhat")
+
+    def forecast(self, cutoff, horizon: int) -> pd.Series:
+        """forecast the `horizon` days after the cutoff"""
+        dates = pd.date_range(
+            pd.Timestamp(cutoff) + pd.Timedelta(days=1), periods=horizon, freq="D"
+        )
+        return self.predict(dates)
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as file:
+            json.dump(self.spec, file)
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyProphet":
+        with open(path, "r") as file:
+            return cls(json.load(file))
+
+
+def compile_prophet(forecaster) -> NumpyProphet:
+    """extract the fitted coefficients, changepoints & seasonalities of a
+    prophet model (or a sktime forecaster wrapping it) into a `NumpyProphet`.
+
+    Parameters
+    ----------
+    forecaster : prophet.Prophet or sktime Prophet
+        fitted model
+
+    Returns
+    -------
+    NumpyProphet
+        numpy evaluator of the model point forecast
+
+    Raises
+    ------
+    ValueError
+        if the model uses features the evaluator doesn't support
+        (logistic growth, holidays, extra regressors, conditional seasonalities)
+    """
+    model = getattr(forecaster, "_forecaster", forecaster)
+    if model.growth not in ("linear", "flat"):
+        raise ValueError(f"unsupported prophet growth {model.growth}")
+    if model.train_holiday_names is not None or model.extra_regressors:
+        raise ValueError("holidays & extra regressors aren't supported")
+    beta = np.nanmean(model.params["beta"], axis=0)
+    seasonalities = []
+    column = 0
+    # feature columns of prophet follow the order the seasonalities were added
+    for name, props in model.seasonalities.items():
+        if props["condition_name"] is not None:
+            raise ValueError(f"conditional seasonality {name} isn't supported")
+        width = 2 * props["fourier_order"]
+        seasonalities.append({
+            "name": name,
+            "period": float(props["period"]),
+            "fourier_order": int(props["fourier_order"]),
+            "mode": props["mode"],
+            "beta": beta[column : column + width].tolist(),
+        })
+        column += width
+    scaling = getattr(model, "scaling", "absmax")
+    spec = {
+        "growth": model.growth,
+        "start": model.start.isoformat(),
+        "t_scale": model.t_scale.total_seconds(),
+        "y_scale": float(model.y_scale),
+        "floor": float(model.y_min) if scaling == "minmax" else 0.0,
+        "k": float(np.nanmean(model.params["k"])),
+        "m": float(np.nanmean(model.params["m"])),
+        "delta": np.nanmean(model.params["delta"], axis=0).tolist(),
+        "changepoints_t": np.asarray(model.changepoints_t, dtype=float).tolist(),
+        "seasonalities": seasonalities,
+    }
+    return NumpyProphet(spec)
+
+
+def verify_predictor(
+    forecaster, predictor: NumpyProphet, dates, tolerance: float = 1e-6
+) -> float:
+    """compare the numpy forecast of the dates with prophet's `yhat`
+
+    Returns
+    -------
+    float
+        maximum absolute difference
+
+    Raises
+    ------
+    AssertionError
+        if the forecasts differ beyond the tolerance
+    """
+    model = getattr(forecaster, "_forecaster", forecaster)
+    expected = model.predict(pd.DataFrame({"ds": pd.DatetimeIndex(dates)}))["yhat"]
+    actual = predictor.predict(dates).to_numpy()
+    np.testing.assert_allclose(
+        actual, expected.to_numpy(), rtol=tolerance, atol=tolerance
+    )
+    return float(np.max(np.abs(actual - expected.to_numpy())))
+
+
+def load_predictor(model_path: str) -> Optional[NumpyProphet]:
+    """numpy predictor of an exported model directory, if it was compiled"""
+    path = os.path.join(model_path, PREDICTOR_FILE)
+    if os.path.isdir(model_path) and os.path.exists(path):
+        return NumpyProphet.load(path)
+    return None
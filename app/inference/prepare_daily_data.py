@@ -1,16 +1,51 @@
 from prefect import task, flow
-from prefect.tasks import task_input_hash
-import duckdb
+from app.storage.caching import (
+    ParquetSerializer,
+    query_cache_key,
+    query_results_storage,
+)
+from app.storage.connection import get_connection
+from app.storage.schema import DAILY_WEATHER_DATA, HOURLY_WEATHER_DATA, table_name
+from app.storage.upsert import date_range_predicate, upsert, upsert_query
 import pandas as pd
 import datetime
 
 
+def daily_aggregation_query(start_date: str, end_date: str) -> str:
+    """query aggregating hourly data between two dates (inclusive) to daily data,
+    using a range predicate on reading_timestamp."""
+    return f"""
+            SELECT location_id,
+                   date_trunc('day', reading_timestamp) AS reading_date,
+                   AVG(temperature) AS temperature,
+            FROM {table_name(HOURLY_WEATHER_DATA)}
+            WHERE {date_range_predicate("reading_timestamp", start_date, end_date)}
+            GROUP BY location_id, reading_date
+            """
+
+
+def daily_data_predicate(running_date: str) -> str:
+    """predicate of the hourly readings of the running date"""
+    return date_range_predicate("reading_timestamp", running_date, running_date)
+
+
+def daily_data_query(running_date: str) -> str:
+    """query aggregating hourly data of the running date to daily data"""
+    return daily_aggregation_query(running_date, running_date)
+
+
 @task(
     name="GetDailyData",
     description="get daily weather data from hourly data as dataframe",
     tags=["Get", "DailyData"],
-    cache_key_fn=task_input_hash,
-    cache_expiration=datetime.timedelta(minutes=10),
+    cache_key_fn=query_cache_key(
+        daily_data_query,
+        watermarks=[(HOURLY_WEATHER_DATA, "reading_timestamp", daily_data_predicate)],
+    ),
+    cache_expiration=datetime.timedelta(days=1),
+    persist_result=True,
+    result_storage=query_results_storage(),
+    result_serializer=ParquetSerializer(),
     retry_delay_seconds=30,
     retries=3,
     log_prints=True,
@@ -26,78 +61,70 @@ def get_daily_data(conn, running_date: str) -> pd.DataFrame:
          string format of pipeline running date
     """
     print(f"Get Daily Weather Data of {running_date}")
-    df_daily = conn.sql(f"""
-                        SELECT location_id,
-                               strftime(reading_timestamp, '%Y-%m-%d') AS reading_date,
-                               AVG(temperature) AS temperature,
-                        FROM ml_apps.weather_forecasting.hourly_weather_data
-                        WHERE strftime(reading_timestamp, '%Y-%m-%d') = '{running_date}'
-                        GROUP BY location_id, reading_date
-                        """).df()
+    df_daily = conn.sql(daily_data_query(running_date)).df()
     return df_daily
 
 
 @task(
-    name="CheckIfDailyExists",
-    description=(
-        "Check the MotherDuck if the Data of the passed date exists, and if it"
-        " removes it"
-    ),
-    tags=["Check", "DailyData", "DB"],
-    retry_delay_seconds=30,
+    name="LoadToDailyMotherDuck",
+    description="Load Data into MotherDuck Database",
+    tags=["load", "updated-data", "motherduck"],
+    retry_delay_seconds=60,
     retries=3,
     log_prints=True,
     timeout_seconds=60,
 )
-def check_if_data_exists(conn, running_date: str) -> None:
-    """Check the MotherDuck if the Data of the passed date exists,
-      and if it removes it
+def load_to_motherduck(df: pd.DataFrame, conn) -> None:
+    """Load Data into Database,
+    rows of existing (location_id, reading_date) are replaced
+    in the same statement.
 
     Parameters
     ----------
-    conn : MotherDuck Database Connection
-    running_dt: str
-         string format of pipeline running date
+    df : pd.DataFrame
+        API DataFrame
+    conn : motherduck database connection
     """
-    print(f"Check if Data Exist for the current-date: {running_date}")
-    daily_df = conn.sql(f"""
-                       SELECT * FROM ml_apps.weather_forecasting.daily_weather_data 
-                        WHERE strftime(reading_date, '%Y-%m-%d') = '{running_date}'
-                    """).df()
-    print(f"found {len(daily_df)} records")
-    if len(daily_df) > 0:
-        print("data found, and will be removed safely")
-        conn.sql(f"""
-                DELETE FROM ml_apps.weather_forecasting.daily_weather_data 
-                WHERE strftime(reading_date, '%Y-%m-%d') = '{running_date}'
-            """)
-        print("data removed successfully")
-    else:
-        print(f"no data exists for {running_date}")
+    n_rows = upsert(conn=conn, table=DAILY_WEATHER_DATA, data=df)
+    print(f"{n_rows} records Upserted Successfully into daily_weather_data Table")
 
 
 @task(
-    name="LoadToDailyMotherDuck",
-    description="Load Data into MotherDuck Database",
-    tags=["load", "updated-data", "motherduck"],
+    name="PrepareDailyDateRange",
+    description=(
+        "Aggregate hourly data of a date range to daily data, and upsert it into"
+        " MotherDuck"
+    ),
+    tags=["load", "backfill", "DailyData", "motherduck"],
     retry_delay_seconds=60,
     retries=3,
     log_prints=True,
-    timeout_seconds=60,
+    timeout_seconds=600,
 )
-def load_to_motherduck(df: pd.DataFrame, conn) -> None:
-    """Load Data into Database
+def prepare_daily_range(conn, start_date: str, end_date: str) -> int:
+    """aggregate hourly data between two dates (inclusive) into daily data,
+    and upsert it into the database in one statement.
 
     Parameters
     ----------
-    df : pd.DataFrame
-        API DataFrame
-    conn : motherduck database connection
+    conn : MotherDuck Database Connection
+    start_date : str
+        first date of the range
+    end_date : str
+        last date of the range
+
+    Returns
+    -------
+    int
+        number of upserted daily records
     """
-    conn.sql(
-        "INSERT INTO ml_apps.weather_forecasting.daily_weather_data SELECT * FROM df"
+    n_rows = upsert_query(
+        conn=conn,
+        table=DAILY_WEATHER_DATA,
+        query=daily_aggregation_query(start_date, end_date),
     )
-    print("Data Insert Successfully into daily_weather_data Table")
+    print(f"{n_rows} daily records of {start_date} -> {end_date} Prepared")
+    return n_rows
 
 
 @task(
@@ -112,7 +139,7 @@ def load_to_motherduck(df: pd.DataFrame, conn) -> None:
 def delete_out_of_range_data(conn, thresh_date: str) -> None:
     print("Deleting Out of Range Data")
     conn.sql(f"""
-            DELETE FROM ml_apps.weather_forecasting.daily_weather_data 
+            DELETE FROM {table_name(DAILY_WEATHER_DATA)} 
             WHERE reading_date <= CAST('{thresh_date}' AS DATE)-2000
         """)
     print("Data Deleted Successfully")
@@ -137,14 +164,11 @@ def data_prep_flow(db_token: str, date: str) -> None:
     """
     inference_flag = False
     print("Connecting To MotherDuck to Load Data")
-    with duckdb.connect(f"md:?motherduck_token={db_token}") as conn:
-        print("Connection Successfully intiated")
-        df = get_daily_data(conn=conn, running_date=date)
-        if len(df) > 0:
-            inference_flag = True
-            print(f"Daily Data for {date} Exists")
-            check_if_data_exists(conn=conn, running_date=date)
-            load_to_motherduck(df=df, conn=conn)
-            delete_out_of_range_data(conn=conn, thresh_date=date)
-    print("Connection with MotherDuck Closed")
+    conn = get_connection(db_token)
+    df = get_daily_data(conn=conn, running_date=date)
+    if len(df) > 0:
+        inference_flag = True
+        print(f"Daily Data for {date} Exists")
+        load_to_motherduck(df=df, conn=conn)
+        delete_out_of_range_data(conn=conn, thresh_date=date)
     return inference_flag
@@ -0,0 +1,438 @@
+from app.inference.forecast import HISTORY_DAYS, HORIZON, forecast_location
+from app.inference.model_loader import model_location
+from app.inference.model_registry import get_registry, model_version
+from app.inference.numpy_prophet import NumpyProphet
+from app.storage.backend import database_target
+from app.storage.caching import table_watermark
+from app.storage.connection import get_connection
+from app.storage.schema import DAILY_WEATHER_DATA, table_name
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from collections import OrderedDict
+from fastapi import FastAPI, HTTPException, Query
+from dotenv import dotenv_values
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+import pandas as pd
+import numpy as np
+import argparse
+import threading
+import asyncio
+import time
+import yaml
+
+
+class Forecast(NamedTuple):
+    """forecasted temperature of a location from an inference date"""
+
+    inference_date: str
+    reading_date: np.ndarray
+    forecasted_temperature: np.ndarray
+
+    def head(self, horizon: int) -> "Forecast":
+        return Forecast(
+            self.inference_date,
+            self.reading_date[:horizon],
+            self.forecasted_temperature[:horizon],
+        )
+
+
+def cutoff_query(location_ids: List[int], last_date) -> str:
+    """query of the last reading date of the locations, within the window
+    of their histories"""
+    ids = ", ".join(str(int(location_id)) for location_id in location_ids)
+    return (
+        "SELECT location_id, max(reading_date) AS cutoff"
+        f" FROM {table_name(DAILY_WEATHER_DATA)} WHERE location_id IN ({ids})"
+        f" AND reading_date >= CAST('{last_date}' AS DATE)"
+        f" - INTERVAL '{HISTORY_DAYS} days'"
+        " GROUP BY location_id"
+    )
+
+
+def predict_numpy(
+    model: NumpyProphet, cutoffs: np.ndarray, horizon: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """forecast the `horizon` days after the cutoffs of many locations
+    in one `predict` call
+
+    Parameters
+    ----------
+    model : NumpyProphet
+        numpy predictor of an exported model
+    cutoffs : np.ndarray
+        last reading date of every location, as datetime64[D]
+    horizon : int
+        number of forecasted days
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        forecasted dates & temperatures, one row per location
+    """
+    dates = cutoffs[:, None] + np.arange(1, horizon + 1)
+    yhat = model.predict(dates.ravel().astype("datetime64[ns]")).to_numpy()
+    return dates, yhat.reshape(dates.shape)
+
+
+def history_query(location_ids: List[int], last_date) -> str:
+    """query of the daily histories of the locations up to the last loaded date"""
+    ids = ", ".join(str(int(location_id)) for location_id in location_ids)
+    return (
+        "SELECT location_id, reading_date, temperature"
+        f" FROM {table_name(DAILY_WEATHER_DATA)} WHERE location_id IN ({ids})"
+        f" AND reading_date >= CAST('{last_date}' AS DATE)"
+        f" - INTERVAL '{HISTORY_DAYS} days'"
+        " ORDER BY location_id, reading_date"
+    )
+
+
+def served_window_predicate() -> str:
+    """predicate of the history window read by the service, the last
+    HISTORY_DAYS days before the last loaded date"""
+    return (
+        "reading_date >= (SELECT max(reading_date)"
+        f" FROM {table_name(DAILY_WEATHER_DATA)})"
+        f" - INTERVAL '{HISTORY_DAYS} days'"
+    )
+
+
+class NoDataError(RuntimeError):
+    """daily_weather_data has no readings to forecast from yet"""
+
+
+class ResultCache:
+    """LRU cache of forecasts keyed by (location, data watermark, horizon),
+    shared by the event loop & the batching thread."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.entries: "OrderedDict[Tuple, Forecast]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[Forecast]:
+        with self.lock:
+            preds = self.entries.get(key)
+            if preds is not None:
+                self.entries.move_to_end(key)
+            return preds
+
+    def put(self, key: Tuple, preds: Forecast) -> None:
+        with self.lock:
+            self.entries[key] = preds
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+class ForecastService:
+    """online forecasts of the locations from the latest loaded daily data,
+    with the models of the model registry preloaded at start-up.
+
+    requests missing the result cache are queued, and coalesced by a batching
+    loop into one predict call per batch: the histories of the batch locations
+    are read in one query, every location is forecasted once for the longest
+    requested horizon, and the numpy predictors forecast all their locations
+    in a single vectorised `predict`.
+
+    the data watermark (last reading date, row count & checksum of the served
+    history window of daily_weather_data)
+    and the model versions are refreshed at most every `refresh_seconds`,
+    a new version of a model clears the result cache. requests fail with
+    `NoDataError` as long as daily_weather_data is empty.
+
+    Parameters
+    ----------
+    db_token : str
+        MotherDuck token, or local/in-memory database target
+    model_path : str
+        exported model directory, or pickle file
+    location_models : Optional[Dict[int, str]]
+        models of specific locations, other locations use `model_path`
+    max_batch : int
+        maximum number of requests of a predict call
+    max_wait_ms : float
+        time a request waits for others to share its predict call
+    cache_size : int
+        maximum number of cached forecasts
+    refresh_seconds : float
+        minimum number of seconds between two watermark & model checks
+    max_horizon : int
+        longest horizon that can be requested
+    """
+
+    def __init__(
+        self,
+        db_token: str,
+        model_path: str,
+        location_models: Optional[Dict[int, str]] = None,
+        max_batch: int = 64,
+        max_wait_ms: float = 5.0,
+        cache_size: int = 4096,
+        refresh_seconds: float = 5.0,
+        max_horizon: int = HORIZON,
+    ) -> None:
+        self.db_token = db_token
+        self.model_path = model_path
+        self.location_models = location_models or {}
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.refresh_seconds = refresh_seconds
+        self.max_horizon = max_horizon
+        self.cache = ResultCache(cache_size)
+        self.watermark: Optional[Tuple[Any, int, int]] = None
+        self.inference_date: Optional[str] = None
+        self.versions: Dict[str, str] = {}
+        self.refreshed_at = 0.0
+        self.stats = {
+            "requests": 0,
+            "cache_hits": 0,
+            "batches": 0,
+            "batched_requests": 0,
+            "predict_seconds": 0.0,
+        }
+        self.queue: Optional[asyncio.Queue] = None
+        # the database connection & models are only used by the batching thread
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def model_paths(self) -> List[str]:
+        return sorted({self.model_path, *self.location_models.values()})
+
+    def start(self) -> None:
+        """register & load the models, and read the data watermark"""
+        registry = get_registry()
+        for location_id, path in self.location_models.items():
+            registry.register(location_id, path)
+        self.refresh(force=True)
+        print(f"service started with models {self.versions}")
+
+    def refresh(self, force: bool = False) -> None:
+        if not force and time.monotonic() - self.refreshed_at < self.refresh_seconds:
+            return
+        conn = get_connection(self.db_token)
+        watermark = table_watermark(
+            conn, DAILY_WEATHER_DATA, "reading_date", served_window_predicate()
+        )
+        if watermark[0] is None:
+            # no readings yet, checked again at the next refresh
+            self.watermark, self.inference_date = None, None
+        else:
+            self.watermark = watermark
+            self.inference_date = pd.Timestamp(watermark[0]).strftime("%Y-%m-%d")
+        versions = {path: model_version(path) for path in self.model_paths()}
+        if versions != self.versions:
+            for path in versions:
+                get_registry().get(path)
+            self.cache.clear()
+            self.versions = versions
+        self.refreshed_at = time.monotonic()
+
+    def cache_key(self, location_id: int, horizon: int) -> Tuple:
+        return (location_id, self.watermark, horizon)
+
+    def predict_batch(self, requests: List[Tuple[int, int]]) -> List[Any]:
+        """forecasts of a batch of (location_id, horizon) requests
+
+        Returns
+        -------
+        List[Any]
+            forecast of every request, or the KeyError of
+            a location without history
+
+        Raises
+        ------
+        NoDataError
+            if daily_weather_data is empty
+        """
+        start = time.perf_counter()
+        self.refresh()
+        if self.watermark is None:
+            raise NoDataError("no daily weather data to forecast from")
+        forecasts = {}
+        missing: Dict[int, Set[int]] = {}
+        for location_id, horizon in requests:
+            preds = self.cache.get(self.cache_key(location_id, horizon))
+            if preds is not None:
+                forecasts[(location_id, horizon)] = preds
+            else:
+                missing.setdefault(location_id, set()).add(horizon)
+        if missing:
+            horizons = {location_id: max(h) for location_id, h in missing.items()}
+            for location_id, preds in self.predict_locations(horizons).items():
+                for horizon in missing[location_id]:
+                    forecasts[(location_id, horizon)] = preds.head(horizon)
+                    self.cache.put(
+                        self.cache_key(location_id, horizon), preds.head(horizon)
+                    )
+        results = [
+            forecasts.get(request, KeyError(f"no history of location {request[0]}"))
+            for request in requests
+        ]
+        self.stats["batches"] += 1
+        self.stats["batched_requests"] += len(requests)
+        self.stats["predict_seconds"] += time.perf_counter() - start
+        return results
+
+    def predict_locations(self, horizons: Dict[int, int]) -> Dict[int, Forecast]:
+        """forecasts of the locations for their horizons, numpy predictors
+        only need the cutoff of every location, other models read its history."""
+        conn = get_connection(self.db_token)
+        registry = get_registry()
+        paths = {
+            location_id: registry.model_path(location_id, default=self.model_path)
+            for location_id in horizons
+        }
+        models = {path: registry.get(path) for path in set(paths.values())}
+        numpy_locations: Dict[str, List[int]] = {}
+        other_locations = []
+        for location_id, path in paths.items():
+            if isinstance(models[path], NumpyProphet):
+                numpy_locations.setdefault(path, []).append(location_id)
+            else:
+                other_locations.append(location_id)
+        preds = {}
+        for path, location_ids in numpy_locations.items():
+            cutoffs = conn.sql(cutoff_query(location_ids, self.watermark[0])).df()
+            dates, yhat = predict_numpy(
+                models[path],
+                cutoffs["cutoff"].to_numpy().astype("datetime64[D]"),
+                max(horizons[location_id] for location_id in location_ids),
+            )
+            for i, location_id in enumerate(cutoffs["location_id"]):
+                preds[location_id] = Forecast(self.inference_date, dates[i], yhat[i])
+        if other_locations:
+            hist_df = conn.sql(history_query(other_locations, self.watermark[0])).df()
+            for location_id, history in hist_df.groupby("location_id", sort=True):
+                location_preds = forecast_location(
+                    models[paths[location_id]],
+                    location_id,
+                    history,
+                    self.inference_date,
+                    horizon=horizons[location_id],
+                )
+                preds[location_id] = Forecast(
+                    self.inference_date,
+                    location_preds["reading_date"].to_numpy().astype("datetime64[D]"),
+                    location_preds["forecasted_temperature"].to_numpy(),
+                )
+        return preds
+
+    async def forecast(self, location_id: int, horizon: int) -> Forecast:
+        """forecast of a location, from the cache or the next predict batch"""
+        self.stats["requests"] += 1
+        if time.monotonic() - self.refreshed_at < self.refresh_seconds:
+            preds = self.cache.get(self.cache_key(location_id, horizon))
+            if preds is not None:
+                self.stats["cache_hits"] += 1
+                return preds
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(((location_id, horizon), future))
+        return await future
+
+    async def batch_loop(self) -> None:
+        """coalesce the queued requests into predict batches"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            if self.queue.qsize() < self.max_batch - 1:
+                await asyncio.sleep(self.max_wait)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            requests = [request for request, _ in batch]
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.predict_batch, requests
+                )
+            except Exception as error:
+                results = [error] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def describe(self) -> Dict[str, Any]:
+        batches = max(self.stats["batches"], 1)
+        return {
+            "watermark": [str(value) for value in self.watermark or []],
+            "models": self.versions,
+            "cached_forecasts": len(self.cache.entries),
+            "mean_batch_size": self.stats["batched_requests"] / batches,
+            "stats": self.stats,
+            "registry": get_registry().stats,
+        }
+
+
+def create_app(service: ForecastService) -> FastAPI:
+    """FastAPI application of the forecast service"""
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(service.executor, service.start)
+        service.queue = asyncio.Queue()
+        batcher = asyncio.create_task(service.batch_loop())
+        yield
+        batcher.cancel()
+
+    app = FastAPI(title="Weather Forecasting Service", lifespan=lifespan)
+
+    @app.get("/forecast")
+    async def forecast(
+        location_id: int,
+        horizon: int = Query(HORIZON, ge=1, le=service.max_horizon),
+    ) -> Dict[str, Any]:
+        try:
+            preds = await service.forecast(location_id, horizon)
+        except KeyError as error:
+            raise HTTPException(status_code=404, detail=str(error.args[0]))
+        except NoDataError as error:
+            raise HTTPException(status_code=503, detail=str(error))
+        return {
+            "location_id": location_id,
+            "horizon": horizon,
+            "inference_date": preds.inference_date,
+            "reading_date": np.datetime_as_string(preds.reading_date).tolist(),
+            "forecasted_temperature": preds.forecasted_temperature.tolist(),
+        }
+
+    @app.get("/health")
+    async def health() -> Dict[str, Any]:
+        return service.describe()
+
+    return app
+
+
+def build_service(conf: Dict[str, Any], db_token: str) -> ForecastService:
+    """forecast service of the production model & the parameters file"""
+    get_registry(memory_budget_mb=conf["inference"]["model_cache_mb"])
+    service_params = conf["service"]
+    return ForecastService(
+        db_token=db_token,
+        model_path=model_location(conf),
+        location_models=conf["inference"]["location_models"],
+        max_batch=service_params["max_batch"],
+        max_wait_ms=service_params["max_wait_ms"],
+        cache_size=service_params["cache_size"],
+        refresh_seconds=service_params["refresh_seconds"],
+        max_horizon=service_params["max_horizon"],
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="online forecast service")
+    parser.add_argument("--conf", default="conf/params.yaml")
+    args = parser.parse_args()
+    with open(args.conf, mode="r") as file:
+        conf = yaml.safe_load(file)
+    service = build_service(conf, database_target(dotenv_values(".env")))
+    uvicorn.run(
+        create_app(service), host=conf["service"]["host"], port=conf["service"]["port"]
+    )
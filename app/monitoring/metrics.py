@@ -0,0 +1,85 @@
+from scipy.special import ndtri
+from typing import Any, Dict
+import numpy as np
+
+# fields of a performance report stored by perf_to_db
+METRIC_FIELDS = [
+    "rmse",
+    "mean_error",
+    "error_std",
+    "mean_abs_error",
+    "abs_error_std",
+    "mean_abs_perc_error",
+    "abs_perc_error_std",
+    "order_statistic_medians_x",
+    "order_statistic_medians_y",
+    "slope",
+    "intercept",
+    "r",
+]
+
+
+def order_statistic_medians(n: int) -> np.ndarray:
+    """Filliben's estimate of the medians of the order statistics of n normal
+    samples, the theoretical quantiles of `scipy.stats.probplot`."""
+    uniform = (np.arange(1, n + 1) - 0.3175) / (n + 0.365)
+    uniform[-1] = 0.5 ** (1.0 / n)
+    uniform[0] = 1 - uniform[-1]
+    return ndtri(uniform)
+
+
+def regression_metrics(target, prediction) -> Dict[str, Any]:
+    """performance measures of forecasts vs actual values, the fields of
+    evidently's RegressionQualityMetric (current data) & error normality
+    that are stored by perf_to_db, computed with numpy in one pass.
+
+    errors are `prediction - target`, standard deviations use ddof=1,
+    and percentage errors are divided by max(target, eps) as evidently does.
+    the normality Q-Q plot is the sorted errors vs the normal order statistic
+    medians, and its least squares line (slope, intercept & r).
+
+    Parameters
+    ----------
+    target : array-like
+        actual values
+    prediction : array-like
+        forecasted values
+
+    Returns
+    -------
+    Dict[str, Any]
+        dictionary of performance report, every measure is None
+        if less than 2 valid rows are left
+    """
+    target = np.asarray(target, dtype=np.float64)
+    prediction = np.asarray(prediction, dtype=np.float64)
+    # rows with missing or infinite values are dropped
+    valid = np.isfinite(target) & np.isfinite(prediction)
+    target, prediction = target[valid], prediction[valid]
+    if len(target) < 2:
+        # standard deviations & the Q-Q line need 2 errors at least
+        return {field: None for field in METRIC_FIELDS}
+    error = prediction - target
+    abs_error = np.abs(error)
+    abs_perc_error = abs_error / np.maximum(target, np.finfo(np.float64).eps)
+    sorted_error = np.sort(error)
+    quantiles = order_statistic_medians(len(error))
+    x = quantiles - quantiles.mean()
+    y = sorted_error - sorted_error.mean()
+    sxx, syy, sxy = x @ x, y @ y, x @ y
+    slope = sxy / sxx
+    r = sxy / np.sqrt(sxx * syy) if sxx * syy > 0 else 0.0
+    return {
+        "rmse": float(np.sqrt(np.mean(error**2))),
+        "mean_error": float(error.mean()),
+        "error_std": float(error.std(ddof=1)),
+        "mean_abs_error": float(abs_error.mean()),
+        "abs_error_std": float(abs_error.std(ddof=1)),
+        "mean_abs_perc_error": float(100.0 * abs_perc_error.mean()),
+        "abs_perc_error_std": float(abs_perc_error.std(ddof=1)),
+        "order_statistic_medians_x": quantiles.tolist(),
+        "order_statistic_medians_y": sorted_error.tolist(),
+        "slope": float(slope),
+        "intercept": float(sorted_error.mean() - slope * quantiles.mean()),
+        "r": float(np.clip(r, -1.0, 1.0)),
+    }
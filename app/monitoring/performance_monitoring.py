@@ -1,25 +1,161 @@
 from prefect import task, flow
-from prefect.tasks import task_input_hash
-from typing import Dict, Any
-from evidently.report import Report
-from evidently.metrics import (
-    RegressionQualityMetric,
-    RegressionPredictedVsActualPlot,
-    RegressionAbsPercentageErrorPlot,
-    RegressionErrorNormality,
-    RegressionTopErrorMetric,
+from app.storage.caching import (
+    ParquetSerializer,
+    query_cache_key,
+    query_results_storage,
 )
-import duckdb
+from app.storage.connection import get_connection
+from app.storage.schema import (
+    DATABASE,
+    DAILY_FORECASTED_WEATHER,
+    DAILY_WEATHER_DATA,
+    PERFORMANCE_MONITORING,
+    table_name,
+)
+from app.monitoring.metrics import METRIC_FIELDS, regression_metrics
+from typing import Dict, Any, Optional
 import pandas as pd
+import numpy as np
 import datetime
+import os
+
+
+def forecasts_data_predicate(running_date: str) -> str:
+    """predicate of the forecasts of the last 30 days, inferred up to
+    the running date"""
+    return f"""reading_date BETWEEN
+            CAST('{running_date}' AS DATE) - INTERVAL '32 days'
+            AND CAST('{running_date}' AS DATE) - INTERVAL '2 days'
+            AND inference_date <= CAST('{running_date}' AS DATE)"""
+
+
+def actuals_data_predicate(running_date: str) -> str:
+    """predicate of the actual temperature of the last 30 days"""
+    return f"""reading_date BETWEEN
+            CAST('{running_date}' AS DATE) - INTERVAL '32 days'
+            AND CAST('{running_date}' AS DATE) - INTERVAL '2 days'"""
+
+
+def forecasts_data_query(running_date: str) -> str:
+    """query of the latest forecasted temperature of the last 30 days,
+    daily runs & replays store overlapping vintages (one per inference date)
+    of every reading date, the latest one inferred up to the running date
+    is kept."""
+    return f"""
+            SELECT location_id, reading_date, forecasted_temperature
+            FROM {table_name(DAILY_FORECASTED_WEATHER)}
+            WHERE {forecasts_data_predicate(running_date)}
+            QUALIFY row_number() OVER (
+                PARTITION BY location_id, reading_date ORDER BY inference_date DESC
+            ) = 1
+            """
+
+
+def monitoring_data_query(running_date: str) -> str:
+    """query joining the latest forecasted & actual temperature
+    of the last 30 days"""
+    return f"""
+                  SELECT t1.location_id,
+                  t1.reading_date,
+                  t1.forecasted_temperature,
+                  t2.temperature
+                  FROM ({forecasts_data_query(running_date)}) AS t1
+                  INNER JOIN (
+                  SELECT location_id, 
+                  reading_date, 
+                  temperature
+                  FROM {table_name(DAILY_WEATHER_DATA)}
+                  ) AS t2 ON t2.reading_date=t1.reading_date AND 
+                       t2.location_id = t1.location_id
+                  WHERE t1.reading_date BETWEEN 
+                  CAST('{running_date}' AS DATE) - INTERVAL '32 days' 
+                  AND CAST('{running_date}' AS DATE) - INTERVAL '2 days';
+                  """
+
+
+@task(
+    name="GetLast30DaysForecasts",
+    description="get last 30 days of forecasting data",
+    tags=["Get", "Data", "Forecasting"],
+    cache_key_fn=query_cache_key(
+        forecasts_data_query,
+        watermarks=[
+            (DAILY_FORECASTED_WEATHER, "inference_date", forecasts_data_predicate)
+        ],
+    ),
+    cache_expiration=datetime.timedelta(days=1),
+    persist_result=True,
+    result_storage=query_results_storage(),
+    result_serializer=ParquetSerializer(),
+    retry_delay_seconds=30,
+    retries=3,
+    log_prints=True,
+    timeout_seconds=60,
+)
+def get_forecasts_data(conn, running_date: str) -> pd.DataFrame:
+    """get forcasting data of temperature of the last 30 days
+
+    Parameters
+    ----------
+    conn : MotherDuck Database Connection
+    running_date : str
+       string format of pipeline running date
+
+    Returns
+    -------
+    pd.DataFrame
+        pandas dataframe of forecasted temperature
+    """
+    print("Getting Forecasting Temperacture Data")
+    return conn.sql(forecasts_data_query(running_date)).df()
+
+
+def join_actuals(
+    forecasts_df: pd.DataFrame, actuals_df: pd.DataFrame, running_date: str
+) -> pd.DataFrame:
+    """join forecasts with the actual temperature already in memory,
+    same output of get_monitoring_data.
+
+    Parameters
+    ----------
+    forecasts_df : pd.DataFrame
+        latest forecasted temperature of the last 30 days,
+        one vintage per location & reading date (get_forecasts_data)
+    actuals_df : pd.DataFrame
+        daily temperature covering the last 30 days
+    running_date : str
+       string format of pipeline running date
+
+    Returns
+    -------
+    pd.DataFrame
+        pandas dataframe of true and forecasted temperature
+    """
+    running_date = pd.Timestamp(running_date)
+    actuals = actuals_df.loc[
+        actuals_df["reading_date"].between(
+            running_date - pd.Timedelta(days=32), running_date - pd.Timedelta(days=2)
+        ),
+        ["location_id", "reading_date", "temperature"],
+    ]
+    return forecasts_df.merge(actuals, on=["location_id", "reading_date"])
 
 
 @task(
     name="GetLast30DaysData",
     description="get last 30 days of real/forecasting data",
     tags=["Get", "Data", "Real/Forecasting"],
-    cache_key_fn=task_input_hash,
-    cache_expiration=datetime.timedelta(minutes=10),
+    cache_key_fn=query_cache_key(
+        monitoring_data_query,
+        watermarks=[
+            (DAILY_FORECASTED_WEATHER, "inference_date", forecasts_data_predicate),
+            (DAILY_WEATHER_DATA, "reading_date", actuals_data_predicate),
+        ],
+    ),
+    cache_expiration=datetime.timedelta(days=1),
+    persist_result=True,
+    result_storage=query_results_storage(),
+    result_serializer=ParquetSerializer(),
     retry_delay_seconds=30,
     retries=3,
     log_prints=True,
@@ -40,30 +176,9 @@ def get_monitoring_data(conn, running_date: str) -> pd.DataFrame:
     pd.DataFrame
         pandas dataframe of true and forecasted temperature
     """
-    conn.sql("USE ml_apps")
+    conn.sql(f"USE {DATABASE}")
     print("Getting Actual/Forecasting Temperacture Data")
-    df = conn.sql(f"""
-                  SELECT t1.location_id,
-                  t1.reading_date,
-                  t1.forecasted_temperature,
-                  t2.temperature
-                  FROM (
-                  SELECT location_id, 
-                  reading_date, 
-                  forecasted_temperature
-                  FROM ml_apps.weather_forecasting.daily_forecasted_weather
-                  ) AS t1
-                  INNER JOIN (
-                  SELECT location_id, 
-                  reading_date, 
-                  temperature
-                  FROM ml_apps.weather_forecasting.daily_weather_data
-                  ) AS t2 ON t2.reading_date=t1.reading_date AND 
-                       t2.location_id = t1.location_id
-                  WHERE t1.reading_date BETWEEN 
-                  CAST('{running_date}' AS DATE) - INTERVAL '32 days' 
-                  AND CAST('{running_date}' AS DATE) - INTERVAL '2 days';
-                  """).df()
+    df = conn.sql(monitoring_data_query(running_date)).df()
     return df
 
 
@@ -76,7 +191,12 @@ def get_monitoring_data(conn, running_date: str) -> pd.DataFrame:
     log_prints=True,
     timeout_seconds=120,
 )
-def perf_reporter(ref_df: pd.DataFrame, curr_df: pd.DataFrame) -> Dict[str, Any]:
+def perf_reporter(
+    ref_df: pd.DataFrame,
+    curr_df: pd.DataFrame,
+    engine: str = "numpy",
+    report_path: Optional[str] = None,
+) -> Dict[str, Any]:
     """generate model performance report
 
     Parameters
@@ -86,12 +206,48 @@ def perf_reporter(ref_df: pd.DataFrame, curr_df: pd.DataFrame) -> Dict[str, Any]
         model performance on
     curr_df : pd.DataFrame
        new dataframe that will test model performance on
+    engine : str
+        "numpy" computes the stored measures only,
+        "evidently" runs the full evidently report
+    report_path : Optional[str]
+        html file the evidently report is rendered to, if passed
 
     Returns
     -------
     Dict[str, Any]
-        dictionary of performance report
+        dictionary of performance report, measures are None
+        if less than 2 rows can be measured
     """
+    print("calculating model performance metrics")
+    if engine not in ("numpy", "evidently"):
+        raise ValueError(f"unknown performance report engine {engine}")
+    metrics = regression_metrics(
+        target=curr_df["target"].to_numpy(),
+        prediction=curr_df["prediction"].to_numpy(),
+    )
+    # measures are None below 2 valid rows, evidently would return NaNs
+    if engine == "numpy" or metrics["rmse"] is None:
+        return metrics
+    performance_report = evidently_report(ref_df=ref_df, curr_df=curr_df)
+    if report_path is not None:
+        os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+        performance_report.save_html(report_path)
+    result = performance_report.as_dict()["metrics"][0]["result"]
+    return {**result["current"], **result["error_normality"]}
+
+
+def evidently_report(ref_df: pd.DataFrame, curr_df: pd.DataFrame):
+    """run the evidently regression performance report, with its plots"""
+    # evidently is only imported when its report is wanted
+    from evidently.report import Report
+    from evidently.metrics import (
+        RegressionQualityMetric,
+        RegressionPredictedVsActualPlot,
+        RegressionAbsPercentageErrorPlot,
+        RegressionErrorNormality,
+        RegressionTopErrorMetric,
+    )
+
     performance_report = Report(
         metrics=[
             RegressionQualityMetric(),
@@ -101,14 +257,11 @@ def perf_reporter(ref_df: pd.DataFrame, curr_df: pd.DataFrame) -> Dict[str, Any]
             RegressionTopErrorMetric(),
         ]
     )
-    print("calculating model performance metrics")
     performance_report.run(
         reference_data=ref_df,
         current_data=curr_df,
     )
-    measures = performance_report.as_dict()["metrics"][0]["result"]["current"]
-    normality = performance_report.as_dict()["metrics"][0]["result"]["error_normality"]
-    return {**measures, **normality}
+    return performance_report
 
 
 @task(
@@ -136,36 +289,40 @@ def perf_to_db(
     location_id: str
        id of the location
     """
-    conn.sql("USE ml_apps")
-    print(
-        f"Deleting performance data records of {monitoring_date} and {location_id} if"
-        " they exists"
-    )
-    conn.sql(f"""
-             DELETE FROM ml_apps.weather_forecasting.performance_monitoring
-             WHERE monitoring_date = CAST('{monitoring_date}' AS DATE) AND
-             location_id = {location_id};
-             """)
-    print("Inserting New Records")
-    conn.sql(f"""
-             INSERT INTO ml_apps.weather_forecasting.performance_monitoring
-             VALUES(
-             {location_id},
-             CAST('{monitoring_date}' AS DATE),
-             {perf_report['rmse']},
-             {perf_report['mean_error']},
-             {perf_report['error_std']},
-             {perf_report['mean_abs_error']},
-             {perf_report['abs_error_std']},
-             {perf_report['mean_abs_perc_error']},
-             {perf_report['abs_perc_error_std']},
-             {perf_report['order_statistic_medians_x']},
-             {perf_report['order_statistic_medians_y']},
-             {perf_report['slope']},
-             {perf_report['intercept']},
-             {perf_report['r']}
-             );
-             """)
+    # LIST columns can't be updated on conflict by duckdb,
+    # so the report is replaced by delete & insert in one transaction.
+    conn.sql(f"USE {DATABASE}")
+    conn.begin()
+    try:
+        print(
+            f"Deleting performance data records of {monitoring_date} and"
+            f" {location_id} if they exists"
+        )
+        conn.execute(
+            f"""
+                 DELETE FROM {table_name(PERFORMANCE_MONITORING)}
+                 WHERE monitoring_date = CAST(? AS DATE) AND
+                 location_id = ?;
+                 """,
+            [monitoring_date, int(location_id)],
+        )
+        print("Inserting New Records")
+        # python floats & lists of the numpy/evidently measures
+        values = [
+            np.asarray(perf_report[field], dtype=float).tolist()
+            for field in METRIC_FIELDS
+        ]
+        conn.execute(
+            f"""
+                 INSERT INTO {table_name(PERFORMANCE_MONITORING)}
+                 VALUES(?, CAST(? AS DATE), {", ".join("?" * len(values))});
+                 """,
+            [int(location_id), monitoring_date, *values],
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
 
 @task(
@@ -180,7 +337,7 @@ def perf_to_db(
 def delete_out_of_range_data(conn, thresh_date: str) -> None:
     print("Deleting Out of Range Data")
     conn.sql(f"""
-            DELETE FROM ml_apps.weather_forecasting.performance_monitoring
+            DELETE FROM {table_name(PERFORMANCE_MONITORING)}
             WHERE monitoring_date <= CAST('{thresh_date}' AS DATE)-1000
         """)
     print("Data Deleted Successfully")
@@ -192,7 +349,13 @@ def delete_out_of_range_data(conn, thresh_date: str) -> None:
     validate_parameters=True,
     log_prints=True,
 )
-def perf_monitor_flow(db_token: str, date: str) -> None:
+def perf_monitor_flow(
+    db_token: str,
+    date: str,
+    actuals_df: Optional[pd.DataFrame] = None,
+    engine: str = "numpy",
+    report_dir: Optional[str] = None,
+) -> None:
     """sub-flow of preparing data of performance monitoring
 
     Parameters
@@ -200,28 +363,50 @@ def perf_monitor_flow(db_token: str, date: str) -> None:
     db_token: MotherDuck Database Credentials
     date: str
         running date of the process,
+    actuals_df: Optional[pd.DataFrame]
+        daily temperature already read by a parent flow,
+        if passed only forecasts are read from the database.
+    engine : str
+        "numpy" measures, or the full "evidently" report
+    report_dir : Optional[str]
+        directory of the html evidently reports of every location,
+        only rendered by the evidently engine
     """
     print("Connecting To MotherDuck to Load Data")
-    with duckdb.connect(f"md:?motherduck_token={db_token}") as conn:
-        print("Connection Successfully intiated")
+    conn = get_connection(db_token)
+    if actuals_df is None:
         df = get_monitoring_data(conn, date)
-        location_ids = df["location_id"].unique()
-        for location_id in location_ids:
-            print(f"Calculating performance and storing results of {location_id}")
-            perf_df = df[["reading_date", "temperature", "forecasted_temperature"]]
-            perf_df.rename(
-                columns={
-                    "temperature": "target",
-                    "forecasted_temperature": "prediction",
-                },
-                inplace=True,
-            )
-            perf_df.set_index("reading_date", inplace=True)
-            perf_report = perf_reporter(ref_df=perf_df, curr_df=perf_df)
-            perf_to_db(
-                conn=conn,
-                perf_report=perf_report,
-                monitoring_date=date,
-                location_id=location_id,
+    else:
+        df = join_actuals(get_forecasts_data(conn, date), actuals_df, date)
+    location_ids = df["location_id"].unique()
+    for location_id in location_ids:
+        print(f"Calculating performance and storing results of {location_id}")
+        perf_df = df.loc[
+            df["location_id"] == location_id,
+            ["reading_date", "temperature", "forecasted_temperature"],
+        ]
+        perf_df = perf_df.rename(
+            columns={
+                "temperature": "target",
+                "forecasted_temperature": "prediction",
+            },
+        )
+        perf_df = perf_df.set_index("reading_date")
+        report_path = None
+        if report_dir is not None:
+            report_path = os.path.join(
+                report_dir, f"performance_{location_id}_{date}.html"
             )
-        delete_out_of_range_data(conn=conn, thresh_date=date)
+        perf_report = perf_reporter(
+            ref_df=perf_df, curr_df=perf_df, engine=engine, report_path=report_path
+        )
+        if any(perf_report[field] is None for field in METRIC_FIELDS):
+            print(f"not enough forecasts of {location_id} to measure performance")
+            continue
+        perf_to_db(
+            conn=conn,
+            perf_report=perf_report,
+            monitoring_date=date,
+            location_id=location_id,
+        )
+    delete_out_of_range_data(conn=conn, thresh_date=date)
@@ -0,0 +1,85 @@
+from app.storage.schema import DATABASE, SCHEMA, TABLE_COLUMNS, table_ddl
+from typing import Dict, Tuple
+import duckdb
+
+MOTHERDUCK = "motherduck"
+LOCAL = "local"
+MEMORY = "memory"
+
+LOCAL_PREFIX = "local:"
+MEMORY_TARGET = ":memory:"
+
+
+def resolve_target(db_token: str) -> Tuple[str, str]:
+    """resolve the database target passed to the flows as db_token.
+
+    - `:memory:` is an in-memory database,
+    - `local:<path>` is a local duckdb file,
+    - anything else is a MotherDuck token.
+
+    Parameters
+    ----------
+    db_token : str
+        MotherDuck token, or local/in-memory database target
+
+    Returns
+    -------
+    Tuple[str, str]
+        backend name, and its token/path
+    """
+    if db_token == MEMORY_TARGET:
+        return MEMORY, MEMORY_TARGET
+    if db_token.startswith(LOCAL_PREFIX):
+        return LOCAL, db_token[len(LOCAL_PREFIX) :]
+    return MOTHERDUCK, db_token
+
+
+def database_target(env: Dict[str, str]) -> str:
+    """database target of the entry-point scripts,
+    DATABASE_TARGET in `.env` overrides the MotherDuck token."""
+    return env.get("DATABASE_TARGET") or env["MOTHERDUCK_TOKEN"]
+
+
+def bootstrap_schema(conn) -> None:
+    """create the project schema & tables if they don't exist
+
+    Parameters
+    ----------
+    conn : Database Connection
+    """
+    conn.execute(f"CREATE SCHEMA IF NOT EXISTS {DATABASE}.{SCHEMA}")
+    for table in TABLE_COLUMNS:
+        conn.execute(table_ddl(table))
+
+
+def connect(db_token: str, bootstrap: bool = False) -> duckdb.DuckDBPyConnection:
+    """open a connection to MotherDuck, a local duckdb file, or in-memory,
+    the project database is always reachable as `ml_apps`,
+    so the same fully qualified table names work on every backend.
+
+    Parameters
+    ----------
+    db_token : str
+        MotherDuck token, or local/in-memory database target
+    bootstrap : bool
+        create the project schema & tables, always done for local
+        and in-memory databases
+
+    Returns
+    -------
+    duckdb.DuckDBPyConnection
+        database connection
+    """
+    backend, target = resolve_target(db_token)
+    if backend == MOTHERDUCK:
+        conn = duckdb.connect(f"md:?motherduck_token={target}")
+        if bootstrap:
+            conn.execute(f"CREATE DATABASE IF NOT EXISTS {DATABASE}")
+    else:
+        conn = duckdb.connect()
+        conn.execute(f"ATTACH '{target}' AS {DATABASE}")
+        bootstrap = True
+    conn.execute(f"USE {DATABASE}")
+    if bootstrap:
+        bootstrap_schema(conn)
+    return conn
@@ -0,0 +1,102 @@
+from prefect.filesystems import LocalFileSystem
+from prefect.serializers import Serializer
+from prefect.utilities.hashing import hash_objects
+from app.storage.schema import TABLE_COLUMNS, table_name
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
+import pandas as pd
+import base64
+import io
+
+QUERY_RESULTS_DIR = ".cache/query_results"
+
+
+class ParquetSerializer(Serializer):
+    """serialize dataframe results of query tasks as compressed parquet,
+    base64 encoded as prefect stores result blobs as JSON."""
+
+    type: Literal["parquet"] = "parquet"
+    compression: str = "zstd"
+
+    def dumps(self, obj: pd.DataFrame) -> bytes:
+        buffer = io.BytesIO()
+        obj.to_parquet(buffer, compression=self.compression)
+        return base64.encodebytes(buffer.getvalue())
+
+    def loads(self, blob: bytes) -> pd.DataFrame:
+        return pd.read_parquet(io.BytesIO(base64.decodebytes(blob)))
+
+
+def query_results_storage() -> LocalFileSystem:
+    """local storage of persisted query tasks results"""
+    return LocalFileSystem(basepath=QUERY_RESULTS_DIR)
+
+
+def table_watermark(
+    conn, table: str, column: str, predicate: Optional[str] = None
+) -> Tuple[Any, int, int]:
+    """max value of a timestamp column, row count, and content checksum
+    of the rows of a table matching a predicate (all rows by default).
+
+    max & count can't see rows replaced in place by an upsert (a restated
+    hourly reading keeps both unchanged), the checksum sums the hashes of
+    every matched row, so any update, insert or delete changes it.
+    the checksum scans the matched rows, the predicate should select the
+    rows read by the query only, so it costs less than the query itself.
+    """
+    row_hash = f"hash({', '.join(TABLE_COLUMNS[table])})"
+    where = f" WHERE {predicate}" if predicate else ""
+    return conn.execute(
+        f"SELECT max({column}), count(*), coalesce(sum(CAST({row_hash} AS HUGEINT)), 0)"
+        f" FROM {table_name(table)}{where}"
+    ).fetchone()
+
+
+def query_cache_key(
+    query_builder: Callable[..., str],
+    watermarks: List[Tuple[str, str, Callable[..., str]]],
+) -> Callable[[Any, Dict[str, Any]], Optional[str]]:
+    """build a prefect cache key function of a query task that takes
+    a live database connection as `conn` input.
+
+    the connection itself isn't hashed, the key is derived from the task,
+    SQL text, its parameters and the watermarks of the queried tables
+    (see `table_watermark`), so a cached result is reused as long as
+    the content of the queried rows of the source tables didn't change.
+
+    Parameters
+    ----------
+    query_builder : Callable[..., str]
+        function building the SQL text of the task from its inputs
+        (except the connection)
+    watermarks : List[Tuple[str, str, Callable[..., str]]]
+        (table, timestamp column, predicate builder) of the queried tables,
+        the predicate builder takes the task inputs (except the connection)
+        and returns the range predicate of the rows read by the query
+
+    Returns
+    -------
+    Callable[[TaskRunContext, Dict[str, Any]], Optional[str]]
+        cache key function
+    """
+
+    def cache_key(context, parameters: Dict[str, Any]) -> Optional[str]:
+        conn = parameters.get("conn")
+        if conn is None:
+            return None
+        query_params = {k: v for k, v in parameters.items() if k != "conn"}
+        try:
+            table_marks = [
+                table_watermark(conn, table, column, predicate(**query_params))
+                for table, column, predicate in watermarks
+            ]
+        except Exception:
+            # no caching if the watermarks can't be read, the task runs normally
+            return None
+        return hash_objects(
+            context.task.task_key,
+            query_builder(**query_params),
+            query_params,
+            [[str(value) for value in mark] for mark in table_marks],
+        )
+
+    return cache_key
@@ -0,0 +1,111 @@
+from app.storage.backend import connect, resolve_target
+from typing import Dict, Optional
+import threading
+import atexit
+import time
+
+
+class ConnectionManager:
+    """keep one database connection per process for a database target,
+    the connection is created lazily, health-checked, and re-created
+    on failure, so nested flows and tasks share the same connection
+    and pay the MotherDuck auth & catalog attach only once.
+
+    Parameters
+    ----------
+    db_token : str
+        MotherDuck token, or local/in-memory database target
+    health_check_interval : float
+        minimum number of seconds between two health checks
+    """
+
+    def __init__(self, db_token: str, health_check_interval: float = 30.0) -> None:
+        self.db_token = db_token
+        self.health_check_interval = health_check_interval
+        self.setup_seconds: Optional[float] = None
+        self.connects = 0
+        self._conn = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> None:
+        start = time.perf_counter()
+        self._conn = connect(self.db_token)
+        self.setup_seconds = time.perf_counter() - start
+        self.connects += 1
+        self._last_check = time.monotonic()
+        backend, _ = resolve_target(self.db_token)
+        print(f"{backend} connection initiated in {self.setup_seconds:.3f}s")
+
+    def is_healthy(self) -> bool:
+        try:
+            self._conn.execute("SELECT 1").fetchone()
+            return True
+        except Exception:
+            return False
+
+    def get(self):
+        """get the live connection, reconnecting if it was closed or broken"""
+        with self._lock:
+            if self._conn is None:
+                self._connect()
+            elif time.monotonic() - self._last_check >= self.health_check_interval:
+                if self.is_healthy():
+                    self._last_check = time.monotonic()
+                else:
+                    print("connection health check failed, reconnecting")
+                    self.close()
+                    self._connect()
+            return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def metrics(self) -> Dict[str, Optional[float]]:
+        return {"setup_seconds": self.setup_seconds, "connects": self.connects}
+
+
+_managers: Dict[str, ConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_manager(db_token: str) -> ConnectionManager:
+    """process-wide connection manager of a database target"""
+    with _managers_lock:
+        if db_token not in _managers:
+            _managers[db_token] = ConnectionManager(db_token)
+        return _managers[db_token]
+
+
+def get_connection(db_token: str):
+    """shared live connection of a database target
+
+    Parameters
+    ----------
+    db_token : str
+        MotherDuck token, or local/in-memory database target
+
+    Returns
+    -------
+    duckdb.DuckDBPyConnection
+        database connection shared by the whole process
+    """
+    return get_manager(db_token).get()
+
+
+def connection_metrics(db_token: str) -> Dict[str, Optional[float]]:
+    """connection setup time & number of (re)connects of a database target"""
+    return get_manager(db_token).metrics()
+
+
+@atexit.register
+def close_connections() -> None:
+    """close all managed connections"""
+    with _managers_lock:
+        for manager in _managers.values():
+            manager.close()
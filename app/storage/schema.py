@@ -0,0 +1,94 @@
+from typing import Dict, List
+
+DATABASE = "ml_apps"
+SCHEMA = "weather_forecasting"
+
+HOURLY_WEATHER_DATA = "hourly_weather_data"
+DAILY_WEATHER_DATA = "daily_weather_data"
+DAILY_FORECASTED_WEATHER = "daily_forecasted_weather"
+PERFORMANCE_MONITORING = "performance_monitoring"
+FORECAST_FINGERPRINTS = "forecast_fingerprints"
+
+TABLE_COLUMNS: Dict[str, Dict[str, str]] = {
+    HOURLY_WEATHER_DATA: {
+        "location_id": "INTEGER",
+        "reading_timestamp": "TIMESTAMP_NS",
+        "temperature": "FLOAT NOT NULL",
+        "tz": "VARCHAR(50)",
+    },
+    DAILY_WEATHER_DATA: {
+        "location_id": "INTEGER",
+        "reading_date": "TIMESTAMP_NS",
+        "temperature": "FLOAT NOT NULL",
+    },
+    DAILY_FORECASTED_WEATHER: {
+        "location_id": "INTEGER",
+        "reading_date": "TIMESTAMP_NS",
+        "forecasted_temperature": "FLOAT NOT NULL",
+        "inference_date": "TIMESTAMP_NS",
+    },
+    # input fingerprints of the forecasts of daily_forecasted_weather
+    FORECAST_FINGERPRINTS: {
+        "location_id": "INTEGER",
+        "inference_date": "TIMESTAMP_NS",
+        "horizon": "INTEGER",
+        "model_version": "VARCHAR",
+        "fingerprint": "VARCHAR NOT NULL",
+        "updated_at": "TIMESTAMP_NS",
+    },
+    PERFORMANCE_MONITORING: {
+        "location_id": "INTEGER",
+        "monitoring_date": "TIMESTAMP_NS",
+        "RMSE": "FLOAT NOT NULL",
+        "mean_error": "FLOAT NOT NULL",
+        "error_std": "FLOAT NOT NULL",
+        "mean_abs_error": "FLOAT NOT NULL",
+        "abs_error_std": "FLOAT NOT NULL",
+        "mean_abs_perc_error": "FLOAT NOT NULL",
+        "abs_perc_error_std": "FLOAT NOT NULL",
+        "order_statistic_medians_x": "FLOAT[] NOT NULL",
+        "order_statistic_medians_y": "FLOAT[] NOT NULL",
+        "slope": "FLOAT NOT NULL",
+        "intercept": "FLOAT NOT NULL",
+        "r": "FLOAT NOT NULL",
+    },
+}
+
+# performance_monitoring isn't keyed, duckdb can't update LIST columns on conflict,
+# and can't re-insert a deleted key in the same transaction.
+TABLE_KEYS: Dict[str, List[str]] = {
+    HOURLY_WEATHER_DATA: ["location_id", "reading_timestamp"],
+    DAILY_WEATHER_DATA: ["location_id", "reading_date"],
+    DAILY_FORECASTED_WEATHER: ["location_id", "reading_date", "inference_date"],
+    FORECAST_FINGERPRINTS: ["location_id", "inference_date"],
+}
+
+
+def table_name(table: str) -> str:
+    """fully qualified name of a project table"""
+    return f"{DATABASE}.{SCHEMA}.{table}"
+
+
+def table_ddl(table: str, name: str = None) -> str:
+    """CREATE TABLE statement of a project table, including its primary key
+
+    Parameters
+    ----------
+    table : str
+        name of the project table
+    name : str
+        fully qualified name of the created table,
+        defaults to the name of the project table
+
+    Returns
+    -------
+    str
+        DDL statement
+    """
+    columns = [f"{col} {dtype}" for col, dtype in TABLE_COLUMNS[table].items()]
+    if table in TABLE_KEYS:
+        columns.append(f"PRIMARY KEY ({', '.join(TABLE_KEYS[table])})")
+    columns_ddl = ",\n  ".join(columns)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {name or table_name(table)}(\n  {columns_ddl}\n)"
+    )
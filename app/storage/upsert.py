@@ -0,0 +1,131 @@
+from app.storage.schema import TABLE_COLUMNS, TABLE_KEYS, table_ddl, table_name
+from app.storage.backend import connect, database_target
+from dotenv import dotenv_values
+
+
+def date_range_predicate(column: str, start_date: str, end_date: str) -> str:
+    """sargable predicate selecting the dates between start & end (inclusive),
+    comparing the raw column keeps min/max zone-maps pruning usable,
+    unlike filtering on strftime(column).
+
+    Parameters
+    ----------
+    column : str
+        timestamp/date column
+    start_date : str
+        first date of the range
+    end_date : str
+        last date of the range
+
+    Returns
+    -------
+    str
+        SQL predicate
+    """
+    return (
+        f"{column} >= CAST('{start_date}' AS DATE) AND"
+        f" {column} < CAST('{end_date}' AS DATE) + 1"
+    )
+
+
+def _on_conflict(table: str) -> str:
+    keys = TABLE_KEYS[table]
+    updates = ", ".join(
+        f"{col} = EXCLUDED.{col}" for col in TABLE_COLUMNS[table] if col not in keys
+    )
+    return f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}"
+
+
+def _last_per_key(table: str, query: str) -> str:
+    """rows of a query deduplicated on the primary key, keeping the last row
+    of every key, as an insert can't conflict twice on the same key."""
+    keys = ", ".join(TABLE_KEYS[table])
+    return f"""
+        SELECT * EXCLUDE (_row)
+        FROM (SELECT *, row_number() OVER () AS _row FROM ({query}))
+        QUALIFY row_number() OVER (PARTITION BY {keys} ORDER BY _row DESC) = 1
+    """
+
+
+def upsert_query(conn, table: str, query: str) -> int:
+    """insert results of a query into a keyed table,
+    and replace rows with the same primary key, in one statement.
+    rows of the query sharing a key (overlapping windows, restated
+    rows) are deduplicated first, the last one wins.
+
+    Parameters
+    ----------
+    conn : Database Connection
+    table : str
+        name of the project table
+    query : str
+        SELECT statement returning the columns of the table in order
+
+    Returns
+    -------
+    int
+        number of inserted/replaced rows
+    """
+    return conn.execute(
+        f"INSERT INTO {table_name(table)} {_last_per_key(table, query)}"
+        f" {_on_conflict(table)}"
+    ).fetchone()[0]
+
+
+def upsert(conn, table: str, data) -> int:
+    """insert a dataframe/arrow table into a keyed table,
+    and replace rows with the same primary key, in one statement,
+    the last of the rows sharing a key wins.
+
+    Parameters
+    ----------
+    conn : Database Connection
+    table : str
+        name of the project table
+    data : Union[pd.DataFrame, pa.Table]
+        rows with the columns of the table in order
+
+    Returns
+    -------
+    int
+        number of inserted/replaced rows
+    """
+    return upsert_query(conn=conn, table=table, query="SELECT * FROM data")
+
+
+def migrate_to_keyed_table(conn, table: str) -> None:
+    """rebuild an existing table with its primary key,
+    keeping one row per key, to be able to upsert into it.
+
+    Parameters
+    ----------
+    conn : Database Connection
+    table : str
+        name of the project table
+    """
+    keys = ", ".join(TABLE_KEYS[table])
+    keyed_table = f"{table}__keyed"
+    conn.begin()
+    try:
+        conn.execute(table_ddl(table, name=table_name(keyed_table)))
+        conn.execute(f"""
+            INSERT INTO {table_name(keyed_table)}
+            SELECT * FROM {table_name(table)}
+            WHERE {" AND ".join(f"{k} IS NOT NULL" for k in TABLE_KEYS[table])}
+            QUALIFY row_number() OVER (PARTITION BY {keys}) = 1
+        """)
+        conn.execute(f"DROP TABLE {table_name(table)}")
+        conn.execute(f"ALTER TABLE {table_name(keyed_table)} RENAME TO {table}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    print(f"{table} migrated to be keyed by ({keys})")
+
+
+if __name__ == "__main__":
+    ENV = dotenv_values(".env")
+    # bootstrapping creates the tables added since, like forecast_fingerprints
+    with connect(database_target(ENV), bootstrap=True) as conn:
+        for table in TABLE_KEYS:
+            migrate_to_keyed_table(conn=conn, table=table)
@@ -0,0 +1,64 @@
+import pyarrow.parquet as pq
+import pandas as pd
+
+INDEX = "reading_date"
+
+
+def ns_index(df: pd.DataFrame) -> pd.DataFrame:
+    """cast a datetime index to nanosecond resolution, duckdb & parquet give
+    microsecond timestamps while prophet reads the index as int64 nanoseconds.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        daily data indexed by reading date
+
+    Returns
+    -------
+    pd.DataFrame
+        the same data with a `datetime64[ns]` index
+    """
+    if isinstance(df.index, pd.DatetimeIndex) and df.index.unit != "ns":
+        df = df.set_axis(df.index.as_unit("ns"), axis=0)
+    return df
+
+
+def write_series(df: pd.DataFrame, path: str) -> None:
+    """write a daily dataframe/series as zstd compressed parquet,
+    the datetime index is stored typed in the file, no parsing on read.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        daily data indexed by reading date
+    path : str
+        parquet file path
+    """
+    if isinstance(df, pd.Series):
+        df = df.to_frame()
+    df = ns_index(df)
+    df.to_parquet(path, engine="pyarrow", compression="zstd", index=True)
+
+
+def read_series(path: str) -> pd.DataFrame:
+    """read a daily parquet artifact memory-mapped, with its nanosecond
+    datetime index and inferred daily frequency restored.
+
+    Parameters
+    ----------
+    path : str
+        parquet file path
+
+    Returns
+    -------
+    pd.DataFrame
+        daily data indexed by reading date
+    """
+    df = pq.read_table(path, memory_map=True).to_pandas()
+    if INDEX in df.columns:
+        df.set_index(INDEX, inplace=True)
+    df = ns_index(df)
+    # daily frequency is needed by seasonal decompositions of the fast estimators
+    if len(df) >= 3:
+        df.index.freq = pd.infer_freq(df.index)
+    return df
@@ -0,0 +1,122 @@
+from sklearn.model_selection import ParameterGrid
+from sktime.performance_metrics.forecasting import mean_absolute_percentage_error
+from app.train.train import Trainer
+from app.train.artifacts import read_series
+from typing import Any, Dict, List
+import pandas as pd
+import numpy as np
+import tracemalloc
+import argparse
+import json
+import time
+import yaml
+import os
+
+
+def profile_fold(
+    forecaster, y: pd.DataFrame, train: np.ndarray, test: np.ndarray, fh, scoring
+) -> Dict[str, float]:
+    """fit & predict time, peak traced memory and score of a forecaster on a fold,
+    memory allocated outside of python allocators (like Stan) isn't traced."""
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        forecaster.fit(y.iloc[train], fh=fh)
+        fitted = time.perf_counter()
+        y_pred = forecaster.predict()
+        predicted = time.perf_counter()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "fit_seconds": fitted - start,
+        "predict_seconds": predicted - fitted,
+        "peak_memory_mb": peak / 2**20,
+        "mape": float(scoring(y.iloc[test], y_pred)),
+    }
+
+
+class Benchmark:
+    """cost & accuracy of the supported estimators, every candidate of an
+    estimator's grid is fitted serially on the same sliding windows as the tuner.
+
+    Parameters
+    ----------
+    trainer : Trainer
+        trainer providing the estimators, grids & CV splitter
+    estimators : List[str]
+        names of the estimators to benchmark
+    """
+
+    def __init__(self, trainer: Trainer, estimators: List[str]) -> None:
+        self.trainer = trainer
+        self.estimators = estimators
+
+    def run(self) -> pd.DataFrame:
+        supported = Trainer.get_supported_estimators()
+        splitter = self.trainer.get_splitter()
+        y = self.trainer.df
+        folds = list(splitter.split(y))
+        rows = []
+        for estimator in self.estimators:
+            grid = self.trainer.tuning_params[estimator]["params"]
+            for params in ParameterGrid(grid):
+                fold_results = []
+                for train, test in folds:
+                    forecaster = supported[estimator]().set_params(**params)
+                    try:
+                        fold_results.append(
+                            profile_fold(
+                                forecaster,
+                                y,
+                                train,
+                                test,
+                                splitter.fh,
+                                mean_absolute_percentage_error,
+                            )
+                        )
+                    except Exception as error:
+                        print(f"{estimator} failed with {params}: {error}")
+                        break
+                else:
+                    rows.append({
+                        "estimator": estimator,
+                        "params": json.dumps(params, default=str),
+                        **pd.DataFrame(fold_results).mean().to_dict(),
+                        "peak_memory_mb": max(
+                            r["peak_memory_mb"] for r in fold_results
+                        ),
+                    })
+            print(f"{estimator} benchmarked on {len(folds)} windows")
+        return pd.DataFrame(rows)
+
+    @staticmethod
+    def summary(candidates: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+        """best candidate (lowest MAPE) of every estimator"""
+        best = candidates.loc[candidates.groupby("estimator")["mape"].idxmin()]
+        return {
+            row.pop("estimator"): row for row in best.round(6).to_dict(orient="records")
+        }
+
+
+if __name__ == "__main__":
+    args_parser = argparse.ArgumentParser(description="arguments of benchmark")
+    args_parser.add_argument("--conf", required=True)
+    args = args_parser.parse_args()
+    with open(args.conf, mode="r") as file:
+        conf = yaml.safe_load(file)
+    df = read_series(conf["split_data"]["train_output_path"])
+    trainer = Trainer(
+        tuning_params=conf["tuner"],
+        random_state=conf["base"]["random_state"],
+        df=df,
+        live_dir=conf["base"]["dvclive_dir"],
+    )
+    benchmark_params = conf["benchmark"]
+    candidates = Benchmark(trainer, benchmark_params["estimators"]).run()
+    os.makedirs(os.path.dirname(benchmark_params["results_file"]), exist_ok=True)
+    candidates.to_csv(benchmark_params["candidates_file"], index=False)
+    summary = Benchmark.summary(candidates)
+    with open(benchmark_params["results_file"], "w") as file:
+        json.dump(summary, file, indent=4)
+    print(candidates.sort_values("mape").to_string(index=False))
@@ -5,13 +5,42 @@ from sktime.performance_metrics.forecasting import (
     mean_squared_percentage_error,
 )
 from sktime.utils.plotting import plot_series
-from typing import Dict, Any, Union
+from app.train.artifacts import read_series
+from app.inference.model_registry import get_registry
+from joblib import Parallel, delayed
+from typing import Dict, Any, List, Union
 import matplotlib.pyplot as plt
 import pandas as pd
-import pickle
+import numpy as np
+import copy
 import yaml
 import json
 import argparse
+import os
+
+
+def forecast_cutoff(model, y: pd.DataFrame, fh: int, update_params: bool):
+    """forecast of a copy of the model from the last date of y"""
+    return copy.deepcopy(model).update_predict_single(
+        fh=range(1, fh + 1), y=y, update_params=update_params
+    )
+
+
+def refit_forecast(model, y: pd.DataFrame, fh: int):
+    """forecast of an unfitted clone of the model (same hyperparameters)
+    fitted on y only, so the forecast is out of sample from the last date of y"""
+    return model.clone().fit(y, fh=range(1, fh + 1)).predict()
+
+
+def horizon_errors(preds: np.ndarray, true: np.ndarray) -> Dict[str, np.ndarray]:
+    """error curves per horizon of (cutoffs x horizons) forecasts"""
+    errors = preds - true
+    return {
+        "mean-absolute-error": np.abs(errors).mean(axis=0),
+        "mean-absolute-percentage-error": np.abs(errors / true).mean(axis=0),
+        "root-mean-squared-error": np.sqrt((errors**2).mean(axis=0)),
+        "bias": errors.mean(axis=0),
+    }
 
 
 class Eval:
@@ -24,10 +53,12 @@ class Eval:
         fh: int,
     ) -> None:
         self.eval_params = eval_params
-        self.train_df = train_df[len(train_df) - 365 :]
+        # days of history the model forecasts from, as in production
+        self.window = 365
+        self.train_df = train_df[len(train_df) - self.window :]
         self.test_df = test_df
-        with open(model_path, "rb") as pkl:
-            self.model = pickle.load(pkl)
+        # shared with other users of the registry, forecasts work on copies
+        self.model = get_registry().get(model_path, compiled=False)
         self.fh = fh
 
     @staticmethod
@@ -54,16 +85,73 @@ class Eval:
         return plt.gcf()
 
     def eval(self) -> None:
-        preds = self.model.update_predict_single(
-            fh=range(1, self.fh + 1),
-            y=self.train_df,
-            update_params=self.eval_params["update_model_params"],
+        preds = forecast_cutoff(
+            self.model,
+            self.train_df,
+            self.fh,
+            self.eval_params["update_model_params"],
         )
         metrics = Eval.calc_metrics(preds=preds, true=self.test_df)
         with open(self.eval_params["metrics_file"], "w") as js:
             json.dump(metrics, js, indent=4)
-        plot = Eval.plot_pred_vs_true(self.train_df, self.test_df, preds)
-        plot.savefig(self.eval_params["true_and_prediction"])
+        if self.eval_params.get("plot", True):
+            plot = Eval.plot_pred_vs_true(self.train_df, self.test_df, preds)
+            plot.savefig(self.eval_params["true_and_prediction"])
+
+    def backtest_cutoffs(self, n_obs: int, params: Dict[str, Any]) -> List[int]:
+        """positions of the rolling cutoffs, every `step` days back from the
+        holdout cutoff, leaving a full window of history before each one."""
+        last = n_obs - self.fh
+        cutoffs = range(last, self.window - 1, -params["step"])
+        return sorted(list(cutoffs)[: params["n_cutoffs"]])
+
+    def backtest(self, history: pd.DataFrame) -> Dict[str, Any]:
+        """evaluate the model over rolling cutoffs of the history in parallel
+        worker processes, and write the per-horizon error curves.
+        the exported model was fitted on data through the holdout cutoff, so
+        it is refitted with the same hyperparameters on the history before
+        each cutoff, and the errors are out of sample like in production.
+
+        Parameters
+        ----------
+        history : pd.DataFrame
+            train & test series
+
+        Returns
+        -------
+        Dict[str, Any]
+            errors of all the cutoffs & horizons, and the number of cutoffs
+        """
+        params = self.eval_params["backtest"]
+        history = history[["temperature"]]
+        cutoffs = self.backtest_cutoffs(len(history), params)
+        if not cutoffs:
+            raise ValueError(f"history of {len(history)} days is too short to backtest")
+        preds = Parallel(n_jobs=params.get("n_jobs", -1))(
+            delayed(refit_forecast)(self.model, history.iloc[:cutoff], self.fh)
+            for cutoff in cutoffs
+        )
+        preds = np.stack([pred.to_numpy().ravel() for pred in preds])
+        values = history["temperature"].to_numpy()
+        true = np.stack([values[cutoff : cutoff + self.fh] for cutoff in cutoffs])
+        curves = horizon_errors(preds, true)
+        os.makedirs(os.path.dirname(params["curves_file"]), exist_ok=True)
+        pd.DataFrame({"horizon": np.arange(1, self.fh + 1), **curves}).to_csv(
+            params["curves_file"], index=False
+        )
+        errors = np.abs(preds - true)
+        metrics = {
+            "backtest-cutoffs": len(cutoffs),
+            "backtest-first-cutoff": str(history.index[cutoffs[0] - 1].date()),
+            "backtest-mean-absolute-error": float(errors.mean()),
+            "backtest-mean-absolute-percentage-error": float((errors / true).mean()),
+            "backtest-worst-cutoff-mean-absolute-error": float(
+                errors.mean(axis=1).max()
+            ),
+        }
+        with open(params["metrics_file"], "w") as js:
+            json.dump(metrics, js, indent=4)
+        return metrics
 
 
 if __name__ == "__main__":
@@ -73,17 +161,19 @@ if __name__ == "__main__":
     with open(args.conf, mode="r") as file:
         conf = yaml.safe_load(file)
     fh = conf["tuner"]["cv"]["fh"]
-    train_df = pd.read_csv(conf["split_data"]["train_output_path"])
-    train_df["reading_date"] = pd.to_datetime(train_df["reading_date"])
-    train_df.set_index("reading_date", inplace=True)
-    test_df = pd.read_csv(conf["split_data"]["test_output_path"])
-    test_df["reading_date"] = pd.to_datetime(test_df["reading_date"])
-    test_df.set_index("reading_date", inplace=True)
+    train_df = read_series(conf["split_data"]["train_output_path"])
+    test_df = read_series(conf["split_data"]["test_output_path"])
     evaluator = Eval(
         eval_params=conf["evaluate"],
         train_df=train_df,
         test_df=test_df,
-        model_path=conf["tuner"]["model_path"],
+        model_path=conf["export"]["model_dir"],
         fh=fh,
     )
     evaluator.eval()
+    if conf["evaluate"]["backtest"]["enabled"]:
+        metrics = evaluator.backtest(pd.concat([train_df, test_df]))
+        print(
+            f"backtested {metrics['backtest-cutoffs']} cutoffs,"
+            f" mae {metrics['backtest-mean-absolute-error']:.3f}"
+        )
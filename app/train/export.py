@@ -0,0 +1,133 @@
+from app.inference.model_loader import (
+    ARTIFACT_FILE,
+    FORMAT_VERSION,
+    MANIFEST_FILE,
+    file_sha256,
+    library_versions,
+)
+from app.inference.numpy_prophet import (
+    PREDICTOR_FILE,
+    compile_prophet,
+    verify_predictor,
+)
+from typing import Any, Dict, Optional
+import pandas as pd
+import datetime
+import argparse
+import joblib
+import pickle
+import json
+import yaml
+import os
+
+
+def get_forecaster(model):
+    """fitted forecaster of a pickled model, the best forecaster of a search"""
+    return getattr(model, "best_forecaster_", model)
+
+
+def slim_forecaster(forecaster):
+    """drop the fit-only state of a fitted forecaster, for Prophet the Stan
+    fit & backend, and the uncertainty sampling of point forecasts."""
+    model = getattr(forecaster, "_forecaster", None)
+    if model is not None and hasattr(model, "stan_fit"):
+        model.stan_fit = None
+        model.stan_backend = None
+        model.uncertainty_samples = 0
+    return forecaster
+
+
+def export_predictor(forecaster, model_dir: str) -> Optional[Dict[str, Any]]:
+    """compile the numpy predictor of a fitted prophet forecaster, checked
+    against prophet's forecast of the training dates & the next year.
+
+    Returns
+    -------
+    Optional[Dict[str, Any]]
+        predictor manifest fields, None if the forecaster isn't a prophet model
+    """
+    path = os.path.join(model_dir, PREDICTOR_FILE)
+    if os.path.exists(path):
+        os.remove(path)
+    model = getattr(forecaster, "_forecaster", forecaster)
+    if not hasattr(model, "seasonalities"):
+        return None
+    predictor = compile_prophet(forecaster)
+    history = model.history["ds"]
+    dates = pd.date_range(history.min(), history.max() + pd.Timedelta(days=365))
+    max_error = verify_predictor(forecaster, predictor, dates)
+    predictor.save(f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+    return {"predictor": PREDICTOR_FILE, "predictor_max_error": max_error}
+
+
+def export_model(
+    model, model_dir: str, data_path: str, extra: Dict[str, Any] = None
+) -> Dict[str, Any]:
+    """export the fitted forecaster of a pickled model/search to a compressed
+    joblib artifact, with a manifest of its params, training data & libraries,
+    and the numpy predictor of prophet forecasters.
+    every file is replaced atomically and the manifest, holding the version
+    read by the model registry, is replaced last.
+
+    Parameters
+    ----------
+    model : sktime forecaster or search
+        fitted model of training/retraining
+    model_dir : str
+        directory of the exported model
+    data_path : str
+        training data file, its hash is recorded in the manifest
+    extra : Dict[str, Any]
+        additional manifest fields
+
+    Returns
+    -------
+    Dict[str, Any]
+        manifest of the exported model
+    """
+    forecaster = slim_forecaster(get_forecaster(model))
+    os.makedirs(model_dir, exist_ok=True)
+    artifact_path = os.path.join(model_dir, ARTIFACT_FILE)
+    joblib.dump(forecaster, f"{artifact_path}.tmp", compress=3)
+    os.replace(f"{artifact_path}.tmp", artifact_path)
+    predictor = export_predictor(forecaster, model_dir)
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "created_at": datetime.datetime.now().isoformat(),
+        "estimator": type(forecaster).__name__,
+        "params": getattr(model, "best_params_", None),
+        "cutoff": str(forecaster.cutoff[0]),
+        "data_path": data_path,
+        "data_sha256": file_sha256(data_path),
+        "artifact": ARTIFACT_FILE,
+        "artifact_sha256": file_sha256(artifact_path),
+        "artifact_bytes": os.path.getsize(artifact_path),
+        "libraries": library_versions(),
+        **(predictor or {}),
+        **(extra or {}),
+    }
+    manifest_path = os.path.join(model_dir, MANIFEST_FILE)
+    with open(f"{manifest_path}.tmp", "w") as file:
+        json.dump(manifest, file, indent=4, default=str)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    return manifest
+
+
+if __name__ == "__main__":
+    args_parser = argparse.ArgumentParser(description="arguments of model export")
+    args_parser.add_argument("--conf", required=True)
+    args = args_parser.parse_args()
+    with open(args.conf, mode="r") as file:
+        conf = yaml.safe_load(file)
+    with open(conf["tuner"]["model_path"], mode="rb") as pkl:
+        model = pickle.load(pkl)
+    manifest = export_model(
+        model=model,
+        model_dir=conf["export"]["model_dir"],
+        data_path=conf["split_data"]["train_output_path"],
+    )
+    print(
+        f"{manifest['estimator']} exported to {conf['export']['model_dir']}"
+        f" ({manifest['artifact_bytes'] / 1024:.0f}KB)"
+    )
@@ -1,31 +1,164 @@
-import duckdb
+from app.storage.backend import connect, database_target
+from app.storage.schema import DATABASE, HOURLY_WEATHER_DATA, table_name
+from app.storage.upsert import date_range_predicate
+from app.train.artifacts import INDEX, ns_index, write_series
 from dotenv import dotenv_values
+from typing import Any, Dict, Optional
+import pyarrow.parquet as pq
+import pandas as pd
 import datetime
 import argparse
+import json
 import yaml
+import os
 
 ENV = dotenv_values(".env")
+WATERMARK_FILE = "_watermark.json"
 
 
-def extract_data(output_path: str) -> None:
-    datetime.datetime.strftime(datetime.datetime.now(), "%Y-%m-%d")
-    query_date = datetime.datetime.strftime(
-        datetime.datetime.now() - datetime.timedelta(days=699), "%Y-%m-%d"
-    )
-    con = duckdb.connect(f"md:?motherduck_token={ENV['MOTHERDUCK_TOKEN']}")
-    con.sql("USE ml_apps")
-    df_daily = con.sql(f"""
-        SELECT strftime(reading_timestamp, '%Y-%m-%d') AS reading_date,
+def daily_query(location_id: int, start_date: str, end_date: str) -> str:
+    """daily aggregates of the hourly readings of a location between two dates
+    (inclusive), filtered with a range predicate on the raw timestamp column."""
+    return f"""
+        SELECT date_trunc('day', reading_timestamp) AS reading_date,
                AVG(temperature) AS temperature,
                MAX(temperature) AS maximum_temperature,
                MIN(temperature) AS minimum_temperature,
-        FROM ml_apps.weather_forecasting.hourly_weather_data
-        WHERE strftime(reading_timestamp, '%Y-%m-%d') >= '{query_date}'
+        FROM {table_name(HOURLY_WEATHER_DATA)}
+        WHERE location_id = {int(location_id)} AND
+        {date_range_predicate("reading_timestamp", start_date, end_date)}
         GROUP BY reading_date
         ORDER BY reading_date ASC
-    """).df()
-    con.close()
-    df_daily.to_csv(output_path, index=False)
+    """
+
+
+def query_daily(location_id: int, start_date: str, end_date: str) -> pd.DataFrame:
+    con = connect(database_target(ENV))
+    try:
+        con.sql(f"USE {DATABASE}")
+        query = daily_query(location_id, start_date, end_date)
+        return ns_index(con.sql(query).df().set_index(INDEX))
+    finally:
+        con.close()
+
+
+class DailyHistory:
+    """local append-only history of the daily aggregates,
+    partitioned by month (`month=YYYY-MM/data.parquet`), with a watermark of
+    the last extracted day, so a run only queries the days after it.
+
+    Parameters
+    ----------
+    history_dir : str
+        root directory of the partitioned history
+    """
+
+    def __init__(self, history_dir: str) -> None:
+        self.history_dir = history_dir
+
+    def partition_path(self, month: str) -> str:
+        return os.path.join(self.history_dir, f"month={month}", "data.parquet")
+
+    def watermark(self) -> Optional[datetime.date]:
+        path = os.path.join(self.history_dir, WATERMARK_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as file:
+            return datetime.date.fromisoformat(json.load(file)["watermark"])
+
+    def set_watermark(self, day: datetime.date) -> None:
+        with open(os.path.join(self.history_dir, WATERMARK_FILE), "w") as file:
+            json.dump(
+                {
+                    "watermark": day.isoformat(),
+                    "updated_at": datetime.datetime.now().isoformat(),
+                },
+                file,
+                indent=4,
+            )
+
+    def read_partition(self, month: str) -> pd.DataFrame:
+        table = pq.read_table(self.partition_path(month), memory_map=True)
+        return ns_index(table.to_pandas())
+
+    def merge(self, df: pd.DataFrame, since: datetime.date) -> None:
+        """replace the days on/after `since` by the newly extracted days,
+        only the month partitions touched by the new days are rewritten."""
+        months = sorted(set(df.index.strftime("%Y-%m")) | {since.strftime("%Y-%m")})
+        for month in months:
+            path = self.partition_path(month)
+            new = df[df.index.strftime("%Y-%m") == month]
+            if os.path.exists(path):
+                old = self.read_partition(month)
+                old = old[old.index < pd.Timestamp(since)]
+                new = pd.concat([old, new]).sort_index()
+            if new.empty:
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_series(new, path)
+
+    def read(self, start_date: datetime.date) -> pd.DataFrame:
+        """assemble the history from `start_date`, reading needed months only"""
+        start_month = start_date.strftime("%Y-%m")
+        months = sorted(
+            name.split("=", 1)[1]
+            for name in os.listdir(self.history_dir)
+            if name.startswith("month=") and name.split("=", 1)[1] >= start_month
+        )
+        if not months:
+            raise ValueError(
+                f"no daily history from {start_date} in {self.history_dir}"
+            )
+        df = pd.concat([self.read_partition(month) for month in months])
+        return df[df.index >= pd.Timestamp(start_date)]
+
+
+def extract_incremental(
+    history: DailyHistory,
+    location_id: int,
+    start_date: datetime.date,
+    end_date: datetime.date,
+    overlap_days: int,
+) -> Dict[str, Any]:
+    """extract the days after the history watermark (minus the overlap days
+    catching restated data) into the local history.
+
+    Returns
+    -------
+    Dict[str, Any]
+        queried range & number of extracted days
+    """
+    watermark = history.watermark()
+    since = start_date
+    if watermark is not None:
+        since = max(start_date, watermark - datetime.timedelta(days=overlap_days))
+    df_new = query_daily(location_id, since.isoformat(), end_date.isoformat())
+    os.makedirs(history.history_dir, exist_ok=True)
+    history.merge(df_new, since)
+    if not df_new.empty:
+        history.set_watermark(df_new.index.max().date())
+    return {"since": since.isoformat(), "days": len(df_new)}
+
+
+def extract_data(output_path: str, params: Dict[str, Any]) -> None:
+    end_date = datetime.date.today()
+    start_date = end_date - datetime.timedelta(days=params["history_days"])
+    # the production model is trained on the series of one location
+    location_id = params["location_id"]
+    if params.get("incremental", False):
+        history = DailyHistory(
+            os.path.join(params["history_dir"], f"location_id={location_id}")
+        )
+        stats = extract_incremental(
+            history, location_id, start_date, end_date, params.get("overlap_days", 3)
+        )
+        print(f"extracted {stats['days']} days since {stats['since']}")
+        df_daily = history.read(start_date)
+    else:
+        df_daily = query_daily(
+            location_id, start_date.isoformat(), end_date.isoformat()
+        )
+    write_series(df_daily, output_path)
 
 
 if __name__ == "__main__":
@@ -34,4 +167,6 @@ if __name__ == "__main__":
     args = args_parser.parse_args()
     with open(args.conf, mode="r") as file:
         conf = yaml.safe_load(file)
-    extract_data(output_path=conf["extract_data"]["output_path"])
+    extract_data(
+        output_path=conf["extract_data"]["output_path"], params=conf["extract_data"]
+    )
@@ -0,0 +1,55 @@
+from app.train.artifacts import read_series
+from app.train.export import export_model, get_forecaster
+from app.train.warm_start import retrain
+from app.inference.model_loader import file_sha256, load_model, retrained_location
+import argparse
+import pickle
+import json
+import time
+import yaml
+import os
+
+
+if __name__ == "__main__":
+    args_parser = argparse.ArgumentParser(description="arguments of retraining")
+    args_parser.add_argument("--conf", required=True)
+    args_parser.add_argument(
+        "--cold", action="store_true", help="refit from prophet's default init"
+    )
+    args = args_parser.parse_args()
+    with open(args.conf, mode="r") as file:
+        conf = yaml.safe_load(file)
+    retrain_params = conf["retrain"]
+    df = read_series(conf["extract_data"]["output_path"])[["temperature"]]
+    y = df.iloc[-retrain_params["window_days"] :]
+    # DVC outputs of training (bin/model.pkl & bin/forecaster) are left
+    # untouched, a retrained model is exported to retrain.model_dir, and
+    # the next retrain starts from it as long as training didn't run again.
+    base_path = conf["tuner"]["model_path"]
+    retrained_dir = retrained_location(conf)
+    if retrained_dir is not None:
+        forecaster, _ = load_model(retrained_dir)
+    else:
+        with open(base_path, mode="rb") as pkl:
+            forecaster = get_forecaster(pickle.load(pkl))
+    start = time.perf_counter()
+    model = retrain(forecaster, y, warm_start=not args.cold)
+    seconds = time.perf_counter() - start
+    print(f"model retrained on {len(y)} days in {seconds:.2f}s")
+    results = {
+        "warm-start": not args.cold,
+        "retrain-seconds": seconds,
+        "window-start": str(y.index.min().date()),
+        "window-end": str(y.index.max().date()),
+        "base-sha256": file_sha256(base_path),
+        "previous-retrain": retrained_dir is not None,
+    }
+    os.makedirs(os.path.dirname(retrain_params["results_file"]), exist_ok=True)
+    with open(retrain_params["results_file"], "w") as file:
+        json.dump(results, file, indent=4)
+    export_model(
+        model=model,
+        model_dir=retrain_params["model_dir"],
+        data_path=conf["extract_data"]["output_path"],
+        extra={"retrain": results},
+    )
@@ -0,0 +1,427 @@
+from sklearn.model_selection import ParameterGrid
+from joblib import Parallel, delayed
+from typing import Any, Callable, Dict, List, Optional
+import pandas as pd
+import numpy as np
+import tracemalloc
+import resource
+import hashlib
+import json
+import math
+import time
+import os
+
+
+def fit_and_score(
+    forecaster,
+    params: Dict[str, Any],
+    y: pd.DataFrame,
+    train: np.ndarray,
+    test: np.ndarray,
+    fh,
+    scoring: Callable,
+    trace_memory: bool = False,
+) -> Dict[str, float]:
+    """fit a candidate on one CV fold, score its forecasts,
+    and profile the fit, predict & scoring steps.
+
+    Parameters
+    ----------
+    forecaster : sktime forecaster
+        unfitted forecaster to clone
+    params : Dict[str, Any]
+        candidate parameters
+    y : pd.DataFrame
+        training series
+    train : np.ndarray
+        iloc indices of the fold training window
+    test : np.ndarray
+        iloc indices of the fold test window
+    fh : ForecastingHorizon
+        relative forecasting horizon of the splitter
+    scoring : Callable
+        scoring function, lower is better
+    trace_memory : bool
+        trace the peak memory of python allocations (slows the fit down)
+
+    Returns
+    -------
+    Dict[str, float]
+        fold score, fit, predict & scoring wall time, cpu time,
+        peak resident memory of the worker process over its lifetime so far
+        (folds fitted earlier by the worker included), and peak traced
+        memory of this fold
+    """
+    if trace_memory:
+        tracemalloc.start()
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    fitted = predicted = None
+    try:
+        model = forecaster.clone().set_params(**params)
+        model.fit(y.iloc[train], fh=fh)
+        fitted = time.perf_counter()
+        y_pred = model.predict()
+        predicted = time.perf_counter()
+        score = float(scoring(y.iloc[test], y_pred))
+    except Exception as error:
+        print(f"fit failed with {params}: {error}")
+        score = np.nan
+    finally:
+        traced_peak = tracemalloc.get_traced_memory()[1] if trace_memory else np.nan
+        if trace_memory:
+            tracemalloc.stop()
+    end = time.perf_counter()
+    fitted = fitted or end
+    predicted = predicted or end
+    return {
+        "score": score,
+        "fit_time": fitted - start_wall,
+        "pred_time": predicted - fitted,
+        "score_time": end - predicted,
+        "cpu_time": time.process_time() - start_cpu,
+        # ru_maxrss is the high-water mark of the process, in KB on linux
+        "process_peak_rss_mb": (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        ),
+        "peak_traced_mb": traced_peak / 2**20,
+        "pid": os.getpid(),
+    }
+
+
+class FoldCache:
+    """persistent store of per-fold scores & fit times, so a re-run of the
+    tuner only fits new parameter combinations or new CV windows.
+
+    entries are keyed by the content hash of the fold's data, the fold
+    cutoff & horizon, the estimator name and the candidate parameters,
+    so any change of the window's data or of the candidate is a miss.
+    failed fits (NaN score) aren't persisted, and are fitted again
+    by the next run.
+
+    Parameters
+    ----------
+    path : str
+        JSON file of the cache
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.entries: Dict[str, Dict[str, float]] = {}
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                self.entries = json.load(file)
+
+    @staticmethod
+    def key(
+        estimator: str, params: Dict[str, Any], cutoff: str, data_hash: str, fh
+    ) -> str:
+        return hashlib.sha256(
+            json.dumps(
+                [estimator, params, cutoff, data_hash, list(fh)],
+                sort_keys=True,
+                default=str,
+            ).encode()
+        ).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, float]]:
+        result = self.entries.get(key)
+        # failed results stored by previous versions are retried
+        if result is None or not np.isfinite(result["score"]):
+            return None
+        return result
+
+    def put(self, key: str, result: Dict[str, float]) -> None:
+        if np.isfinite(result["score"]):
+            self.entries[key] = result
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.entries, file)
+        os.replace(tmp_path, self.path)
+
+
+def fold_data_hash(y: pd.DataFrame, train: np.ndarray, test: np.ndarray) -> str:
+    """content hash of the rows (index & values) of a CV fold"""
+    rows = y.iloc[np.concatenate([train, test])]
+    return hashlib.sha256(
+        pd.util.hash_pandas_object(rows, index=True).to_numpy().tobytes()
+    ).hexdigest()
+
+
+class FoldEvaluator:
+    """evaluate candidates on CV folds in parallel, and remember every
+    (candidate, fold) result so each fit is done only once.
+
+    Parameters
+    ----------
+    forecaster : sktime forecaster
+        unfitted forecaster to tune
+    cv : BaseSplitter
+        sktime splitter generating the CV folds
+    scoring : Callable
+        scoring function, lower is better
+    backend : Optional[str]
+        joblib backend, None runs serially
+    backend_params : Optional[Dict[str, Any]]
+        joblib parameters like n_jobs
+    name : str
+        estimator name, part of the cache keys
+    cache : Optional[FoldCache]
+        persistent cache of fold results, None disables it
+    trace_memory : bool
+        trace the peak python memory of every fit
+    """
+
+    def __init__(
+        self,
+        forecaster,
+        cv,
+        scoring: Callable,
+        backend: Optional[str] = None,
+        backend_params: Optional[Dict[str, Any]] = None,
+        name: str = "",
+        cache: Optional[FoldCache] = None,
+        trace_memory: bool = False,
+    ) -> None:
+        self.forecaster = forecaster
+        self.cv = cv
+        self.scoring = scoring
+        self.backend = backend
+        self.backend_params = backend_params or {}
+        self.name = name
+        self.cache = cache
+        self.trace_memory = trace_memory
+        self.results: Dict[tuple, Dict[str, float]] = {}
+        # profile of every fold fit of this search, cache hits excluded
+        self.fits: List[Dict[str, Any]] = []
+        self.hits, self.misses = 0, 0
+
+    def set_data(self, y: pd.DataFrame) -> None:
+        self.y = y
+        self.folds = list(self.cv.split(y))
+        self.fold_ids = [
+            (str(y.index[train[-1]]), fold_data_hash(y, train, test))
+            for train, test in self.folds
+        ]
+
+    def fold_key(self, params: Dict[str, Any], fold: int) -> str:
+        cutoff, data_hash = self.fold_ids[fold]
+        return FoldCache.key(self.name, params, cutoff, data_hash, self.cv.fh)
+
+    def evaluate(self, candidates: List[int], params: List[Dict], folds: List[int]):
+        """fit & score every candidate on every fold that wasn't evaluated yet,
+        in this search or in a previous run sharing the cache."""
+        todo = [(c, f) for c in candidates for f in folds if (c, f) not in self.results]
+        if self.cache is not None:
+            cached = {
+                (c, f): self.cache.get(self.fold_key(params[c], f)) for c, f in todo
+            }
+            self.results.update({k: v for k, v in cached.items() if v is not None})
+            todo = [k for k, v in cached.items() if v is None]
+            self.hits += len(cached) - len(todo)
+        self.misses += len(todo)
+        if self.backend is None:
+            n_jobs, backend = 1, None
+        else:
+            n_jobs, backend = self.backend_params.get("n_jobs", -1), self.backend
+        outputs = Parallel(n_jobs=n_jobs, backend=backend)(
+            delayed(fit_and_score)(
+                self.forecaster,
+                params[c],
+                self.y,
+                *self.folds[f],
+                self.cv.fh,
+                self.scoring,
+                self.trace_memory,
+            )
+            for c, f in todo
+        )
+        self.results.update(zip(todo, outputs))
+        self.fits.extend(
+            {"params": params[c], "cutoff": self.fold_ids[f][0], **output}
+            for (c, f), output in zip(todo, outputs)
+        )
+        if self.cache is not None and todo:
+            for (c, f), output in zip(todo, outputs):
+                self.cache.put(self.fold_key(params[c], f), output)
+            self.cache.save()
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def mean_score(self, candidate: int, folds: List[int]) -> float:
+        scores = [self.results[(candidate, f)]["score"] for f in folds]
+        return np.inf if np.isnan(scores).any() else float(np.mean(scores))
+
+
+class FoldSearch:
+    """base of the searches scoring candidates fold by fold with a FoldEvaluator,
+    once fitted the best candidate is refitted on the whole series.
+
+    Parameters
+    ----------
+    forecaster : sktime forecaster
+        unfitted forecaster to tune
+    cv : BaseSplitter
+        sktime splitter generating the CV folds
+    param_grid : Dict[str, List]
+        grid of candidate parameters
+    scoring : Callable
+        scoring function, lower is better
+    backend : Optional[str]
+        joblib backend, None runs serially
+    backend_params : Optional[Dict[str, Any]]
+        joblib parameters like n_jobs
+    name : str
+        estimator name, part of the cache keys
+    cache : Optional[FoldCache]
+        persistent cache of fold results, None disables it
+    trace_memory : bool
+        trace the peak python memory of every fit
+    """
+
+    def __init__(
+        self,
+        forecaster,
+        cv,
+        param_grid: Dict[str, List],
+        scoring: Callable,
+        backend: Optional[str] = None,
+        backend_params: Optional[Dict[str, Any]] = None,
+        name: str = "",
+        cache: Optional[FoldCache] = None,
+        trace_memory: bool = False,
+    ) -> None:
+        self.forecaster = forecaster
+        self.cv = cv
+        self.param_grid = param_grid
+        self.scoring = scoring
+        self.evaluator = FoldEvaluator(
+            forecaster=forecaster,
+            cv=cv,
+            scoring=scoring,
+            backend=backend,
+            backend_params=backend_params,
+            name=name,
+            cache=cache,
+            trace_memory=trace_memory,
+        )
+
+    def trial(
+        self, rung: int, candidate: int, params: List[Dict], folds: List[int]
+    ) -> Dict[str, Any]:
+        """score & cost of a candidate on the given windows"""
+        fold_results = [self.evaluator.results[(candidate, f)] for f in folds]
+        return {
+            "rung": rung,
+            "params": params[candidate],
+            "n_folds": len(folds),
+            "fit_time": sum(r["fit_time"] for r in fold_results),
+            "pred_time": sum(r.get("pred_time", 0.0) for r in fold_results),
+            "cpu_time": sum(r["cpu_time"] for r in fold_results),
+            "process_peak_rss_mb": max(
+                r.get("process_peak_rss_mb", 0.0) for r in fold_results
+            ),
+        }
+
+    def refit_best(self, y: pd.DataFrame, params: Dict[str, Any], score: float):
+        self.best_params_ = params
+        self.best_score_ = score
+        start = time.perf_counter()
+        self.best_forecaster_ = self.forecaster.clone().set_params(**params)
+        self.best_forecaster_.fit(y, fh=self.cv.fh)
+        self.refit_time_ = time.perf_counter() - start
+        return self
+
+    @property
+    def fits_(self) -> List[Dict[str, Any]]:
+        return self.evaluator.fits
+
+    def cache_stats(self) -> Dict[str, float]:
+        return {
+            "hits": self.evaluator.hits,
+            "misses": self.evaluator.misses,
+            "hit_rate": self.evaluator.hit_rate(),
+        }
+
+    def __getattr__(self, name: str):
+        # behave like the tuned forecaster once fitted, as grid search does
+        if name != "best_forecaster_" and "best_forecaster_" in self.__dict__:
+            return getattr(self.best_forecaster_, name)
+        raise AttributeError(name)
+
+
+class GridSearch(FoldSearch):
+    """exhaustive grid search equivalent to ForecastingGridSearchCV with the refit
+    strategy, scored fold by fold so fits can be reused from the fold cache."""
+
+    def fit(self, y: pd.DataFrame) -> "GridSearch":
+        params = list(ParameterGrid(self.param_grid))
+        self.evaluator.set_data(y)
+        candidates = list(range(len(params)))
+        folds = list(range(len(self.evaluator.folds)))
+        self.evaluator.evaluate(candidates, params, folds)
+        scores = {c: self.evaluator.mean_score(c, folds) for c in candidates}
+        self.trials_ = [
+            {**self.trial(0, c, params, folds), "score": scores[c]} for c in candidates
+        ]
+        best = min(candidates, key=scores.get)
+        return self.refit_best(y, params[best], scores[best])
+
+
+class SuccessiveHalvingSearch(FoldSearch):
+    """budget-aware alternative to grid search, all candidates are scored on the
+    first CV windows, then only the best 1/eta are scored on eta times
+    more windows, until one candidate is left or all windows are used,
+    the winner's score is always the mean over all windows.
+
+    Parameters
+    ----------
+    eta : int
+        halving rate of candidates, and growth rate of windows
+    min_folds : int
+        number of windows of the first rung
+    **kwargs
+        parameters of FoldSearch
+    """
+
+    def __init__(self, eta: int = 3, min_folds: int = 1, **kwargs) -> None:
+        if eta < 2:
+            raise ValueError("eta must be at least 2")
+        super().__init__(**kwargs)
+        self.eta = eta
+        self.min_folds = min_folds
+
+    def fit(self, y: pd.DataFrame) -> "SuccessiveHalvingSearch":
+        params = list(ParameterGrid(self.param_grid))
+        self.evaluator.set_data(y)
+        n_folds = len(self.evaluator.folds)
+        candidates, budget, rung = list(range(len(params))), self.min_folds, 0
+        done = 0
+        self.trials_ = []
+        while True:
+            # the last candidate is always scored on all windows, like grid search
+            folds = list(
+                range(n_folds if len(candidates) == 1 else min(budget, n_folds))
+            )
+            self.evaluator.evaluate(candidates, params, folds)
+            scores = {c: self.evaluator.mean_score(c, folds) for c in candidates}
+            for c in candidates:
+                # cost of the windows added in this rung only
+                trial = self.trial(rung, c, params, folds[done:])
+                trial.update({"n_folds": len(folds), "score": scores[c]})
+                self.trials_.append(trial)
+            print(
+                f"rung {rung}: {len(candidates)} candidates on {len(folds)} windows,"
+                f" best score {min(scores.values()):.4f}"
+            )
+            if len(folds) == n_folds:
+                break
+            n_keep = max(1, math.ceil(len(candidates) / self.eta))
+            candidates = sorted(candidates, key=scores.get)[:n_keep]
+            budget, rung, done = budget * self.eta, rung + 1, len(folds)
+        best = min(candidates, key=scores.get)
+        return self.refit_best(y, params[best], scores[best])
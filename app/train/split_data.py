@@ -1,5 +1,5 @@
 from sktime.split import temporal_train_test_split
-import pandas as pd
+from app.train.artifacts import read_series, write_series
 import argparse
 import yaml
 
@@ -7,14 +7,12 @@ import yaml
 def split_data(
     test_size: int, data_path: str, train_output_path: str, test_output_path: str
 ) -> None:
-    df = pd.read_csv(data_path)
-    df["reading_date"] = pd.to_datetime(df["reading_date"])
-    df.set_index("reading_date", inplace=True)
+    df = read_series(data_path)
     train_daily, test_daily = temporal_train_test_split(
         y=df["temperature"], test_size=test_size
     )
-    train_daily.to_csv(train_output_path)
-    test_daily.to_csv(test_output_path)
+    write_series(train_daily, train_output_path)
+    write_series(test_daily, test_output_path)
 
 
 if __name__ == "__main__":
@@ -1,14 +1,33 @@
 import pandas as pd
 from sktime.forecasting.fbprophet import Prophet
+from sktime.forecasting.naive import NaiveForecaster
+from sktime.forecasting.exp_smoothing import ExponentialSmoothing
+from sktime.forecasting.theta import ThetaForecaster
+from sktime.forecasting.structural import UnobservedComponents
 from sktime.split import SlidingWindowSplitter
 from sktime.forecasting.model_selection import ForecastingGridSearchCV
 from sktime.performance_metrics.forecasting import mean_absolute_percentage_error
-from typing import Dict, Any
+from sklearn.model_selection import ParameterGrid
+from app.train.artifacts import read_series
+from app.train.search import FoldCache, GridSearch, SuccessiveHalvingSearch
+from app.inference.model_registry import publish_pickle
+from typing import Dict, Any, List, Optional
 from dvclive import Live
 import yaml
+import time
 import argparse
-import pickle
 import json
+import os
+
+
+def fourier_ar() -> UnobservedComponents:
+    """local level with AR errors & yearly Fourier (trigonometric) seasonality,
+    fits on a single year window unlike a 365 days seasonal period."""
+    return UnobservedComponents(
+        level="local level",
+        autoregressive=1,
+        freq_seasonal=[{"period": 365.25, "harmonics": 2}],
+    )
 
 
 class Trainer:
@@ -26,42 +45,292 @@ class Trainer:
 
     @staticmethod
     def get_supported_estimators() -> Dict:
-        return {"prophet": Prophet}
+        return {
+            "prophet": Prophet,
+            "naive": NaiveForecaster,
+            "ets": ExponentialSmoothing,
+            "theta": ThetaForecaster,
+            "fourier_ar": fourier_ar,
+        }
 
-    def tuner(self):
-        splitter = SlidingWindowSplitter(
+    def get_splitter(self) -> SlidingWindowSplitter:
+        return SlidingWindowSplitter(
             fh=list(range(1, self.tuning_params["cv"]["fh"] + 1)),
             window_length=self.tuning_params["cv"]["window_length"],
             step_length=self.tuning_params["cv"]["step_size"],
         )
-        with Live(dir=self.live_dir, save_dvc_exp=True) as live:
-            estimators = Trainer.get_supported_estimators()
+
+    def get_parallel_params(self) -> Dict[str, Any]:
+        """backend & backend params distributing fold x params fits,
+        backend is one of None (serial), loky, multiprocessing, threading, dask."""
+        parallel = self.tuning_params.get("parallel", {})
+        backend = parallel.get("backend")
+        if backend is None:
+            return {"backend": None, "backend_params": None}
+        backend_params = {}
+        if backend != "dask":
+            backend_params["n_jobs"] = parallel.get("n_jobs", -1)
+        return {"backend": backend, "backend_params": backend_params}
+
+    def get_search(self, estimator: str):
+        """search of the estimator's hyperparameters, strategy of `tuner.search`:
+        grid (exhaustive), halving (successive halving over CV windows), or
+        bayes (sequential model-based optimisation within a max-fits budget)."""
+        estimators = Trainer.get_supported_estimators()
+        if estimator not in estimators.keys():
+            raise ValueError(f"Unsupported estimator: {estimator}")
+        search_params = self.tuning_params.get("search", {})
+        strategy = search_params.get("strategy", "grid")
+        param_grid = self.tuning_params[estimator]["params"]
+        cache = self.get_fold_cache()
+        fold_search_params = {
+            "forecaster": estimators[estimator](),
+            "cv": self.get_splitter(),
+            "param_grid": param_grid,
+            "scoring": mean_absolute_percentage_error,
+            "name": estimator,
+            "cache": cache,
+            "trace_memory": self.tuning_params.get("profile", {}).get(
+                "tracemalloc", False
+            ),
+            **self.get_parallel_params(),
+        }
+        if strategy == "grid" and cache is not None:
+            return GridSearch(**fold_search_params)
+        if strategy == "grid":
+            return ForecastingGridSearchCV(
+                forecaster=estimators[estimator](),
+                cv=self.get_splitter(),
+                param_grid=param_grid,
+                verbose=1,
+                scoring=mean_absolute_percentage_error,
+                **self.get_parallel_params(),
+            )
+        if strategy == "halving":
+            return SuccessiveHalvingSearch(
+                eta=search_params.get("eta", 3),
+                min_folds=search_params.get("min_folds", 1),
+                **fold_search_params,
+            )
+        if strategy == "bayes":
+            return self.get_bayes_search(estimators[estimator], param_grid)
+        raise ValueError(f"Unsupported search strategy: {strategy}")
+
+    def get_fold_cache(self) -> Optional[FoldCache]:
+        """persistent fold results cache shared by grid & halving searches,
+        the cache is loaded once per Trainer."""
+        cache_params = self.tuning_params.get("cache", {})
+        if not cache_params.get("enabled", False):
+            return None
+        if getattr(self, "fold_cache", None) is None:
+            self.fold_cache = FoldCache(cache_params["path"])
+        return self.fold_cache
+
+    def get_bayes_search(self, estimator, param_grid: Dict[str, List]):
+        try:
+            from sktime.forecasting.model_selection import ForecastingSkoptSearchCV
+        except ImportError as error:
+            raise ImportError(
+                "bayes search strategy requires scikit-optimize"
+            ) from error
+        # single valued params are fixed on the forecaster, skopt searches the rest
+        fixed = {k: v[0] for k, v in param_grid.items() if len(v) == 1}
+        space = {k: v for k, v in param_grid.items() if len(v) > 1}
+        splitter = self.get_splitter()
+        n_folds = splitter.get_n_splits(self.df)
+        max_fits = self.tuning_params["search"].get("max_fits", 10 * n_folds)
+        n_iter = min(max(1, max_fits // n_folds), len(ParameterGrid(space)))
+        return ForecastingSkoptSearchCV(
+            forecaster=estimator(**fixed),
+            cv=splitter,
+            param_distributions=space,
+            n_iter=n_iter,
+            random_state=self.random_state,
+            scoring=mean_absolute_percentage_error,
+            verbose=1,
+            **self.get_parallel_params(),
+        )
+
+    @staticmethod
+    def get_trials(search) -> List[Dict[str, Any]]:
+        """score & fit seconds of every evaluated candidate in evaluation order"""
+        if hasattr(search, "trials_"):
+            return search.trials_
+        results = search.cv_results_
+        n_folds = search.cv.get_n_splits(search._y)
+        score = results.filter(like="mean_test").iloc[:, 0]
+        return [
+            {
+                "params": params,
+                "n_folds": n_folds,
+                "score": score.iloc[i],
+                "fit_time": results["mean_fit_time"].iloc[i] * n_folds,
+                "pred_time": results["mean_pred_time"].iloc[i] * n_folds,
+            }
+            for i, params in enumerate(results["params"])
+        ]
+
+    @staticmethod
+    def log_trials(live: Live, estimator: str, trials: List[Dict[str, Any]]) -> None:
+        """plot best score so far against cumulative fit seconds of the trials"""
+        datapoints, spent, best = [], 0.0, float("inf")
+        for trial_id, trial in enumerate(trials):
+            spent += trial["fit_time"]
+            # partial rungs of halving aren't comparable to full-window scores
+            if trial.get("n_folds") == trials[-1].get("n_folds"):
+                best = min(best, trial["score"])
+            datapoints.append({
+                "trial": trial_id,
+                "score": trial["score"],
+                "fit-seconds": trial["fit_time"],
+                "cumulative-fit-seconds": spent,
+                "best-score": best,
+                "params": json.dumps(trial["params"], default=str),
+            })
+        live.log_plot(
+            f"trials-{estimator}",
+            datapoints,
+            x="cumulative-fit-seconds",
+            y="best-score",
+            template="linear",
+            title=f"{estimator} best score per fit second",
+        )
+        live.log_metric(f"{estimator}-trials", len(trials))
+        live.log_metric(f"{estimator}-fit-seconds", spent)
+
+    @staticmethod
+    def log_profile(live: Live, estimator: str, search) -> None:
+        """plot the wall, cpu & predict seconds and the peak memory of every
+        fold fit of the search, searches of sktime don't profile their folds."""
+        fits = getattr(search, "fits_", [])
+        if fits:
+            live.log_plot(
+                f"folds-{estimator}",
+                [
+                    {
+                        "fit": fit_id,
+                        "cutoff": fit["cutoff"],
+                        "fit-seconds": fit["fit_time"],
+                        "predict-seconds": fit.get("pred_time", 0.0),
+                        "score-seconds": fit.get("score_time", 0.0),
+                        "cpu-seconds": fit["cpu_time"],
+                        "process-peak-rss-mb": fit.get("process_peak_rss_mb", 0.0),
+                        "peak-traced-mb": fit.get("peak_traced_mb", 0.0),
+                        "params": json.dumps(fit["params"], default=str),
+                    }
+                    for fit_id, fit in enumerate(fits)
+                ],
+                x="fit",
+                y="fit-seconds",
+                template="linear",
+                title=f"{estimator} seconds per fold fit",
+            )
+            live.log_metric(
+                f"{estimator}-process-peak-rss-mb",
+                max(fit["process_peak_rss_mb"] for fit in fits),
+            )
+        if hasattr(search, "refit_time_"):
+            live.log_metric(f"{estimator}-refit-seconds", search.refit_time_)
+
+    @staticmethod
+    def profile_summary(
+        estimator: str, trials: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """cost & score of every candidate of a search, summed over its trials
+        (the rungs of halving), with the score of its last trial."""
+        summary = {}
+        for trial in trials:
+            key = json.dumps(trial["params"], sort_keys=True, default=str)
+            row = summary.setdefault(
+                key,
+                {
+                    "estimator": estimator,
+                    "params": key,
+                    "fit_seconds": 0.0,
+                    "predict_seconds": 0.0,
+                    "cpu_seconds": 0.0,
+                    "process_peak_rss_mb": 0.0,
+                },
+            )
+            row["fit_seconds"] += trial["fit_time"]
+            row["predict_seconds"] += trial.get("pred_time", 0.0)
+            row["cpu_seconds"] += trial.get("cpu_time", float("nan"))
+            row["process_peak_rss_mb"] = max(
+                row["process_peak_rss_mb"], trial.get("process_peak_rss_mb", 0.0)
+            )
+            row.update({"n_folds": trial.get("n_folds"), "score": trial["score"]})
+        return list(summary.values())
+
+    def write_profile(
+        self, rows: List[Dict[str, Any]], refit_seconds: Dict[str, float]
+    ) -> None:
+        """summary table of the candidates, and per estimator totals as metrics"""
+        profile_params = self.tuning_params["profile"]
+        df = pd.DataFrame(rows)
+        os.makedirs(os.path.dirname(profile_params["summary_file"]), exist_ok=True)
+        df.to_csv(profile_params["summary_file"], index=False)
+        metrics = {
+            estimator: {
+                "candidates": len(group),
+                "fit-seconds": group["fit_seconds"].sum(),
+                "predict-seconds": group["predict_seconds"].sum(),
+                "cpu-seconds": group["cpu_seconds"].sum(),
+                "process-peak-rss-mb": group["process_peak_rss_mb"].max(),
+                "refit-seconds": refit_seconds.get(estimator, float("nan")),
+            }
+            for estimator, group in df.groupby("estimator", sort=False)
+        }
+        with open(profile_params["metrics_file"], "w") as file:
+            json.dump(metrics, file, indent=4)
+
+    def tuner(self):
+        """tune every configured estimator, and return the search of the
+        estimator with the lowest best score."""
+        best = None
+        profile_rows, refit_seconds = [], {}
+        # plots are declared in dvc.yaml, so runs don't rewrite the tracked file
+        with Live(dir=self.live_dir, save_dvc_exp=True, dvcyaml=False) as live:
             for estimator in self.tuning_params["estimator_name"]:
-                if estimator not in estimators.keys():
-                    raise ValueError(
-                        f'Unsupported estimator: {self.tuning_params["estimator_name"]}'
-                    )
-                forecaster = estimators[estimator]()
-                sscv = ForecastingGridSearchCV(
-                    forecaster=forecaster,
-                    cv=splitter,
-                    param_grid=self.tuning_params[estimator]["params"],
-                    verbose=1,
-                    scoring=mean_absolute_percentage_error,
-                )
+                sscv = self.get_search(estimator)
+                start = time.perf_counter()
                 sscv.fit(self.df)
+                trials = Trainer.get_trials(sscv)
+                Trainer.log_trials(live, estimator, trials)
+                Trainer.log_profile(live, estimator, sscv)
+                profile_rows.extend(Trainer.profile_summary(estimator, trials))
+                if hasattr(sscv, "refit_time_"):
+                    refit_seconds[estimator] = sscv.refit_time_
+                # bayes search doesn't use the fold cache
+                cache_enabled = self.tuning_params.get("cache", {}).get("enabled")
+                if cache_enabled and hasattr(sscv, "cache_stats"):
+                    stats = sscv.cache_stats()
+                    print(
+                        f"{estimator} fold cache: {stats['hits']} hits,"
+                        f" {stats['misses']} fits, hit rate {stats['hit_rate']:.1%}"
+                    )
+                    live.log_metric(f"{estimator}-cache-hit-rate", stats["hit_rate"])
                 live.log_metric("best-score", sscv.best_score_, timestamp=True)
+                live.log_metric("tuning-seconds", time.perf_counter() - start)
                 live.log_params(sscv.best_params_)
                 live.next_step()
-        return sscv, sscv.best_score_, sscv.best_params_
+                if best is None or sscv.best_score_ < best[0].best_score_:
+                    best = (sscv, estimator)
+            # written before save_dvc_exp, so the profile is part of the experiment
+            self.write_profile(profile_rows, refit_seconds)
+        sscv, estimator = best
+        print(f"best estimator: {estimator} with score {sscv.best_score_:.4f}")
+        return sscv, sscv.best_score_, sscv.best_params_, estimator
 
     def train(self) -> None:
-        model, score, params = self.tuner()
-        results = {"best-score": score, "best-params": params}
+        model, score, params, estimator = self.tuner()
+        results = {
+            "best-estimator": estimator,
+            "best-score": score,
+            "best-params": params,
+        }
         with open(self.tuning_params["training_results"], "w") as file:
             json.dump(results, file, indent=4)
-        with open(self.tuning_params["model_path"], mode="wb") as pkl:
-            pickle.dump(model, pkl)
+        publish_pickle(model, self.tuning_params["model_path"])
 
 
 if __name__ == "__main__":
@@ -71,9 +340,7 @@ if __name__ == "__main__":
     with open(args.conf, mode="r") as file:
         conf = yaml.safe_load(file)
     live_dir = conf["base"]["dvclive_dir"]
-    df = pd.read_csv(conf["split_data"]["train_output_path"])
-    df["reading_date"] = pd.to_datetime(df["reading_date"])
-    df.set_index("reading_date", inplace=True)
+    df = read_series(conf["split_data"]["train_output_path"])
     trainer = Trainer(
         tuning_params=conf["tuner"],
         random_state=conf["base"]["random_state"],
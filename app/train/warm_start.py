@@ -0,0 +1,77 @@
+from sktime.forecasting.fbprophet import Prophet
+from prophet import Prophet as _Prophet
+from typing import Any, Dict
+import pandas as pd
+import functools
+
+
+class WarmStartedProphet(_Prophet):
+    """prophet model whose Stan optimiser starts from the given params,
+    instead of prophet's default initial params.
+
+    Parameters
+    ----------
+    init : Dict[str, Any]
+        initial values of k, m, sigma_obs, delta & beta
+    **kwargs
+        parameters of prophet.Prophet
+    """
+
+    def __init__(self, init: Dict[str, Any] = None, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.init = init
+
+    def fit(self, df: pd.DataFrame, **kwargs) -> "WarmStartedProphet":
+        if self.init is not None:
+            kwargs.setdefault("init", self.init)
+        return super().fit(df, **kwargs)
+
+
+class WarmStartProphet(Prophet):
+    """sktime Prophet fitting a WarmStartedProphet when `warm_start__params`
+    is set, the double underscore keeps the attribute through sktime's reset
+    at the start of fit."""
+
+    def _instantiate_model(self):
+        init = getattr(self, "warm_start__params", None)
+        if init is not None:
+            self._ModelClass = functools.partial(WarmStartedProphet, init=init)
+        return super()._instantiate_model()
+
+
+def warm_start_params(model: _Prophet) -> Dict[str, Any]:
+    """fitted params of a prophet model in the format of stan init"""
+    return {
+        "k": float(model.params["k"][0][0]),
+        "m": float(model.params["m"][0][0]),
+        "sigma_obs": float(model.params["sigma_obs"][0][0]),
+        "delta": model.params["delta"][0],
+        "beta": model.params["beta"][0],
+    }
+
+
+def retrain(forecaster, y: pd.DataFrame, warm_start: bool = True):
+    """refit a fitted forecaster with the same hyperparameters on new data,
+    Prophet's optimiser is warm-started from the previous fitted params,
+    other estimators are refitted from scratch as they're cheap to fit.
+
+    Parameters
+    ----------
+    forecaster : sktime forecaster
+        fitted forecaster
+    y : pd.DataFrame
+        updated training window
+    warm_start : bool
+        whether to warm-start Prophet from the fitted params
+
+    Returns
+    -------
+    sktime forecaster
+        refitted forecaster
+    """
+    if not isinstance(forecaster, Prophet):
+        return forecaster.clone().fit(y, fh=forecaster._fh)
+    model = WarmStartProphet(**forecaster.get_params(deep=False))
+    if warm_start:
+        model.warm_start__params = warm_start_params(forecaster._forecaster)
+    return model.fit(y, fh=forecaster._fh)
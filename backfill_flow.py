@@ -0,0 +1,150 @@
+from prefect import flow
+from app.api_data.backfill import split_date_range, get_windows_api_data
+from app.api_data.data_models import Location, read_locations
+from app.api_data.weather_data_flows import (
+    transform_api_data_to_arrow,
+    load_to_motherduck,
+    delete_out_of_range_data,
+)
+from app.inference.prepare_daily_data import prepare_daily_range
+from app.storage.backend import database_target
+from app.storage.connection import get_connection
+from dotenv import dotenv_values
+from typing import Any, Dict, List, Optional
+import argparse
+import time
+
+
+@flow(
+    name="BackfillFlow",
+    description="Backfill hourly & daily weather data of a date range",
+    validate_parameters=True,
+    log_prints=True,
+)
+def backfill_job(
+    data_url,
+    params,
+    db_token,
+    start_date: str,
+    end_date: str,
+    window_days: int = 92,
+    locations: Optional[List[Dict[str, Any]]] = None,
+    location_id: Optional[int] = None,
+    max_concurrency: int = 4,
+    requests_per_second: float = 5.0,
+) -> Dict[str, float]:
+    """Parent Flow of Data Backfilling,
+    split the date range into API-sized windows, fetch them in parallel,
+    and upsert hourly & daily data of every window with one bulk statement
+    per table.
+
+    Parameters
+    ----------
+    data_url : str
+        API url
+    params : Dict[str, Any]
+        Parameters Needed to access API and get data
+    db_token : str
+        MotherDuck Database Credentials
+    start_date : str
+        first date of the backfilled range
+    end_date : str
+        last date of the backfilled range
+    window_days : int
+        maximum number of days fetched by a single API call
+    locations : Optional[List[Dict[str, Any]]]
+        locations (location_id, latitude, longitude, timezone)
+        to backfill, if not passed the location of params is used
+    location_id : Optional[int]
+        id of the location of params, needed if locations aren't passed
+    max_concurrency : int
+        maximum number of in-flight API requests
+    requests_per_second : float
+        maximum number of API requests per second
+
+    Returns
+    -------
+    Dict[str, float]
+        number of loaded records, elapsed seconds, and throughput
+    """
+    if not locations:
+        if location_id is None:
+            raise ValueError("location_id of params is needed without locations")
+        locations = [{
+            "location_id": location_id,
+            "latitude": params["latitude"],
+            "longitude": params["longitude"],
+            "timezone": params["timezone"],
+        }]
+    locations = [Location(**location) for location in locations]
+    windows = split_date_range(start_date, end_date, window_days)
+    print(f"Backfilling {start_date} -> {end_date} in {len(windows)} windows")
+    start_time = time.perf_counter()
+    api_data = get_windows_api_data(
+        data_url=data_url,
+        params=params,
+        windows=windows,
+        locations=locations,
+        max_concurrency=max_concurrency,
+        requests_per_second=requests_per_second,
+    )
+    fetch_seconds = time.perf_counter() - start_time
+    hourly_rows, daily_rows = 0, 0
+    conn = get_connection(db_token)
+    for window_start, window_end in windows:
+        df = transform_api_data_to_arrow(data=api_data[(window_start, window_end)])
+        load_to_motherduck(df=df, db_conn=conn)
+        hourly_rows += df.num_rows
+        daily_rows += prepare_daily_range(
+            conn=conn, start_date=window_start, end_date=window_end
+        )
+    delete_out_of_range_data(db_conn=conn, thresh_dt=end_date)
+    elapsed = time.perf_counter() - start_time
+    stats = {
+        "hourly_rows": hourly_rows,
+        "daily_rows": daily_rows,
+        "fetch_seconds": fetch_seconds,
+        "elapsed_seconds": elapsed,
+        "rows_per_second": hourly_rows / elapsed if elapsed > 0 else 0.0,
+    }
+    print(
+        f"Backfilled {hourly_rows} hourly & {daily_rows} daily records in"
+        f" {elapsed:.2f}s ({stats['rows_per_second']:.0f} rows/s, fetching took"
+        f" {fetch_seconds:.2f}s)"
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    ENV = dotenv_values(".env")
+    parser = argparse.ArgumentParser(description="Backfill Job Parameters")
+    parser.add_argument("--start_date", required=True, type=str)
+    parser.add_argument("--end_date", required=True, type=str)
+    parser.add_argument("--window_days", default=92, type=int)
+    parser.add_argument("--locations", default=None, type=str)
+    args = parser.parse_args()
+    locations_conf = read_locations(args.locations)
+    # without a locations file the first configured location is backfilled
+    location = locations_conf["locations"][0]
+    # backfill has its own rate limits, unless a locations file sets them
+    rate_limits = locations_conf if args.locations else {}
+    url_params = {
+        "latitude": location["latitude"],
+        "longitude": location["longitude"],
+        "start_date": args.start_date,
+        "end_date": args.end_date,
+        "hourly": "temperature_2m",
+        "timezone": location["timezone"],
+    }
+    backfill_job(
+        data_url=ENV["METEO_URL"],
+        params=url_params,
+        db_token=database_target(ENV),
+        start_date=args.start_date,
+        end_date=args.end_date,
+        window_days=args.window_days,
+        locations=locations_conf["locations"] if args.locations else None,
+        location_id=location["location_id"],
+        max_concurrency=rate_limits.get("max_concurrency", 4),
+        requests_per_second=rate_limits.get("requests_per_second", 5.0),
+    )
@@ -0,0 +1,99 @@
+"""benchmark of the pandas and the columnar arrow paths of transforming
+weather API data and loading it into duckdb, on synthetic hourly payloads.
+
+usage:
+    python -m benchmarks.bench_api_transform --rows 10000 100000 1000000 10000000
+"""
+
+from app.api_data.weather_data_flows import api_data_to_arrow
+import argparse
+import datetime
+import time
+import duckdb
+import numpy as np
+import pandas as pd
+
+HOURLY_DDL = """
+    CREATE OR REPLACE TABLE hourly_weather_data(
+      location_id INTEGER,
+      reading_timestamp TIMESTAMP_NS,
+      temperature FLOAT NOT NULL,
+      tz VARCHAR(50)
+    )
+"""
+
+
+LOCATION_ID = 1
+
+
+def pandas_transform(data: dict, location_id: int) -> pd.DataFrame:
+    """row-wise pandas transform the arrow path replaced, as a baseline"""
+    df = pd.DataFrame({
+        "location_id": [location_id for _ in range(len(data["hourly"]["time"]))],
+        "reading_timestamp": data["hourly"]["time"],
+        "temperature": data["hourly"]["temperature_2m"],
+        "tz": [data["timezone"] for _ in range(len(data["hourly"]["time"]))],
+    })
+    df["reading_timestamp"] = pd.to_datetime(df["reading_timestamp"])
+    return df
+
+
+def synthetic_payload(n_rows: int) -> dict:
+    # one year of hourly timestamps repeated, as payloads of many stations
+    year = pd.date_range(datetime.datetime(2023, 1, 1), periods=24 * 365, freq="h")
+    times = np.resize(year.strftime("%Y-%m-%dT%H:%M").to_numpy(), n_rows)
+    return {
+        "timezone": "Africa/Cairo",
+        "hourly": {
+            "time": times.tolist(),
+            "temperature_2m": (
+                np.random.default_rng(42).normal(22, 5, n_rows).round(1).tolist()
+            ),
+        },
+    }
+
+
+def bench(n_rows: int) -> dict:
+    data = synthetic_payload(n_rows)
+    conn = duckdb.connect()
+    conn.execute(HOURLY_DDL)
+    results = {"rows": n_rows}
+
+    start = time.perf_counter()
+    df = pandas_transform(data=data, location_id=LOCATION_ID)
+    results["pandas_transform_s"] = time.perf_counter() - start
+    start = time.perf_counter()
+    conn.execute("INSERT INTO hourly_weather_data SELECT * FROM df")
+    results["pandas_load_s"] = time.perf_counter() - start
+    del df
+
+    conn.execute(HOURLY_DDL)
+    start = time.perf_counter()
+    arrow_table = api_data_to_arrow(data=data, location_id=LOCATION_ID)  # noqa: F841
+    results["arrow_transform_s"] = time.perf_counter() - start
+    start = time.perf_counter()
+    conn.execute("INSERT INTO hourly_weather_data SELECT * FROM arrow_table")
+    results["arrow_load_s"] = time.perf_counter() - start
+    conn.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API transform benchmark")
+    parser.add_argument(
+        "--rows", nargs="+", type=int, default=[10_000, 100_000, 1_000_000]
+    )
+    args = parser.parse_args()
+    print(
+        f"{'rows':>10} {'pandas':>10} {'pd-load':>10} {'arrow':>10} {'pa-load':>10}"
+        f" {'speed-up':>10}"
+    )
+    for n_rows in args.rows:
+        r = bench(n_rows)
+        pandas_total = r["pandas_transform_s"] + r["pandas_load_s"]
+        arrow_total = r["arrow_transform_s"] + r["arrow_load_s"]
+        print(
+            f"{n_rows:>10} {r['pandas_transform_s']:>10.3f} {r['pandas_load_s']:>10.3f}"
+            f" {r['arrow_transform_s']:>10.3f} {r['arrow_load_s']:>10.3f}"
+            f" {pandas_total / arrow_total:>9.1f}x"
+        )
@@ -0,0 +1,69 @@
+"""size & read time of the daily training artifacts as CSV vs Parquet,
+for growing history lengths.
+
+usage:
+    python -m benchmarks.bench_artifacts --days 700 7000 70000
+"""
+
+from app.train.artifacts import read_series, write_series
+import pandas as pd
+import numpy as np
+import argparse
+import tempfile
+import time
+import os
+
+
+def synthetic_daily(days: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    index = pd.date_range("1900-01-01", periods=days, freq="D", name="reading_date")
+    temperature = 22 + 8 * np.sin(2 * np.pi * np.arange(days) / 365.25)
+    temperature = temperature + rng.normal(0, 1.5, days)
+    return pd.DataFrame(
+        {
+            "temperature": temperature,
+            "maximum_temperature": temperature + rng.uniform(2, 6, days),
+            "minimum_temperature": temperature - rng.uniform(2, 6, days),
+        },
+        index=index,
+    )
+
+
+def read_csv(path: str) -> pd.DataFrame:
+    # the way stages read the CSV artifacts before
+    df = pd.read_csv(path)
+    df["reading_date"] = pd.to_datetime(df["reading_date"])
+    return df.set_index("reading_date")
+
+
+def best_of(func, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="training artifacts benchmark")
+    parser.add_argument("--days", nargs="+", type=int, default=[700, 7000, 70000])
+    args = parser.parse_args()
+    print(
+        f"{'days':>8} {'csv KB':>10} {'parquet KB':>12}"
+        f" {'csv read ms':>12} {'parquet read ms':>16}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for days in args.days:
+            df = synthetic_daily(days)
+            csv_path = os.path.join(tmp, f"{days}.csv")
+            parquet_path = os.path.join(tmp, f"{days}.parquet")
+            df.to_csv(csv_path)
+            write_series(df, parquet_path)
+            assert read_series(parquet_path).equals(df)
+            print(
+                f"{days:>8} {os.path.getsize(csv_path) / 1024:>10.1f}"
+                f" {os.path.getsize(parquet_path) / 1024:>12.1f}"
+                f" {best_of(lambda: read_csv(csv_path)) * 1000:>12.2f}"
+                f" {best_of(lambda: read_series(parquet_path)) * 1000:>16.2f}"
+            )
@@ -0,0 +1,55 @@
+"""equivalence & latency of the numpy predictor compiled from the exported
+prophet forecaster vs the forecaster itself, for 30 days forecasts from
+cutoffs over the training history & the year after it.
+
+usage:
+    python -m benchmarks.bench_numpy_prophet --conf conf/params.yaml --cutoffs 24
+"""
+
+from app.inference.model_loader import load_model, model_location
+from app.inference.numpy_prophet import compile_prophet, verify_predictor
+import pandas as pd
+import numpy as np
+import argparse
+import time
+import yaml
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="numpy prophet benchmark")
+    parser.add_argument("--conf", default="conf/params.yaml")
+    parser.add_argument("--cutoffs", default=24, type=int)
+    parser.add_argument("--horizon", default=30, type=int)
+    args = parser.parse_args()
+    with open(args.conf, mode="r") as file:
+        conf = yaml.safe_load(file)
+    forecaster, _ = load_model(model_location(conf))
+    forecaster = getattr(forecaster, "best_forecaster_", forecaster)
+    start = time.perf_counter()
+    predictor = compile_prophet(forecaster)
+    print(f"compiled in {(time.perf_counter() - start) * 1000:.1f}ms")
+    history = forecaster._forecaster.history["ds"]
+    cutoffs = pd.date_range(
+        history.min(), history.max() + pd.Timedelta(days=365), periods=args.cutoffs
+    )
+    fh = range(1, args.horizon + 1)
+    errors, prophet_seconds, numpy_seconds = [], [], []
+    for cutoff in cutoffs:
+        dates = pd.date_range(cutoff + pd.Timedelta(days=1), periods=args.horizon)
+        errors.append(verify_predictor(forecaster, predictor, dates))
+        # only the cutoff of the scoring data matters to prophet's forecast
+        y = pd.DataFrame(
+            {"temperature": np.zeros(2)},
+            index=pd.date_range(end=cutoff, periods=2, freq="D"),
+        )
+        start = time.perf_counter()
+        forecaster.update_predict_single(fh=fh, y=y, update_params=False)
+        prophet_seconds.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        predictor.forecast(cutoff, args.horizon)
+        numpy_seconds.append(time.perf_counter() - start)
+    print(f"{len(cutoffs)} cutoffs, max |yhat difference| {max(errors):.2e}")
+    print(f"{'':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, seconds in [("prophet", prophet_seconds), ("numpy", numpy_seconds)]:
+        ms = np.array(seconds) * 1000
+        print(f"{name:>8} {np.percentile(ms, 50):>8.3f} {np.percentile(ms, 99):>8.3f}")
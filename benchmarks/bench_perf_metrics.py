@@ -0,0 +1,70 @@
+"""equivalence & latency of the numpy performance measures vs the evidently
+report of perf_reporter, on synthetic 30 days monitoring windows of float32
+temperatures (as read from the database).
+
+usage:
+    python -m benchmarks.bench_perf_metrics --locations 50 --days 30
+"""
+
+from app.monitoring.metrics import METRIC_FIELDS
+from app.monitoring.performance_monitoring import perf_reporter
+import pandas as pd
+import numpy as np
+import argparse
+import time
+
+
+def monitoring_window(location_id: int, days: int) -> pd.DataFrame:
+    rng = np.random.default_rng(location_id)
+    target = 22 + 8 * np.sin(np.arange(days) / 58) + rng.normal(0, 1.5, days)
+    prediction = target + rng.normal(rng.normal(0, 1), 1.2, days)
+    return pd.DataFrame(
+        {
+            "target": target.astype(np.float32),
+            "prediction": prediction.astype(np.float32),
+        },
+        index=pd.date_range("2024-01-01", periods=days, name="reading_date"),
+    )
+
+
+def max_relative_error(expected, actual) -> float:
+    expected, actual = np.asarray(expected), np.asarray(actual)
+    return float(np.max(np.abs(actual - expected) / np.maximum(np.abs(expected), 1)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="performance measures benchmark")
+    parser.add_argument("--locations", default=50, type=int)
+    parser.add_argument("--days", default=30, type=int)
+    args = parser.parse_args()
+    windows = [monitoring_window(i, args.days) for i in range(args.locations)]
+    # first evidently report imports & registers its metrics
+    perf_reporter.fn(windows[0].copy(), windows[0].copy(), engine="evidently")
+    seconds = {"evidently": [], "numpy": []}
+    errors = {field: 0.0 for field in METRIC_FIELDS}
+    for window in windows:
+        reports = {}
+        for engine in seconds:
+            # evidently drops invalid rows of its inputs inplace
+            perf_df = window.copy()
+            start = time.perf_counter()
+            reports[engine] = perf_reporter.fn(perf_df, perf_df, engine=engine)
+            seconds[engine].append(time.perf_counter() - start)
+        for field in METRIC_FIELDS:
+            errors[field] = max(
+                errors[field],
+                max_relative_error(
+                    reports["evidently"][field], reports["numpy"][field]
+                ),
+            )
+    print(f"{args.locations} windows of {args.days} days")
+    print(f"{'field':>26} {'max rel. error':>15}")
+    for field, error in errors.items():
+        print(f"{field:>26} {error:>15.2e}")
+    print(f"{'':>10} {'p50 ms':>8} {'p99 ms':>8} {'total s':>8}")
+    for engine, values in seconds.items():
+        ms = np.array(values) * 1000
+        print(
+            f"{engine:>10} {np.percentile(ms, 50):>8.3f}"
+            f" {np.percentile(ms, 99):>8.3f} {ms.sum() / 1000:>8.3f}"
+        )
@@ -0,0 +1,58 @@
+"""speed-up of the parallel hyperparameter search per number of cores,
+and check that every core count finds the same scores & best params.
+the fold cache is disabled, so every run fits all of its folds.
+
+usage:
+    python -m benchmarks.bench_tuner_parallel --conf conf/params.yaml \
+        --backend loky --n_jobs 1 2 4 8
+"""
+
+from app.train.train import Trainer
+from app.train.artifacts import read_series
+import numpy as np
+import argparse
+import time
+import yaml
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="parallel tuner benchmark")
+    parser.add_argument("--conf", default="conf/params.yaml")
+    parser.add_argument("--backend", default="loky")
+    parser.add_argument("--n_jobs", nargs="+", type=int, default=[1, 2, 4])
+    args = parser.parse_args()
+    with open(args.conf, mode="r") as file:
+        conf = yaml.safe_load(file)
+    df = read_series(conf["split_data"]["train_output_path"])
+    # cached folds of a previous run would fake the speed-ups
+    conf["tuner"]["cache"] = {**conf["tuner"].get("cache", {}), "enabled": False}
+    for estimator in conf["tuner"]["estimator_name"]:
+        results = {}
+        for n_jobs in args.n_jobs:
+            conf["tuner"]["parallel"] = {"backend": args.backend, "n_jobs": n_jobs}
+            trainer = Trainer(
+                tuning_params=conf["tuner"],
+                random_state=conf["base"]["random_state"],
+                df=df,
+                live_dir=conf["base"]["dvclive_dir"],
+            )
+            search = trainer.get_search(estimator)
+            start = time.perf_counter()
+            search.fit(df)
+            results[n_jobs] = {
+                "seconds": time.perf_counter() - start,
+                "scores": np.array(
+                    [trial["score"] for trial in Trainer.get_trials(search)]
+                ),
+                "best_params": search.best_params_,
+            }
+        baseline = results[args.n_jobs[0]]
+        print(f"{estimator}: {len(baseline['scores'])} candidates")
+        print(f"{'n_jobs':>8} {'seconds':>10} {'speed-up':>10} {'same-results':>14}")
+        for n_jobs, r in results.items():
+            deterministic = r["best_params"] == baseline["best_params"] and np.allclose(
+                r["scores"], baseline["scores"], equal_nan=True
+            )
+            print(
+                f"{n_jobs:>8} {r['seconds']:>10.2f}"
+                f" {baseline['seconds'] / r['seconds']:>9.2f}x {str(deterministic):>14}"
+            )
@@ -0,0 +1,57 @@
+"""retrain time vs accuracy drift of the production model, month by month:
+stale (no refit), cold refit from scratch, and warm-started refit.
+
+usage:
+    python -m benchmarks.bench_warm_start --conf conf/params.yaml --months 6
+"""
+
+from sklearn.model_selection import ParameterGrid
+from sktime.forecasting.fbprophet import Prophet
+from sktime.performance_metrics.forecasting import mean_absolute_percentage_error
+from app.train.artifacts import read_series
+from app.train.warm_start import retrain
+import argparse
+import time
+import yaml
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="warm-start retrain benchmark")
+    parser.add_argument("--conf", default="conf/params.yaml")
+    parser.add_argument("--months", default=6, type=int)
+    args = parser.parse_args()
+    with open(args.conf, mode="r") as file:
+        conf = yaml.safe_load(file)
+    fh = list(range(1, conf["tuner"]["cv"]["fh"] + 1))
+    window = conf["retrain"]["window_days"]
+    y = read_series(conf["extract_data"]["output_path"])[["temperature"]]
+    params = next(iter(ParameterGrid(conf["tuner"]["prophet"]["params"])))
+    first_cutoff = len(y) - args.months * len(fh)
+    stale = Prophet(**params).fit(
+        y.iloc[max(0, first_cutoff - window) : first_cutoff], fh=fh
+    )
+    warm = stale
+    print(
+        f"{'cutoff':>12} {'cold s':>8} {'warm s':>8}"
+        f" {'stale mape':>11} {'cold mape':>10} {'warm mape':>10}"
+    )
+    for step in range(args.months):
+        cutoff = first_cutoff + step * len(fh)
+        y_window = y.iloc[max(0, cutoff - window) : cutoff]
+        y_true = y.iloc[cutoff : cutoff + len(fh)]
+        cold, cold_seconds = timed(lambda: retrain(stale, y_window, warm_start=False))
+        warm, warm_seconds = timed(lambda: retrain(warm, y_window, warm_start=True))
+        stale_pred = stale.update_predict_single(y=y_window, fh=fh, update_params=False)
+        print(
+            f"{str(y_window.index[-1].date()):>12} {cold_seconds:>8.3f}"
+            f" {warm_seconds:>8.3f}"
+            f" {mean_absolute_percentage_error(y_true, stale_pred):>11.4f}"
+            f" {mean_absolute_percentage_error(y_true, cold.predict()):>10.4f}"
+            f" {mean_absolute_percentage_error(y_true, warm.predict()):>10.4f}"
+        )
@@ -0,0 +1,127 @@
+"""load test of the online forecast service: replay a request file, one JSON
+request per line (`{"location_id": 1, "horizon": 30}`), from concurrent
+clients, and report the latency percentiles & throughput.
+
+without `--url` the service of the parameters file is served in-process
+(no network), so batching & caching settings can be compared locally.
+
+usage:
+    python -m benchmarks.load_test_service --generate 2000 --locations 1 2 \
+        --requests weather_data/service_requests.jsonl
+    python -m benchmarks.load_test_service --db local:weather_data/bench.duckdb \
+        --requests weather_data/service_requests.jsonl --concurrency 32 --max_batch 1
+    python -m benchmarks.load_test_service --url http://localhost:8000 \
+        --requests weather_data/service_requests.jsonl
+"""
+
+from app.inference.service import build_service, create_app
+from app.storage.backend import database_target
+from dotenv import dotenv_values
+from typing import Any, Dict, List
+import numpy as np
+import argparse
+import asyncio
+import httpx
+import json
+import time
+import yaml
+import os
+
+
+def generate_requests(
+    path: str, n_requests: int, locations: List[int], horizons: List[int], seed: int
+) -> None:
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as file:
+        for _ in range(n_requests):
+            request = {
+                "location_id": int(rng.choice(locations)),
+                "horizon": int(rng.choice(horizons)),
+            }
+            file.write(json.dumps(request) + "\n")
+
+
+def read_requests(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+async def replay(
+    client: httpx.AsyncClient, requests: List[Dict[str, Any]], concurrency: int
+) -> Dict[str, Any]:
+    """send the requests in order from concurrent closed-loop clients"""
+    latencies = []
+    statuses: Dict[int, int] = {}
+    pending = iter(requests)
+
+    async def worker():
+        for params in pending:
+            start = time.perf_counter()
+            response = await client.get("/forecast", params=params)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    seconds = time.perf_counter() - start
+    health = (await client.get("/health")).json()
+    ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "statuses": statuses,
+        "seconds": seconds,
+        "qps": len(latencies) / seconds,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "health": health,
+    }
+
+
+async def run(args, conf) -> Dict[str, Any]:
+    requests = read_requests(args.requests)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            return await replay(client, requests, args.concurrency)
+    for key in ["max_batch", "max_wait_ms", "cache_size"]:
+        if getattr(args, key) is not None:
+            conf["service"][key] = getattr(args, key)
+    app = create_app(build_service(conf, args.db))
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://service", timeout=60
+        ) as client:
+            return await replay(client, requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    ENV = dotenv_values(".env")
+    parser = argparse.ArgumentParser(description="forecast service load test")
+    parser.add_argument("--conf", default="conf/params.yaml")
+    parser.add_argument("--requests", default="weather_data/service_requests.jsonl")
+    parser.add_argument("--url", default=None, help="running service, or in-process")
+    parser.add_argument("--db", default=None, help="database target of in-process")
+    parser.add_argument("--concurrency", default=16, type=int)
+    parser.add_argument("--max_batch", default=None, type=int)
+    parser.add_argument("--max_wait_ms", default=None, type=float)
+    parser.add_argument("--cache_size", default=None, type=int)
+    parser.add_argument("--generate", default=0, type=int, help="requests to write")
+    parser.add_argument("--locations", default=[1], type=int, nargs="+")
+    parser.add_argument("--horizons", default=[7, 14, 30], type=int, nargs="+")
+    parser.add_argument("--seed", default=42, type=int)
+    args = parser.parse_args()
+    if args.generate:
+        generate_requests(
+            args.requests, args.generate, args.locations, args.horizons, args.seed
+        )
+        print(f"{args.generate} requests written to {args.requests}")
+    else:
+        with open(args.conf, mode="r") as file:
+            conf = yaml.safe_load(file)
+        if not args.url:
+            args.db = args.db or database_target(ENV)
+        report = asyncio.run(run(args, conf))
+        health = report.pop("health")
+        print(json.dumps(report, indent=4))
+        print(f"service: {json.dumps(health, indent=4)}")
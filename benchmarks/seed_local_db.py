@@ -0,0 +1,63 @@
+"""seed a local duckdb database with synthetic hourly & daily weather data,
+to run and benchmark the flows offline against realistic data volumes.
+
+usage:
+    python -m benchmarks.seed_local_db --target local:weather_data/bench.duckdb \
+        --locations 100 --days 800 --end_date 2024-01-01
+
+then set `DATABASE_TARGET=local:weather_data/bench.duckdb` in `.env`.
+"""
+
+from app.api_data.weather_data_flows import load_to_motherduck, HOURLY_ARROW_SCHEMA
+from app.inference.prepare_daily_data import prepare_daily_range
+from app.storage.backend import connect
+import pyarrow as pa
+import numpy as np
+import argparse
+import datetime
+import time
+
+
+def synthetic_hourly(location_id: int, start: datetime.date, days: int) -> pa.Table:
+    rng = np.random.default_rng(location_id)
+    hours = np.arange(days * 24)
+    timestamps = np.datetime64(start, "ns") + hours.astype("timedelta64[h]")
+    temperature = (
+        22
+        + 8 * np.sin(2 * np.pi * hours / (24 * 365.25))
+        + 5 * np.sin(2 * np.pi * hours / 24)
+        + rng.normal(0, 1.5, len(hours))
+    )
+    return pa.Table.from_arrays(
+        [
+            pa.repeat(pa.scalar(location_id, pa.int32()), len(hours)),
+            pa.array(timestamps, pa.timestamp("ns")),
+            pa.array(temperature, pa.float32()),
+            pa.repeat(pa.scalar("Africa/Cairo", pa.string()), len(hours)),
+        ],
+        schema=HOURLY_ARROW_SCHEMA,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="seed a local weather database")
+    parser.add_argument("--target", default="local:weather_data/bench.duckdb")
+    parser.add_argument("--locations", default=10, type=int)
+    parser.add_argument("--days", default=800, type=int)
+    parser.add_argument("--end_date", default=datetime.date.today().isoformat())
+    args = parser.parse_args()
+    end = datetime.date.fromisoformat(args.end_date)
+    start = end - datetime.timedelta(days=args.days - 1)
+    start_time = time.perf_counter()
+    with connect(args.target, bootstrap=True) as conn:
+        for location_id in range(1, args.locations + 1):
+            load_to_motherduck.fn(
+                df=synthetic_hourly(location_id, start, args.days), db_conn=conn
+            )
+        prepare_daily_range.fn(
+            conn=conn, start_date=start.isoformat(), end_date=end.isoformat()
+        )
+    print(
+        f"seeded {args.locations} locations x {args.days} days in"
+        f" {time.perf_counter() - start_time:.2f}s"
+    )
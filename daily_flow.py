@@ -0,0 +1,197 @@
+from prefect import flow
+from prefect.artifacts import create_table_artifact
+from data_flow import data_processing_job
+from app.api_data.data_models import read_locations
+from app.inference.forecast import forecast_flow, get_inference_data
+from app.monitoring.performance_monitoring import perf_monitor_flow
+from app.inference.model_loader import model_location
+from app.inference.model_registry import get_registry
+from app.storage.backend import database_target
+from app.storage.connection import connection_metrics, get_connection
+from dotenv import dotenv_values
+from typing import Any, Dict, List, Optional
+import argparse
+import datetime
+import time
+import yaml
+
+
+def forecast_due(day: datetime.date, forecast_days: List[int]) -> bool:
+    """forecasting runs only on the configured days of month"""
+    return day.day in forecast_days
+
+
+@flow(
+    name="DailyJobFlow",
+    description="Ingest, Forecast & Monitor in one process",
+    validate_parameters=True,
+    log_prints=True,
+)
+def daily_job(
+    data_url,
+    params,
+    db_token,
+    running_date: str,
+    model_path: str,
+    run_forecast: bool,
+    locations: Optional[List[Dict[str, Any]]] = None,
+    location_id: Optional[int] = None,
+    max_concurrency: int = 8,
+    requests_per_second: float = 10.0,
+    n_workers: Optional[int] = None,
+    location_models: Optional[Dict[int, str]] = None,
+    monitoring_engine: str = "numpy",
+    report_dir: Optional[str] = None,
+) -> Dict[str, float]:
+    """Parent Flow of the daily batch job,
+    stages run in dependency order: data processing -> forecasting -> monitoring,
+    a failing stage stops the stages depending on it.
+    daily history is read once and passed in memory to forecasting & monitoring.
+
+    Parameters
+    ----------
+    data_url : str
+        API url
+    params : Dict[str, Any]
+        Parameters Needed to access API and get data
+    db_token : str
+        MotherDuck Database Credentials
+    running_date : str
+        date string format of batch job running date
+    model_path : str
+        exported model directory
+    run_forecast : bool
+        whether the forecasting stage is due in this run
+    locations : Optional[List[Dict[str, Any]]]
+        locations to ingest, if not passed the location of params is used
+    location_id : Optional[int]
+        id of the location of params
+    max_concurrency : int
+        maximum number of in-flight API requests
+    requests_per_second : float
+        maximum number of API requests per second
+    n_workers : Optional[int]
+        forecasting processes, defaults to one per core
+    location_models : Optional[Dict[int, str]]
+        models of specific locations, other locations use `model_path`
+    monitoring_engine : str
+        "numpy" performance measures, or the full "evidently" report
+    report_dir : Optional[str]
+        directory of the html evidently reports
+
+    Returns
+    -------
+    Dict[str, float]
+        elapsed seconds of every stage
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    data_processing_job(
+        data_url=data_url,
+        params=params,
+        db_token=db_token,
+        running_date=running_date,
+        locations=locations,
+        location_id=location_id,
+        max_concurrency=max_concurrency,
+        requests_per_second=requests_per_second,
+    )
+    timings["data_processing"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hist_df = get_inference_data(
+        conn=get_connection(db_token), running_date=running_date
+    )
+    timings["read_history"] = time.perf_counter() - start
+
+    if run_forecast:
+        start = time.perf_counter()
+        forecast_flow(
+            db_token=db_token,
+            date=running_date,
+            model_path=model_path,
+            hist_df=hist_df,
+            n_workers=n_workers,
+            location_models=location_models,
+        )
+        timings["forecasting"] = time.perf_counter() - start
+    else:
+        print("Forecasting isn't due in this run, skipped")
+
+    start = time.perf_counter()
+    perf_monitor_flow(
+        db_token=db_token,
+        date=running_date,
+        actuals_df=hist_df,
+        engine=monitoring_engine,
+        report_dir=report_dir,
+    )
+    timings["monitoring"] = time.perf_counter() - start
+
+    timings["connection_setup"] = connection_metrics(db_token)["setup_seconds"]
+    timings["total"] = sum(
+        seconds for stage, seconds in timings.items() if stage != "connection_setup"
+    )
+    create_table_artifact(
+        key="daily-job-stage-timings",
+        table=[
+            {"stage": stage, "seconds": round(seconds, 3)}
+            for stage, seconds in timings.items()
+        ],
+        description=f"stage timings of daily job of {running_date}",
+    )
+    print(f"Stage Timings: {timings}")
+    return timings
+
+
+if __name__ == "__main__":
+    ENV = dotenv_values(".env")
+    default_date = datetime.datetime.strftime(
+        datetime.datetime.now() - datetime.timedelta(days=2), "%Y-%m-%d"
+    )
+    parser = argparse.ArgumentParser(description="ML Job Parameters")
+    parser.add_argument("--running_date", default=default_date, type=str)
+    parser.add_argument("--locations", default=None, type=str)
+    parser.add_argument(
+        "--forecast",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="force/skip forecasting, by default it runs on schedule.forecast_days",
+    )
+    args = parser.parse_args()
+    with open("conf/params.yaml", "r") as f:
+        conf = yaml.safe_load(f)
+    get_registry(memory_budget_mb=conf["inference"]["model_cache_mb"])
+    locations_conf = read_locations(args.locations)
+    # single-location mode ingests the first configured location
+    location = locations_conf["locations"][0]
+    run_forecast = args.forecast
+    if run_forecast is None:
+        run_forecast = forecast_due(
+            datetime.date.today(), conf["schedule"]["forecast_days"]
+        )
+    url_params = {
+        "latitude": location["latitude"],
+        "longitude": location["longitude"],
+        "start_date": args.running_date,
+        "end_date": args.running_date,
+        "hourly": "temperature_2m",
+        "timezone": location["timezone"],
+    }
+    daily_job(
+        data_url=ENV["METEO_URL"],
+        params=url_params,
+        db_token=database_target(ENV),
+        running_date=args.running_date,
+        model_path=model_location(conf),
+        run_forecast=run_forecast,
+        locations=locations_conf["locations"] if args.locations else None,
+        location_id=location["location_id"],
+        max_concurrency=locations_conf.get("max_concurrency", 8),
+        requests_per_second=locations_conf.get("requests_per_second", 10.0),
+        n_workers=conf["inference"]["n_workers"],
+        location_models=conf["inference"]["location_models"],
+        monitoring_engine=conf["monitoring"]["engine"],
+        report_dir=conf["monitoring"]["report_dir"],
+    )
@@ -1,7 +1,11 @@
 from prefect import flow
+from app.api_data.data_models import read_locations
 from app.api_data.weather_data_flows import data_flow
 from app.inference.prepare_daily_data import data_prep_flow
+from app.storage.backend import database_target
+from app.storage.connection import connection_metrics
 from dotenv import dotenv_values
+from typing import Any, Dict, List, Optional
 import argparse
 import datetime
 
@@ -12,7 +16,16 @@ import datetime
     validate_parameters=True,
     log_prints=True,
 )
-def data_processing_job(data_url, params, db_token, running_date: str) -> None:
+def data_processing_job(
+    data_url,
+    params,
+    db_token,
+    running_date: str,
+    locations: Optional[List[Dict[str, Any]]] = None,
+    location_id: Optional[int] = None,
+    max_concurrency: int = 8,
+    requests_per_second: float = 10.0,
+) -> None:
     """Parent Flow of Data Processing
 
     Parameters
@@ -25,14 +38,28 @@ def data_processing_job(data_url, params, db_token, running_date: str) -> None:
         MotherDuck Database Credentials
     running_date : str
         date string format of batch job running date
+    locations : Optional[List[Dict[str, Any]]]
+        locations (location_id, latitude, longitude, timezone)
+        to ingest concurrently, if not passed the location of params is used
+    location_id : Optional[int]
+        id of the location of params
+    max_concurrency : int
+        maximum number of in-flight API requests
+    requests_per_second : float
+        maximum number of API requests per second
     """
     data_flow(
         api_data_url=data_url,
         url_params=params,
         db_token=db_token,
         deleting_thresh_dt=running_date,
+        locations=locations,
+        location_id=location_id,
+        max_concurrency=max_concurrency,
+        requests_per_second=requests_per_second,
     )
     inference_flag = data_prep_flow(db_token=db_token, date=running_date)
+    print(f"Shared Connection Metrics: {connection_metrics(db_token)}")
     if inference_flag:
         print("Inference Can be Started Safely")
     else:
@@ -46,18 +73,26 @@ if __name__ == "__main__":
     )
     parser = argparse.ArgumentParser(description="ML Job Parameters")
     parser.add_argument("--running_date", default=default_date, type=str)
+    parser.add_argument("--locations", default=None, type=str)
     args = parser.parse_args()
+    locations_conf = read_locations(args.locations)
+    # single-location mode ingests the first configured location
+    location = locations_conf["locations"][0]
     url_params = {
-        "latitude": 30.052723,
-        "longitude": 31.190199,
+        "latitude": location["latitude"],
+        "longitude": location["longitude"],
         "start_date": args.running_date,
         "end_date": args.running_date,
         "hourly": "temperature_2m",
-        "timezone": "Africa/Cairo",
+        "timezone": location["timezone"],
     }
     data_processing_job(
         data_url=ENV["METEO_URL"],
         params=url_params,
-        db_token=ENV["MOTHERDUCK_TOKEN"],
+        db_token=database_target(ENV),
         running_date=args.running_date,
+        locations=locations_conf["locations"] if args.locations else None,
+        location_id=location["location_id"],
+        max_concurrency=locations_conf.get("max_concurrency", 8),
+        requests_per_second=locations_conf.get("requests_per_second", 10.0),
     )
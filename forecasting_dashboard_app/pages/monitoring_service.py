@@ -1,8 +1,7 @@
 import streamlit as st
-import duckdb
+from serve.connection import get_connection
 from serve.monitoring import MonitoringServer
 from typing import List
-from dotenv import dotenv_values
 import datetime
 
 st.set_page_config(
@@ -16,21 +15,18 @@ st.sidebar.header("Monitoring Service")
 last_date = datetime.datetime.now() - datetime.timedelta(days=2)
 first_date = datetime.datetime.now() - datetime.timedelta(days=50)
 monitor_server = MonitoringServer()
-ENV = dotenv_values(".env")
 
 
 @st.cache_data
 def get_ids_data() -> List[int]:
-    db_token = ENV["MOTHERDUCK_TOKEN"]
-    with duckdb.connect(f"md:?motherduck_token={db_token}") as conn:
+    with get_connection().cursor() as conn:
         ids = monitor_server.get_location_ids(conn=conn)
     return ids
 
 
 @st.cache_data
 def get_dashboard_data(id: int, date: str):
-    db_token = ENV["MOTHERDUCK_TOKEN"]
-    with duckdb.connect(f"md:?motherduck_token={db_token}") as conn:
+    with get_connection().cursor() as conn:
         data = monitor_server.get_perf_report_data(
             conn=conn,
             id=id,
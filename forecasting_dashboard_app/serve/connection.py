@@ -0,0 +1,21 @@
+import streamlit as st
+import duckdb
+from dotenv import dotenv_values
+
+ENV = dotenv_values(".env")
+
+
+def is_healthy(conn) -> bool:
+    try:
+        conn.execute("SELECT 1").fetchone()
+        return True
+    except Exception:
+        return False
+
+
+@st.cache_resource(validate=is_healthy)
+def get_connection():
+    """one MotherDuck connection per app process, re-created if it
+    fails the health check, pages query through cursors of it."""
+    db_token = ENV["MOTHERDUCK_TOKEN"]
+    return duckdb.connect(f"md:?motherduck_token={db_token}")
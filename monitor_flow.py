@@ -1,8 +1,11 @@
 from prefect import flow
 from app.monitoring.performance_monitoring import perf_monitor_flow
+from app.storage.backend import database_target
 from dotenv import dotenv_values
+from typing import Optional
 import argparse
 import datetime
+import yaml
 
 
 @flow(
@@ -11,7 +14,12 @@ import datetime
     validate_parameters=True,
     log_prints=True,
 )
-def monitor_flow(db_token, running_date: str) -> None:
+def monitor_flow(
+    db_token,
+    running_date: str,
+    engine: str = "numpy",
+    report_dir: Optional[str] = None,
+) -> None:
     """main flow of monitoring
 
     Parameters
@@ -20,8 +28,14 @@ def monitor_flow(db_token, running_date: str) -> None:
         MotherDuck Database Credentials
     running_date : str
         running date of the process
+    engine : str
+        "numpy" performance measures, or the full "evidently" report
+    report_dir : Optional[str]
+        directory of the html evidently reports
     """
-    perf_monitor_flow(db_token=db_token, date=running_date)
+    perf_monitor_flow(
+        db_token=db_token, date=running_date, engine=engine, report_dir=report_dir
+    )
 
 
 if __name__ == "__main__":
@@ -32,7 +46,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="ML Job Parameters")
     parser.add_argument("--running_date", default=default_date, type=str)
     args = parser.parse_args()
+    with open("conf/params.yaml", "r") as f:
+        conf = yaml.safe_load(f)
     monitor_flow(
-        db_token=ENV["MOTHERDUCK_TOKEN"],
+        db_token=database_target(ENV),
         running_date=args.running_date,
+        engine=conf["monitoring"]["engine"],
+        report_dir=conf["monitoring"]["report_dir"],
     )
@@ -1,6 +1,11 @@
 from prefect import flow
-from app.inference.forecast import forecast_flow
+from app.inference.forecast import HORIZON, forecast_flow, replay_flow
+from app.inference.model_loader import model_location
+from app.inference.model_registry import get_registry
+from app.storage.backend import database_target
 from dotenv import dotenv_values
+from typing import Dict, Optional
+import pandas as pd
 import argparse
 import datetime
 import yaml
@@ -12,7 +17,13 @@ import yaml
     validate_parameters=True,
     log_prints=True,
 )
-def pred_flow(db_token, running_date: str, model_path: str) -> None:
+def pred_flow(
+    db_token,
+    running_date: str,
+    model_path: str,
+    n_workers: Optional[int] = None,
+    location_models: Optional[Dict[int, str]] = None,
+) -> None:
     """main flow of weather forecasting & performance monitoring
 
     Parameters
@@ -22,9 +33,19 @@ def pred_flow(db_token, running_date: str, model_path: str) -> None:
     running_date : str
         running date of the process
     model_path : str
-        path of model's pickle file
+        exported model directory
+    n_workers : Optional[int]
+        forecasting processes, defaults to one per core
+    location_models : Optional[Dict[int, str]]
+        models of specific locations, other locations use `model_path`
     """
-    forecast_flow(db_token=db_token, date=running_date, model_path=model_path)
+    forecast_flow(
+        db_token=db_token,
+        date=running_date,
+        model_path=model_path,
+        n_workers=n_workers,
+        location_models=location_models,
+    )
 
 
 if __name__ == "__main__":
@@ -34,11 +55,40 @@ if __name__ == "__main__":
     )
     parser = argparse.ArgumentParser(description="ML Job Parameters")
     parser.add_argument("--running_date", default=default_date, type=str)
+    parser.add_argument(
+        "--replay_from", default=None, type=str, help="first running date to replay"
+    )
+    parser.add_argument(
+        "--replay_to", default=None, type=str, help="last running date to replay"
+    )
+    parser.add_argument(
+        "--replay_every",
+        default=HORIZON,
+        type=int,
+        help="days between replayed dates, defaults to the forecast horizon",
+    )
     args = parser.parse_args()
     with open("conf/params.yaml", "r") as f:
         conf = yaml.safe_load(f)
-    pred_flow(
-        db_token=ENV["MOTHERDUCK_TOKEN"],
-        running_date=args.running_date,
-        model_path=conf["tuner"]["model_path"],
-    )
+    get_registry(memory_budget_mb=conf["inference"]["model_cache_mb"])
+    if args.replay_from:
+        dates = pd.date_range(
+            args.replay_from,
+            args.replay_to or args.running_date,
+            freq=f"{args.replay_every}D",
+        )
+        replay_flow(
+            db_token=database_target(ENV),
+            dates=[date.strftime("%Y-%m-%d") for date in dates],
+            model_path=model_location(conf),
+            n_workers=conf["inference"]["n_workers"],
+            location_models=conf["inference"]["location_models"],
+        )
+    else:
+        pred_flow(
+            db_token=database_target(ENV),
+            running_date=args.running_date,
+            model_path=model_location(conf),
+            n_workers=conf["inference"]["n_workers"],
+            location_models=conf["inference"]["location_models"],
+        )
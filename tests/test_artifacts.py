@@ -0,0 +1,36 @@
+from app.train.artifacts import read_series, write_series
+from app.train.extract_data import DailyHistory
+import pandas as pd
+import datetime
+import duckdb
+
+
+def daily_frame(days: int = 60) -> pd.DataFrame:
+    # microsecond index, as returned by duckdb's date_trunc
+    return duckdb.sql(f"""
+        SELECT date_trunc('day', TIMESTAMP '2023-01-01' + INTERVAL (i) DAY)
+               AS reading_date,
+               i / 10 AS temperature
+        FROM range({days}) t(i)
+        """).df().set_index("reading_date")
+
+
+def test_series_round_trip_has_ns_index(tmp_path):
+    df = daily_frame()
+    assert df.index.dtype != "datetime64[ns]"
+    path = str(tmp_path / "daily.parquet")
+    write_series(df, path)
+    result = read_series(path)
+    assert result.index.dtype == "datetime64[ns]"
+    assert result.index.freq == "D"
+    assert (result.index.asi8 == df.index.as_unit("ns").asi8).all()
+    assert result["temperature"].tolist() == df["temperature"].tolist()
+
+
+def test_history_partitions_have_ns_index(tmp_path):
+    df = daily_frame()
+    history = DailyHistory(str(tmp_path))
+    history.merge(df, datetime.date(2023, 1, 1))
+    result = history.read(datetime.date(2023, 1, 1))
+    assert result.index.dtype == "datetime64[ns]"
+    assert len(result) == len(df)
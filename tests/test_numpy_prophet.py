@@ -0,0 +1,127 @@
+from app.inference.numpy_prophet import NumpyProphet, compile_prophet
+from prophet import Prophet
+from sktime.forecasting.fbprophet import Prophet as SktimeProphet
+import numpy as np
+import pandas as pd
+import pytest
+
+# max absolute difference of the numpy forecast & prophet's yhat
+TOLERANCE = 1e-9
+
+
+def daily_series(days: int = 730, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    ds = pd.date_range("2021-01-01", periods=days, freq="D")
+    t = np.arange(days)
+    y = (
+        25
+        + 0.01 * t
+        + 6 * np.sin(2 * np.pi * t / 365.25)
+        + 2 * np.sin(2 * np.pi * t / 91)
+        + rng.normal(0, 1, days)
+    )
+    return pd.DataFrame({"ds": ds, "y": y})
+
+
+def forecast_dates(df: pd.DataFrame) -> pd.DatetimeIndex:
+    """the training dates & the next year"""
+    future = pd.date_range(df["ds"].iloc[-1], periods=366, freq="D")[1:]
+    return pd.DatetimeIndex(df["ds"]).append(future)
+
+
+def assert_equivalent(forecaster, df: pd.DataFrame) -> None:
+    model = getattr(forecaster, "_forecaster", forecaster)
+    dates = forecast_dates(df)
+    expected = model.predict(pd.DataFrame({"ds": dates}))["yhat"].to_numpy()
+    actual = compile_prophet(forecaster).predict(dates).to_numpy()
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=TOLERANCE)
+
+
+@pytest.fixture(scope="module")
+def df() -> pd.DataFrame:
+    return daily_series()
+
+
+@pytest.mark.parametrize("seasonality_mode", ["additive", "multiplicative"])
+@pytest.mark.parametrize("growth", ["linear", "flat"])
+def test_predict_matches_prophet(df, seasonality_mode, growth):
+    model = Prophet(
+        growth=growth,
+        seasonality_mode=seasonality_mode,
+        weekly_seasonality=True,
+        daily_seasonality=False,
+    )
+    model.fit(df)
+    assert_equivalent(model, df)
+
+
+@pytest.mark.parametrize("mode", ["additive", "multiplicative"])
+def test_predict_matches_prophet_with_quarterly_seasonality(df, mode):
+    # the custom seasonality of the tuner's prophet grid (conf/params.yaml)
+    model = Prophet(weekly_seasonality=False, daily_seasonality=False)
+    model.add_seasonality(name="quarterly", period=91, fourier_order=20, mode=mode)
+    model.fit(df)
+    assert_equivalent(model, df)
+
+
+def test_predict_matches_sktime_prophet(df):
+    # sktime forecaster of the tuner, with the quarterly seasonality of its grid
+    forecaster = SktimeProphet(
+        yearly_seasonality=True,
+        add_seasonality={"name": "quarterly", "period": 91, "fourier_order": 20},
+    )
+    forecaster.fit(df.set_index("ds")["y"].asfreq("D"))
+    assert_equivalent(forecaster, df)
+
+
+def test_predict_matches_prophet_with_minmax_scaling(df):
+    model = Prophet(scaling="minmax", weekly_seasonality=False)
+    model.fit(df)
+    assert_equivalent(model, df)
+
+
+def test_saved_predictor_matches_prophet(df, tmp_path):
+    model = Prophet(weekly_seasonality=False, daily_seasonality=False)
+    model.fit(df)
+    path = str(tmp_path / "predictor.json")
+    compile_prophet(model).save(path)
+    dates = forecast_dates(df)
+    expected = model.predict(pd.DataFrame({"ds": dates}))["yhat"].to_numpy()
+    actual = NumpyProphet.load(path).predict(dates).to_numpy()
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=TOLERANCE)
+
+
+def test_logistic_growth_is_unsupported(df):
+    model = Prophet(growth="logistic")
+    model.fit(df.assign(cap=40.0))
+    with pytest.raises(ValueError, match="growth logistic"):
+        compile_prophet(model)
+
+
+def test_holidays_are_unsupported(df):
+    holidays = pd.DataFrame({
+        "holiday": "new-year",
+        "ds": pd.to_datetime(["2021-01-01", "2022-01-01", "2023-01-01"]),
+    })
+    model = Prophet(holidays=holidays)
+    model.fit(df)
+    with pytest.raises(ValueError, match="holidays"):
+        compile_prophet(model)
+
+
+def test_extra_regressors_are_unsupported(df):
+    model = Prophet()
+    model.add_regressor("humidity")
+    model.fit(df.assign(humidity=np.linspace(0, 1, len(df))))
+    with pytest.raises(ValueError, match="regressors"):
+        compile_prophet(model)
+
+
+def test_conditional_seasonality_is_unsupported(df):
+    model = Prophet(weekly_seasonality=False)
+    model.add_seasonality(
+        name="weekly_summer", period=7, fourier_order=3, condition_name="summer"
+    )
+    model.fit(df.assign(summer=df["ds"].dt.month.isin([6, 7, 8])))
+    with pytest.raises(ValueError, match="conditional seasonality"):
+        compile_prophet(model)
@@ -0,0 +1,35 @@
+from app.storage.backend import MEMORY_TARGET, connect
+from app.storage.schema import HOURLY_WEATHER_DATA, table_name
+from app.storage.upsert import upsert
+import pandas as pd
+
+
+def hourly_rows(temperatures) -> pd.DataFrame:
+    return pd.DataFrame({
+        "location_id": 1,
+        "reading_timestamp": pd.to_datetime(["2024-01-01 00:00"] * len(temperatures)),
+        "temperature": temperatures,
+        "tz": "UTC",
+    })
+
+
+def stored_temperatures(conn) -> list:
+    return [
+        row[0]
+        for row in conn.sql(
+            f"SELECT temperature FROM {table_name(HOURLY_WEATHER_DATA)}"
+        ).fetchall()
+    ]
+
+
+def test_upsert_keeps_the_last_duplicate_of_a_batch():
+    conn = connect(MEMORY_TARGET)
+    assert upsert(conn, HOURLY_WEATHER_DATA, hourly_rows([1.0, 2.0, 3.0])) == 1
+    assert stored_temperatures(conn) == [3.0]
+
+
+def test_upsert_replaces_existing_rows():
+    conn = connect(MEMORY_TARGET)
+    upsert(conn, HOURLY_WEATHER_DATA, hourly_rows([1.0]))
+    upsert(conn, HOURLY_WEATHER_DATA, hourly_rows([4.0, 5.0]))
+    assert stored_temperatures(conn) == [5.0]